@@ -1,10 +1,42 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox
 import sqlite3
 import hashlib
-from datetime import datetime
+from datetime import date, datetime
 import re
-#from fpdf import FPDF
+import time
+import uuid
+from screening import VelocityScreen
+from account_cache import AccountCache
+from account_table import FLAG_FROZEN, AccountTable
+from ledger import AccountFrozenError, Ledger, LedgerError, ScreeningError
+from metrics import OPERATION_SECONDS, OPERATIONS
+import tracing
+from tracing import IdleDialogs, TracingCursor, traced
+from group_commit import GroupCommitWriter
+from payee_index import PayeeDirectory
+from schema import ensure_schema
+from standing_orders import FREQUENCIES, StandingOrderScheduler
+from customer_lookup import find_customers, normalize_email, normalize_phone
+from fx import BASE_CURRENCY, CURRENCIES, LATIN1_SYMBOLS, FxRates, format_money, format_totals
+from customer_summary import SummaryRefresher, read_summary
+from account_status import AccountStatusError, FrozenAccounts, freeze_history, next_account_number, set_frozen
+
+DB_PATH = 'banking_system.db'
+# Prometheus metrics on 127.0.0.1; written to METRICS_FILE instead when the port is taken
+METRICS_PORT = 9464
+METRICS_FILE = 'securebank_metrics.prom'
+# Traces of sampled, failed or slow user actions
+TRACE_FILE = 'securebank_trace.jsonl'
+TRACE_SAMPLE_RATE = 0.05
+TRACE_SLOW_MS = 500
+# How often freezes made by other processes are picked up by the in-memory frozen set
+FROZEN_REFRESH_MS = 5000
+# How often rates imported with fx.py are picked up by the in-memory rate cache
+FX_REFRESH_MS = 60000
+
+# Time spent in dialogs is recorded as idle, not as part of the action
+messagebox = IdleDialogs(messagebox)
 
 class BankingSystem:
     def __init__(self):
@@ -29,88 +61,101 @@ class BankingSystem:
         self.current_user_type = None
         
         self.setup_database()
+        self.accounts_cache = AccountCache()
+        self.fx = FxRates()
+        self.screen = VelocityScreen(fx=self.fx)
+        self.account_table = AccountTable()
+        self.frozen_accounts = FrozenAccounts()
+        self.ledger = Ledger(self.accounts_cache, self.screen, self.account_table, fx=self.fx)
+        self.payee_directory = PayeeDirectory()
+        
+        # Money operations are committed in batches by a single writer thread; it loads the
+        # account table before its first batch, off the startup path
+        self.writer = GroupCommitWriter(DB_PATH, on_commit=self.ledger.committed,
+                                        on_abort=self.ledger.aborted, on_start=self.account_table.load)
+        self.writer.start()
+        
+        # Recurring transfers are executed through the same writer as they fall due
+        self.standing_orders = StandingOrderScheduler(DB_PATH, self.writer, self.ledger)
+        self.standing_orders.start()
+        
+        # Customer summary lists are rebuilt through the same writer after postings mark them stale
+        self.summary_refresher = SummaryRefresher(self.writer)
+        self.summary_refresher.start()
+        
+        # Employee reports read from a replica started on first employee login
+        self.replica = None
+        self.report_conns = None
+        self.report_generation = 0
+        
         self.create_styles()
         self.show_login_screen()
         
+        # Idle callbacks queued now would run before the window is painted, so
+        # deferred work waits for the first Expose of the login window
+        self.metrics_server = None
+        self.deferred_started = False
+        self.root.bind('<Expose>', self.start_deferred_work, '+')
+        
+    def start_deferred_work(self, event=None):
+        """Rebuild screening windows and start background services after the first draw"""
+        if self.deferred_started:
+            return
+        self.deferred_started = True
+        # Rates first, screening converts the replayed debits to the base currency
+        self.root.after_idle(self.refresh_rates)
+        self.root.after_idle(self.screen.warm_start, self.cursor)
+        self.root.after_idle(self.refresh_frozen_accounts)
+        self.root.after_idle(self.purge_idempotency_keys)
+        self.root.after_idle(self.start_metrics)
+        self.root.after_idle(tracing.configure, TRACE_FILE, TRACE_SAMPLE_RATE, TRACE_SLOW_MS)
+        
+    def start_metrics(self):
+        """Expose operation metrics on the local port, or write them to a file if it is taken"""
+        from metrics import serve, write_periodically
+        try:
+            self.metrics_server = serve(METRICS_PORT)
+        except OSError:
+            write_periodically(METRICS_FILE)
+    
+    def refresh_frozen_accounts(self):
+        """Reload the frozen set when freezes were recorded, then check again periodically"""
+        try:
+            self.frozen_accounts.refresh(self.cursor)
+        except sqlite3.Error:
+            pass
+        self.root.after(FROZEN_REFRESH_MS, self.refresh_frozen_accounts)
+    
+    def refresh_rates(self):
+        """Reload exchange rates when new ones were imported, then check again periodically"""
+        try:
+            self.fx.refresh(self.cursor)
+        except sqlite3.Error:
+            pass
+        self.root.after(FX_REFRESH_MS, self.refresh_rates)
+    
+    def purge_idempotency_keys(self):
+        """Drop expired idempotency keys through the writer, then again every hour"""
+        self.writer.submit(self.ledger.purge_idempotency_keys)
+        self.root.after(3600 * 1000, self.purge_idempotency_keys)
+    
     def setup_database(self):
         """Initialize the database with tables"""
-        self.conn = sqlite3.connect('banking_system.db')
-        self.cursor = self.conn.cursor()
-        
-        # Users table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                full_name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                phone TEXT NOT NULL,
-                address TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Accounts table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS accounts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                account_number TEXT UNIQUE NOT NULL,
-                account_type TEXT NOT NULL,
-                balance REAL DEFAULT 0.0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Transactions table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                account_id INTEGER,
-                transaction_type TEXT NOT NULL,
-                amount REAL NOT NULL,
-                description TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (account_id) REFERENCES accounts (id)
-            )
-        ''')
-        
-        # Employees table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS employees (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                full_name TEXT NOT NULL,
-                employee_id TEXT UNIQUE NOT NULL,
-                position TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Loan requests table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS loan_requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                amount REAL NOT NULL,
-                purpose TEXT NOT NULL,
-                duration INTEGER NOT NULL,
-                status TEXT DEFAULT 'Pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Create default admin employee
-        self.cursor.execute('''
-            INSERT OR IGNORE INTO employees (username, password, full_name, employee_id, position)
-            VALUES (?, ?, ?, ?, ?)
-        ''', ('admin', self.hash_password('admin123'), 'System Administrator', 'EMP001', 'Manager'))
-        
-        self.conn.commit()
+        self.conn = sqlite3.connect(DB_PATH)
+        self.cursor = TracingCursor(self.conn.cursor())
+        
+        # WAL lets the UI keep reading while the writer thread commits
+        self.cursor.execute('PRAGMA journal_mode=WAL')
+        
+        # DDL only runs when the schema fingerprint in user_version is stale
+        if ensure_schema(self.conn) == 0:
+            # First run: create default admin employee
+            self.cursor.execute('''
+                INSERT OR IGNORE INTO employees (username, password, full_name, employee_id, position)
+                VALUES (?, ?, ?, ?, ?)
+            ''', ('admin', self.hash_password('admin123'), 'System Administrator', 'EMP001', 'Manager'))
+            
+            self.conn.commit()
     
     def hash_password(self, password):
         """Hash password using SHA-256"""
@@ -214,6 +259,7 @@ class BankingSystem:
         # Bind Enter key to login
         self.root.bind('<Return>', lambda e: self.login())
     
+    @traced()
     def login(self):
         """Handle user login"""
         username = self.username_entry.get().strip()
@@ -224,12 +270,15 @@ class BankingSystem:
             messagebox.showerror("Error", "Please fill in all fields")
             return
         
-        hashed_password = self.hash_password(password)
+        started = time.perf_counter()
+        with tracing.span('hash_password'):
+            hashed_password = self.hash_password(password)
         
         if user_type == "customer":
             self.cursor.execute('SELECT * FROM users WHERE username = ? AND password = ?',
                               (username, hashed_password))
             user = self.cursor.fetchone()
+            self.record_login('customer_login', user, started)
             if user:
                 self.current_user = user[0]  # user ID
                 self.current_user_type = "customer"
@@ -241,6 +290,7 @@ class BankingSystem:
             self.cursor.execute('SELECT * FROM employees WHERE username = ? AND password = ?',
                               (username, hashed_password))
             employee = self.cursor.fetchone()
+            self.record_login('employee_login', employee, started)
             if employee:
                 self.current_user = employee[0]  # employee ID
                 self.current_user_type = "employee"
@@ -248,6 +298,10 @@ class BankingSystem:
             else:
                 messagebox.showerror("Error", "Invalid credentials")
     
+    def record_login(self, operation, account, started):
+        OPERATION_SECONDS.observe(time.perf_counter() - started, operation)
+        OPERATIONS.inc(operation, 'ok' if account else 'rejected')
+    
     def show_register_screen(self):
         """Display customer registration screen"""
         self.clear_window()
@@ -325,23 +379,30 @@ class BankingSystem:
             return
         
         try:
-            # Insert user
-            self.cursor.execute('''
-                INSERT INTO users (username, password, full_name, email, phone, address)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (data['username'], self.hash_password(data['password']), 
-                  data['full_name'], data['email'], data['phone'], data['address']))
+            # Rolls back on error, so a failed insert does not hold the write lock
+            with self.conn:
+                # Insert user
+                self.cursor.execute('''
+                    INSERT INTO users (username, password, full_name, email, phone, address,
+                                       email_norm, phone_norm)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (data['username'], self.hash_password(data['password']), 
+                      data['full_name'], data['email'], data['phone'], data['address'],
+                      normalize_email(data['email']), normalize_phone(data['phone'])))
             
-            user_id = self.cursor.lastrowid
+                user_id = self.cursor.lastrowid
             
-            # Create default account
-            account_number = f"ACC{user_id:06d}"
-            self.cursor.execute('''
-                INSERT INTO accounts (user_id, account_number, account_type, balance)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, account_number, 'Savings', 0.0))
+                # Create default account
+                account_number = next_account_number(self.cursor)
+                self.cursor.execute('''
+                    INSERT INTO accounts (user_id, account_number, account_type, balance)
+                    VALUES (?, ?, ?, ?)
+                ''', (user_id, account_number, 'Savings', 0.0))
             
-            self.conn.commit()
+                tracing.commit(self.conn)
+            self.accounts_cache.invalidate(account_number)
+            self.payee_directory.account_opened(account_number)
+            self.account_table.refresh(self.cursor, account_number)
             messagebox.showinfo("Success", f"Account created successfully!\nAccount Number: {account_number}")
             self.show_login_screen()
             
@@ -388,6 +449,7 @@ class BankingSystem:
             ("Close Account", self.close_account),
             ("Account Details", self.show_account_details),
             ("Update Details", self.update_account_details),
+            ("Standing Orders", self.show_standing_orders),
             ("Request Loan", self.request_loan),
             ("Generate Statement", self.generate_statement),
             ("Change Password", self.change_password)
@@ -400,6 +462,8 @@ class BankingSystem:
         # Main content area
         self.main_content = tk.Frame(content_frame, bg='white', relief='raised', bd=1)
         self.main_content.pack(side='right', fill='both', expand=True)
+        from screens import ScreenRegistry
+        self.screens = ScreenRegistry(self.main_content)
         
         # Show default content
         self.show_balance()
@@ -453,6 +517,14 @@ class BankingSystem:
         # Main content area
         self.main_content = tk.Frame(content_frame, bg='white', relief='raised', bd=1)
         self.main_content.pack(side='right', fill='both', expand=True)
+        from screens import ScreenRegistry
+        self.screens = ScreenRegistry(self.main_content)
+        
+        if self.replica is None:
+            from reporting import ReplicaConnections, ReportingReplica
+            self.replica = ReportingReplica(DB_PATH)
+            self.report_conns = ReplicaConnections()
+            self.replica.start()
         
         # Show default content
         self.show_bank_stats()
@@ -482,62 +554,93 @@ class BankingSystem:
             'position': employee[5]
         }
     
-    def clear_main_content(self):
-        """Clear main content area"""
-        for widget in self.main_content.winfo_children():
-            widget.destroy()
+    def reporting_cursor(self):
+        """Cursor for employee reports: the replica once ready, else the live database"""
+        if self.replica.generation != self.report_generation:
+            # The old connection stays open while list screens still stream from it
+            self.report_conns.replace(self.replica.connect())
+            self.report_generation = self.replica.generation
+        # A cursor of its own, since list screens keep reading from it across Tk events
+        report_conn = self.report_conns.current
+        return report_conn.cursor() if report_conn else TracingCursor(self.conn.cursor())
+    
+    def data_age_text(self):
+        """Describe how old the reporting data on a screen is"""
+        age = self.replica.age() if self.report_conns.current else None
+        if age is None:
+            return "Live data"
+        as_of = datetime.fromtimestamp(self.replica.refreshed_at).strftime('%H:%M:%S')
+        return f"Data as of {as_of} ({int(age)}s ago)"
     
     def show_balance(self):
         """Show account balance"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="Account Balance", style='Heading.TLabel').pack(pady=20)
-        
-        # Get user accounts
-        self.cursor.execute('''
-            SELECT account_number, account_type, balance 
-            FROM accounts WHERE user_id = ?
-        ''', (self.current_user,))
-        accounts = self.cursor.fetchall()
+        self.screens.show('balance', self.build_balance_screen)
+    
+    def build_balance_screen(self, frame):
+        """Build the balance screen; account cards are reused between visits"""
+        ttk.Label(frame, text="Account Balance", style='Heading.TLabel').pack(pady=20)
+        cards = []
         
-        for account in accounts:
-            account_frame = tk.Frame(self.main_content, bg=self.colors['light'], relief='raised', bd=1)
-            account_frame.pack(pady=10, padx=20, fill='x')
+        def refresh():
+            # Get user accounts
+            self.cursor.execute('''
+                SELECT account_number, account_type, balance, currency
+                FROM accounts WHERE user_id = ? AND status != 'closed'
+            ''', (self.current_user,))
+            accounts = self.cursor.fetchall()
             
-            tk.Label(account_frame, text=f"Account: {account[0]}", 
-                    bg=self.colors['light'], font=('Arial', 14, 'bold')).pack(pady=10)
-            tk.Label(account_frame, text=f"Type: {account[1]}", 
-                    bg=self.colors['light'], font=('Arial', 12)).pack()
-            tk.Label(account_frame, text=f"Balance: ${account[2]:,.2f}", 
-                    bg=self.colors['light'], font=('Arial', 16, 'bold'),
-                    fg=self.colors['success']).pack(pady=10)
+            # Only create cards when there are more accounts than ever shown
+            while len(cards) < len(accounts):
+                account_frame = tk.Frame(frame, bg=self.colors['light'], relief='raised', bd=1)
+                number_label = tk.Label(account_frame, bg=self.colors['light'], font=('Arial', 14, 'bold'))
+                number_label.pack(pady=10)
+                type_label = tk.Label(account_frame, bg=self.colors['light'], font=('Arial', 12))
+                type_label.pack()
+                balance_label = tk.Label(account_frame, bg=self.colors['light'], font=('Arial', 16, 'bold'),
+                                         fg=self.colors['success'])
+                balance_label.pack(pady=10)
+                cards.append((account_frame, number_label, type_label, balance_label))
+            
+            for i, (account_frame, number_label, type_label, balance_label) in enumerate(cards):
+                if i >= len(accounts):
+                    account_frame.pack_forget()
+                    continue
+                account = accounts[i]
+                number_label.config(text=f"Account: {account[0]}")
+                type_label.config(text=f"Type: {account[1]}")
+                balance_label.config(text=f"Balance: {format_money(account[2], account[3])}")
+                account_frame.pack(pady=10, padx=20, fill='x')
+        
+        return refresh
     
     def show_transfer(self):
         """Show money transfer form"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="Transfer Money", style='Heading.TLabel').pack(pady=20)
+        self.screens.show('transfer', self.build_transfer_screen)
+    
+    def build_transfer_screen(self, frame):
+        """Build the money transfer form"""
+        ttk.Label(frame, text="Transfer Money", style='Heading.TLabel').pack(pady=20)
         
         # Transfer form
-        form_frame = tk.Frame(self.main_content, bg='white')
+        form_frame = tk.Frame(frame, bg='white')
         form_frame.pack(pady=20, padx=40, fill='x')
         
         # From account
         ttk.Label(form_frame, text="From Account:", background='white').pack(anchor='w', pady=(0, 5))
         self.from_account_var = tk.StringVar()
         from_combo = ttk.Combobox(form_frame, textvariable=self.from_account_var, state='readonly')
-        
-        # Get user accounts
-        self.cursor.execute('SELECT account_number, balance FROM accounts WHERE user_id = ?', 
-                          (self.current_user,))
-        accounts = self.cursor.fetchall()
-        from_combo['values'] = [f"{acc[0]} (Balance: ${acc[1]:,.2f})" for acc in accounts]
         from_combo.pack(fill='x', pady=(0, 15))
         
         # To account
         ttk.Label(form_frame, text="To Account Number:", background='white').pack(anchor='w', pady=(0, 5))
         self.to_account_entry = ttk.Entry(form_frame, font=('Arial', 12))
-        self.to_account_entry.pack(fill='x', pady=(0, 15))
+        self.to_account_entry.pack(fill='x', pady=(0, 5))
+        self.to_account_entry.bind('<KeyRelease>', lambda e: self.update_payee_suggestions())
+        
+        # Autocomplete suggestions from the in-memory payee index
+        self.payee_suggestions = tk.Listbox(form_frame, height=4, font=('Arial', 10))
+        self.payee_suggestions.pack(fill='x', pady=(0, 15))
+        self.payee_suggestions.bind('<<ListboxSelect>>', lambda e: self.select_payee_suggestion())
         
         # Amount
         ttk.Label(form_frame, text="Amount:", background='white').pack(anchor='w', pady=(0, 5))
@@ -552,90 +655,111 @@ class BankingSystem:
         # Transfer button
         ttk.Button(form_frame, text="Transfer", style='Success.TButton',
                   command=self.process_transfer).pack()
+        
+        def refresh():
+            # Get user accounts
+            self.cursor.execute("SELECT account_number, balance, currency FROM accounts WHERE user_id = ? AND status != 'closed'", 
+                              (self.current_user,))
+            accounts = self.cursor.fetchall()
+            from_combo['values'] = [f"{acc[0]} (Balance: {format_money(acc[1], acc[2])})" for acc in accounts]
+            self.from_account_var.set('')
+            for entry in (self.to_account_entry, self.amount_entry, self.desc_entry):
+                entry.delete(0, 'end')
+            self.update_payee_suggestions()
+            # A fresh key per form, so a resubmitted (retried) transfer is posted once
+            self.transfer_key = uuid.uuid4().hex
+        
+        return refresh
     
+    def update_payee_suggestions(self):
+        """Refresh payee suggestions for the typed account number prefix"""
+        suggestions = self.payee_directory.complete(self.cursor, self.current_user,
+                                                    self.to_account_entry.get())
+        self.payee_suggestions.delete(0, 'end')
+        for account_number in suggestions:
+            self.payee_suggestions.insert('end', account_number)
+    
+    def select_payee_suggestion(self):
+        """Copy the selected suggestion into the To Account field"""
+        selection = self.payee_suggestions.curselection()
+        if selection:
+            self.to_account_entry.delete(0, 'end')
+            self.to_account_entry.insert(0, self.payee_suggestions.get(selection[0]))
+    
+    @traced()
     def process_transfer(self):
         """Process money transfer"""
         try:
-            from_account = self.from_account_var.get().split(' ')[0]
-            to_account = self.to_account_entry.get().strip()
-            amount = float(self.amount_entry.get().strip())
-            description = self.desc_entry.get().strip() or "Transfer"
+            with tracing.span('validate'):
+                from_account = self.from_account_var.get().split(' ')[0]
+                to_account = self.to_account_entry.get().strip()
+                amount = float(self.amount_entry.get().strip())
+                description = self.desc_entry.get().strip() or "Transfer"
             
             if not from_account or not to_account or amount <= 0:
                 messagebox.showerror("Error", "Please fill in all required fields")
                 return
             
-            # Check if accounts exist and get balances
-            self.cursor.execute('SELECT id, balance FROM accounts WHERE account_number = ?', (from_account,))
-            from_acc = self.cursor.fetchone()
-            
-            self.cursor.execute('SELECT id FROM accounts WHERE account_number = ?', (to_account,))
-            to_acc = self.cursor.fetchone()
-            
-            if not from_acc or not to_acc:
-                messagebox.showerror("Error", "Invalid account number")
-                return
-            
-            if from_acc[1] < amount:
-                messagebox.showerror("Error", "Insufficient funds")
-                return
-            
-            # Process transfer
-            self.cursor.execute('UPDATE accounts SET balance = balance - ? WHERE id = ?', 
-                              (amount, from_acc[0]))
-            self.cursor.execute('UPDATE accounts SET balance = balance + ? WHERE id = ?', 
-                              (amount, to_acc[0]))
-            
-            # Record transactions
-            self.cursor.execute('''
-                INSERT INTO transactions (account_id, transaction_type, amount, description)
-                VALUES (?, ?, ?, ?)
-            ''', (from_acc[0], 'Transfer Out', -amount, f"Transfer to {to_account}: {description}"))
+            # Frozen accounts are rejected before anything is queued; the debit re-checks atomically
+            self.frozen_accounts.check(from_account)
             
-            self.cursor.execute('''
-                INSERT INTO transactions (account_id, transaction_type, amount, description)
-                VALUES (?, ?, ?, ?)
-            ''', (to_acc[0], 'Transfer In', amount, f"Transfer from {from_account}: {description}"))
-            
-            self.conn.commit()
-            messagebox.showinfo("Success", f"Transfer of ${amount:,.2f} completed successfully")
+            # Process transfer through the group-commit writer
+            posting = self.writer.execute(self.ledger.transfer, from_account, to_account, amount, description,
+                                          idempotency_key=self.transfer_key)
+            self.payee_directory.payee_used(self.current_user, to_account)
+            messagebox.showinfo("Success", f"Transfer of {format_money(amount, posting.currency)} completed successfully")
             self.show_balance()
             
+        except ScreeningError as e:
+            messagebox.showerror("Transfer Blocked", str(e))
+        except AccountFrozenError as e:
+            messagebox.showerror("Account Frozen", str(e))
+        except LedgerError as e:
+            messagebox.showerror("Error", str(e))
         except Exception as e:
             messagebox.showerror("Error", f"Transfer failed: {str(e)}")
     
     def show_transaction_history(self):
         """Show transaction history"""
-        self.clear_main_content()
+        self.screens.show('transaction_history', self.build_transaction_history_screen)
+    
+    def build_transaction_history_screen(self, frame):
+        """Build the transaction history screen"""
+        ttk.Label(frame, text="Transaction History", style='Heading.TLabel').pack(pady=20)
         
-        ttk.Label(self.main_content, text="Transaction History", style='Heading.TLabel').pack(pady=20)
+        tree = self.create_tree(frame, ('Date', 'Type', 'Amount', 'Description'), width=150)
         
-        # Create treeview
-        tree_frame = tk.Frame(self.main_content)
+        def refresh():
+            tree.delete(*tree.get_children())
+            
+            # Get transactions
+            self.cursor.execute('''
+                SELECT t.timestamp, t.transaction_type, t.amount, t.description, a.currency
+                FROM transactions t
+                JOIN accounts a ON t.account_id = a.id
+                WHERE (a.user_id = ?1 AND a.status != 'closed') OR (a.user_id = ?1 AND a.status = 'closed')
+                ORDER BY t.timestamp DESC
+            ''', (self.current_user,))
+
+            transactions = self.cursor.fetchall()
+
+            for transaction in transactions:
+                date = datetime.strptime(transaction[0], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M')
+                amount_str = format_money(transaction[2], transaction[4])
+                tree.insert('', 'end', values=(date, transaction[1], amount_str, transaction[3]))
+        
+        return refresh
+    
+    def create_tree(self, parent, columns, width=120, height=15):
+        """Create a scrollable Treeview with one heading per column"""
+        tree_frame = tk.Frame(parent)
         tree_frame.pack(pady=20, padx=20, fill='both', expand=True)
         
-        columns = ('Date', 'Type', 'Amount', 'Description')
-        tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=15)
+        tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=height)
         
         for col in columns:
             tree.heading(col, text=col)
-            tree.column(col, width=150)
-        
-        # Get transactions
-        self.cursor.execute('''
-            SELECT t.timestamp, t.transaction_type, t.amount, t.description
-            FROM transactions t
-            JOIN accounts a ON t.account_id = a.id
-            WHERE a.user_id = ?
-            ORDER BY t.timestamp DESC
-        ''', (self.current_user,))
-        
-        transactions = self.cursor.fetchall()
-        
-        for transaction in transactions:
-            date = datetime.strptime(transaction[0], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M')
-            amount_str = f"${transaction[2]:,.2f}" if transaction[2] >= 0 else f"-${abs(transaction[2]):,.2f}"
-            tree.insert('', 'end', values=(date, transaction[1], amount_str, transaction[3]))
+            tree.column(col, width=width)
         
         tree.pack(fill='both', expand=True)
         
@@ -643,156 +767,163 @@ class BankingSystem:
         scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=tree.yview)
         tree.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side='right', fill='y')
+        return tree
     
-    def show_account_details(self):
-        """Show account details"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="Account Details", style='Heading.TLabel').pack(pady=20)
-        
-        user_info = self.get_user_info()
-        
-        details_frame = tk.Frame(self.main_content, bg=self.colors['light'], relief='raised', bd=1)
+    def create_tree_stream(self, screen_name, parent, tree):
+        """Stream rows into ``tree`` in chunks with a row counter; stops when the screen is left"""
+        from screens import TreeStream
+        
+        counter = ttk.Label(parent, style='Info.TLabel')
+        counter.pack(pady=(0, 10))
+        stream = TreeStream(tree, counter, on_open=self.report_conns.hold, on_close=self.report_conns.release)
+        self.screens.on_hide(screen_name, stream.cancel)
+        return stream
+    
+    def create_detail_rows(self, parent, labels):
+        """Create label/value rows and return the value labels by name"""
+        details_frame = tk.Frame(parent, bg=self.colors['light'], relief='raised', bd=1)
         details_frame.pack(pady=20, padx=40, fill='x')
         
-        details = [
-            ('Full Name', user_info['full_name']),
-            ('Username', user_info['username']),
-            ('Email', user_info['email']),
-            ('Phone', user_info['phone']),
-            ('Address', user_info['address'])
-        ]
-        
-        for label, value in details:
+        values = {}
+        for label in labels:
             row_frame = tk.Frame(details_frame, bg=self.colors['light'])
             row_frame.pack(fill='x', pady=10, padx=20)
             
             tk.Label(row_frame, text=f"{label}:", bg=self.colors['light'], 
                     font=('Arial', 12, 'bold')).pack(side='left')
-            tk.Label(row_frame, text=value, bg=self.colors['light'], 
-                    font=('Arial', 12)).pack(side='right')
+            values[label] = tk.Label(row_frame, bg=self.colors['light'], font=('Arial', 12))
+            values[label].pack(side='right')
+        return values
     
-    def show_all_customers(self):
-        """Show all customers (employee view)"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="All Customers", style='Heading.TLabel').pack(pady=20)
+    def show_account_details(self):
+        """Show account details"""
+        self.screens.show('account_details', self.build_account_details_screen)
+    
+    def build_account_details_screen(self, frame):
+        """Build the account details screen"""
+        ttk.Label(frame, text="Account Details", style='Heading.TLabel').pack(pady=20)
         
-        # Create treeview
-        tree_frame = tk.Frame(self.main_content)
-        tree_frame.pack(pady=20, padx=20, fill='both', expand=True)
+        values = self.create_detail_rows(frame, ('Full Name', 'Username', 'Email', 'Phone', 'Address'))
         
-        columns = ('ID', 'Username', 'Full Name', 'Email', 'Phone', 'Joined')
-        tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=15)
+        def refresh():
+            user_info = self.get_user_info()
+            values['Full Name'].config(text=user_info['full_name'])
+            values['Username'].config(text=user_info['username'])
+            values['Email'].config(text=user_info['email'])
+            values['Phone'].config(text=user_info['phone'])
+            values['Address'].config(text=user_info['address'])
         
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=120)
+        return refresh
+    
+    def show_all_customers(self):
+        """Show all customers (employee view)"""
+        self.screens.show('all_customers', self.build_all_customers_screen)
+    
+    def build_all_customers_screen(self, frame):
+        """Build the customer list screen"""
+        ttk.Label(frame, text="All Customers", style='Heading.TLabel').pack(pady=20)
+        age_label = ttk.Label(frame, style='Info.TLabel')
+        age_label.pack()
         
-        # Get all customers
-        self.cursor.execute('SELECT * FROM users ORDER BY created_at DESC')
-        customers = self.cursor.fetchall()
+        tree = self.create_tree(frame, ('ID', 'Username', 'Full Name', 'Email', 'Phone', 'Joined'))
+        stream = self.create_tree_stream('all_customers', frame, tree)
         
-        for customer in customers:
+        def format_customer(customer):
             joined_date = datetime.strptime(customer[7], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d')
-            tree.insert('', 'end', values=(customer[0], customer[1], customer[3], 
-                                         customer[4], customer[5], joined_date))
+            return (customer[0], customer[1], customer[3], customer[4], customer[5], joined_date)
         
-        tree.pack(fill='both', expand=True)
+        def refresh():
+            cursor = self.reporting_cursor()
+            age_label.config(text=self.data_age_text())
+            
+            # Get all customers
+            cursor.execute('SELECT * FROM users ORDER BY created_at DESC')
+            stream.start(cursor, format_customer)
         
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side='right', fill='y')
+        return refresh
     
     def show_all_accounts(self):
         """Show all accounts (employee view)"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="All Accounts", style='Heading.TLabel').pack(pady=20)
-        
-        # Create treeview
-        tree_frame = tk.Frame(self.main_content)
-        tree_frame.pack(pady=20, padx=20, fill='both', expand=True)
+        self.screens.show('all_accounts', self.build_all_accounts_screen)
+    
+    def build_all_accounts_screen(self, frame):
+        """Build the account list screen"""
+        ttk.Label(frame, text="All Accounts", style='Heading.TLabel').pack(pady=20)
+        age_label = ttk.Label(frame, style='Info.TLabel')
+        age_label.pack()
         
-        columns = ('Account No', 'Customer', 'Type', 'Balance', 'Created')
-        tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=15)
+        tree = self.create_tree(frame, ('Account No', 'Customer', 'Type', 'Balance', 'Created', 'Status'))
+        stream = self.create_tree_stream('all_accounts', frame, tree)
         
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=120)
-        
-        # Get all accounts with customer names
-        self.cursor.execute('''
-            SELECT a.account_number, u.full_name, a.account_type, a.balance, a.created_at
-            FROM accounts a
-            JOIN users u ON a.user_id = u.id
-            ORDER BY a.created_at DESC
-        ''')
-        accounts = self.cursor.fetchall()
-        
-        for account in accounts:
+        def format_account(account):
             created_date = datetime.strptime(account[4], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d')
-            tree.insert('', 'end', values=(account[0], account[1], account[2], 
-                                         f"${account[3]:,.2f}", created_date))
+            return (account[0], account[1], account[2], format_money(account[3], account[6]), created_date,
+                    account[5].capitalize())
         
-        tree.pack(fill='both', expand=True)
+        def refresh():
+            cursor = self.reporting_cursor()
+            age_label.config(text=self.data_age_text())
+            
+            # Get all accounts with customer names
+            cursor.execute('''
+                SELECT a.account_number, u.full_name, a.account_type, a.balance, a.created_at, a.status,
+                       a.currency
+                FROM accounts a
+                JOIN users u ON a.user_id = u.id
+                ORDER BY a.created_at DESC
+            ''')
+            stream.start(cursor, format_account)
         
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side='right', fill='y')
+        return refresh
     
     def show_all_transactions(self):
         """Show all transactions (employee view)"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="All Transactions", style='Heading.TLabel').pack(pady=20)
-        
-        # Create treeview
-        tree_frame = tk.Frame(self.main_content)
-        tree_frame.pack(pady=20, padx=20, fill='both', expand=True)
-        
-        columns = ('Date', 'Account', 'Customer', 'Type', 'Amount', 'Description')
-        tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=15)
-        
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=120)
-        
-        # Get all transactions with account and customer info
-        self.cursor.execute('''
-            SELECT t.timestamp, a.account_number, u.full_name, t.transaction_type, 
-                   t.amount, t.description
-            FROM transactions t
-            JOIN accounts a ON t.account_id = a.id
-            JOIN users u ON a.user_id = u.id
-            ORDER BY t.timestamp DESC
-            LIMIT 100
-        ''')
-        transactions = self.cursor.fetchall()
-        
-        for transaction in transactions:
-            date = datetime.strptime(transaction[0], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M')
-            amount_str = f"${transaction[4]:,.2f}" if transaction[4] >= 0 else f"-${abs(transaction[4]):,.2f}"
-            tree.insert('', 'end', values=(date, transaction[1], transaction[2], 
-                                         transaction[3], amount_str, transaction[5]))
-        
-        tree.pack(fill='both', expand=True)
+        self.screens.show('all_transactions', self.build_all_transactions_screen)
+    
+    def build_all_transactions_screen(self, frame):
+        """Build the transaction list screen"""
+        ttk.Label(frame, text="All Transactions", style='Heading.TLabel').pack(pady=20)
+        age_label = ttk.Label(frame, style='Info.TLabel')
+        age_label.pack()
+        
+        tree = self.create_tree(frame, ('Date', 'Account', 'Customer', 'Type', 'Amount', 'Description'))
+        
+        def refresh():
+            cursor = self.reporting_cursor()
+            age_label.config(text=self.data_age_text())
+            tree.delete(*tree.get_children())
+            
+            # Get the latest transactions with account and customer info; CROSS JOIN keeps
+            # transactions as the outer loop so the timestamp index stops at the LIMIT
+            cursor.execute('''
+                SELECT t.timestamp, a.account_number, u.full_name, t.transaction_type,
+                       t.amount, t.description, a.currency
+                FROM transactions t
+                CROSS JOIN accounts a ON t.account_id = a.id
+                CROSS JOIN users u ON a.user_id = u.id
+                ORDER BY t.timestamp DESC
+                LIMIT 100
+            ''')
+            transactions = cursor.fetchall()
+            
+            for transaction in transactions:
+                date = datetime.strptime(transaction[0], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M')
+                amount_str = format_money(transaction[4], transaction[6])
+                tree.insert('', 'end', values=(date, transaction[1], transaction[2], 
+                                             transaction[3], amount_str, transaction[5]))
         
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side='right', fill='y')
+        return refresh
     
     def show_create_employee(self):
         """Show create employee form"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="Create New Employee", style='Heading.TLabel').pack(pady=20)
+        self.screens.show('create_employee', self.build_create_employee_screen)
+    
+    def build_create_employee_screen(self, frame):
+        """Build the create employee form"""
+        ttk.Label(frame, text="Create New Employee", style='Heading.TLabel').pack(pady=20)
         
         # Employee form
-        form_frame = tk.Frame(self.main_content, bg='white')
+        form_frame = tk.Frame(frame, bg='white')
         form_frame.pack(pady=20, padx=40, fill='x')
         
         # Form fields
@@ -817,6 +948,12 @@ class BankingSystem:
         # Create button
         ttk.Button(form_frame, text="Create Employee", style='Success.TButton',
                   command=self.create_employee).pack(pady=20)
+        
+        def refresh():
+            for entry in self.emp_entries.values():
+                entry.delete(0, 'end')
+        
+        return refresh
     
     def create_employee(self):
         """Create new employee"""
@@ -829,13 +966,14 @@ class BankingSystem:
             return
         
         try:
-            self.cursor.execute('''
-                INSERT INTO employees (username, password, full_name, employee_id, position)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (data['username'], self.hash_password(data['password']), 
-                  data['full_name'], data['employee_id'], data['position']))
+            with self.conn:
+                self.cursor.execute('''
+                    INSERT INTO employees (username, password, full_name, employee_id, position)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (data['username'], self.hash_password(data['password']), 
+                      data['full_name'], data['employee_id'], data['position']))
             
-            self.conn.commit()
+                tracing.commit(self.conn)
             messagebox.showinfo("Success", "Employee created successfully!")
             
             # Clear form
@@ -847,42 +985,31 @@ class BankingSystem:
     
     def show_bank_stats(self):
         """Show bank statistics"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="Bank Statistics", style='Heading.TLabel').pack(pady=20)
+        self.screens.show('bank_stats', self.build_bank_stats_screen)
+    
+    def build_bank_stats_screen(self, frame):
+        """Build the bank statistics screen"""
+        ttk.Label(frame, text="Bank Statistics", style='Heading.TLabel').pack(pady=20)
+        age_label = ttk.Label(frame, style='Info.TLabel')
+        age_label.pack()
         
         # Statistics container
-        stats_container = tk.Frame(self.main_content, bg='white')
+        stats_container = tk.Frame(frame, bg='white')
         stats_container.pack(pady=20, padx=40, fill='both', expand=True)
         
-        # Get statistics
-        self.cursor.execute('SELECT COUNT(*) FROM users')
-        total_customers = self.cursor.fetchone()[0]
-        
-        self.cursor.execute('SELECT COUNT(*) FROM accounts')
-        total_accounts = self.cursor.fetchone()[0]
-        
-        self.cursor.execute('SELECT SUM(balance) FROM accounts')
-        total_deposits = self.cursor.fetchone()[0] or 0
-        
-        self.cursor.execute('SELECT COUNT(*) FROM transactions')
-        total_transactions = self.cursor.fetchone()[0]
-        
-        self.cursor.execute('SELECT COUNT(*) FROM employees')
-        total_employees = self.cursor.fetchone()[0]
-        
-        # Create stat cards
+        # Stat cards
         stats = [
-            ('Total Customers', total_customers, self.colors['secondary']),
-            ('Total Accounts', total_accounts, self.colors['success']),
-            ('Total Deposits', f"${total_deposits:,.2f}", self.colors['warning']),
-            ('Total Transactions', total_transactions, self.colors['danger']),
-            ('Total Employees', total_employees, self.colors['dark'])
+            ('Total Customers', self.colors['secondary']),
+            ('Total Accounts', self.colors['success']),
+            ('Total Deposits', self.colors['warning']),
+            ('Total Transactions', self.colors['danger']),
+            ('Total Employees', self.colors['dark'])
         ]
         
         # Create grid of stat cards
+        value_labels = {}
         row_frame = None
-        for i, (label, value, color) in enumerate(stats):
+        for i, (label, color) in enumerate(stats):
             if i % 2 == 0:  # Start new row
                 row_frame = tk.Frame(stats_container, bg='white')
                 row_frame.pack(fill='x', pady=10)
@@ -891,8 +1018,8 @@ class BankingSystem:
             card = tk.Frame(row_frame, bg=color, relief='raised', bd=2)
             card.pack(side='left', fill='both', expand=True, padx=10, pady=10)
             
-            tk.Label(card, text=str(value), bg=color, fg='white',
-                    font=('Arial', 24, 'bold')).pack(pady=(20, 5))
+            value_labels[label] = tk.Label(card, bg=color, fg='white', font=('Arial', 24, 'bold'))
+            value_labels[label].pack(pady=(20, 5))
             tk.Label(card, text=label, bg=color, fg='white',
                     font=('Arial', 12)).pack(pady=(0, 20))
         
@@ -911,32 +1038,57 @@ class BankingSystem:
             recent_tree.heading(col, text=col)
             recent_tree.column(col, width=150)
         
-        # Get recent transactions
-        self.cursor.execute('''
-            SELECT t.timestamp, u.full_name, t.transaction_type, t.amount
-            FROM transactions t
-            JOIN accounts a ON t.account_id = a.id
-            JOIN users u ON a.user_id = u.id
-            ORDER BY t.timestamp DESC
-            LIMIT 10
-        ''')
-        recent_transactions = self.cursor.fetchall()
-        
-        for transaction in recent_transactions:
-            date = datetime.strptime(transaction[0], '%Y-%m-%d %H:%M:%S').strftime('%m-%d %H:%M')
-            amount_str = f"${transaction[3]:,.2f}" if transaction[3] >= 0 else f"-${abs(transaction[3]):,.2f}"
-            recent_tree.insert('', 'end', values=(date, transaction[1], 
-                                                transaction[2], amount_str))
-        
         recent_tree.pack(fill='both', expand=True)
+        
+        def refresh():
+            cursor = self.reporting_cursor()
+            age_label.config(text=self.data_age_text())
+            
+            # Get statistics
+            cursor.execute('SELECT COUNT(*) FROM users')
+            value_labels['Total Customers'].config(text=str(cursor.fetchone()[0]))
+            
+            cursor.execute("SELECT COUNT(*) FROM accounts WHERE status != 'closed'")
+            value_labels['Total Accounts'].config(text=str(cursor.fetchone()[0]))
+            
+            cursor.execute('SELECT currency, SUM(balance) FROM accounts GROUP BY currency')
+            value_labels['Total Deposits'].config(text=format_totals(dict(cursor.fetchall()), self.fx))
+            
+            cursor.execute('SELECT COUNT(*) FROM transactions')
+            value_labels['Total Transactions'].config(text=str(cursor.fetchone()[0]))
+            
+            cursor.execute('SELECT COUNT(*) FROM employees')
+            value_labels['Total Employees'].config(text=str(cursor.fetchone()[0]))
+            
+            # Get recent transactions (newest first from the timestamp index, see above)
+            recent_tree.delete(*recent_tree.get_children())
+            cursor.execute('''
+                SELECT t.timestamp, u.full_name, t.transaction_type, t.amount, a.currency
+                FROM transactions t
+                CROSS JOIN accounts a ON t.account_id = a.id
+                CROSS JOIN users u ON a.user_id = u.id
+                ORDER BY t.timestamp DESC
+                LIMIT 10
+            ''')
+            recent_transactions = cursor.fetchall()
+            
+            for transaction in recent_transactions:
+                date = datetime.strptime(transaction[0], '%Y-%m-%d %H:%M:%S').strftime('%m-%d %H:%M')
+                amount_str = format_money(transaction[3], transaction[4])
+                recent_tree.insert('', 'end', values=(date, transaction[1], 
+                                                    transaction[2], amount_str))
+        
+        return refresh
     
     def create_new_account(self):
         """Allow customer to create a new account"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="Open New Account", style='Heading.TLabel').pack(pady=20)
+        self.screens.show('create_new_account', self.build_create_new_account_screen)
+    
+    def build_create_new_account_screen(self, frame):
+        """Build the open new account form"""
+        ttk.Label(frame, text="Open New Account", style='Heading.TLabel').pack(pady=20)
         
-        form_frame = tk.Frame(self.main_content, bg='white')
+        form_frame = tk.Frame(frame, bg='white')
         form_frame.pack(pady=20, padx=40, fill='x')
         
         # Account type selection
@@ -945,6 +1097,12 @@ class BankingSystem:
         ttk.Combobox(form_frame, textvariable=self.new_account_type, 
                     values=["Savings", "Checking", "Business"], state='readonly').pack(fill='x', pady=(0, 15))
         
+        # Currency selection
+        ttk.Label(form_frame, text="Currency:", background='white').pack(anchor='w', pady=(0, 5))
+        self.new_account_currency = tk.StringVar(value=self.fx.base)
+        currency_combo = ttk.Combobox(form_frame, textvariable=self.new_account_currency, state='readonly')
+        currency_combo.pack(fill='x', pady=(0, 15))
+        
         # Initial deposit
         ttk.Label(form_frame, text="Initial Deposit:", background='white').pack(anchor='w', pady=(0, 5))
         self.initial_deposit = ttk.Entry(form_frame, font=('Arial', 12))
@@ -953,84 +1111,91 @@ class BankingSystem:
         # Create button
         ttk.Button(form_frame, text="Create Account", style='Success.TButton',
                  command=self.process_new_account).pack()
-
+        
+        def refresh():
+            self.new_account_type.set("Savings")
+            # Only currencies with a loaded rate can take part in transfers
+            currency_combo['values'] = [c for c in CURRENCIES if c in self.fx.currencies()]
+            self.new_account_currency.set(self.fx.base)
+            self.initial_deposit.delete(0, 'end')
+            # One key per form, so a retried submit cannot open a second account
+            self.new_account_key = uuid.uuid4().hex
+        
+        return refresh
+    
+    @traced()
     def process_new_account(self):
         """Process the creation of a new account"""
         try:
             account_type = self.new_account_type.get()
+            currency = self.new_account_currency.get()
             initial_deposit = float(self.initial_deposit.get().strip())
             
             if initial_deposit < 0:
                 messagebox.showerror("Error", "Initial deposit cannot be negative")
                 return
                 
-            # Generate account number
-            self.cursor.execute('SELECT COUNT(*) FROM accounts WHERE user_id = ?', (self.current_user,))
-            account_count = self.cursor.fetchone()[0] + 1
-            account_number = f"ACC{self.current_user:04d}-{account_count:02d}"
-            
-            # Create account
-            self.cursor.execute('''
-                INSERT INTO accounts (user_id, account_number, account_type, balance)
-                VALUES (?, ?, ?, ?)
-            ''', (self.current_user, account_number, account_type, initial_deposit))
-            
-            # Record initial deposit transaction
-            account_id = self.cursor.lastrowid
-            self.cursor.execute('''
-                INSERT INTO transactions (account_id, transaction_type, amount, description)
-                VALUES (?, ?, ?, ?)
-            ''', (account_id, 'Deposit', initial_deposit, 'Initial deposit'))
-            
-            self.conn.commit()
-            messagebox.showinfo("Success", f"New {account_type} account created successfully!\nAccount Number: {account_number}")
+            posting = self.writer.execute(self.ledger.open_account, self.current_user, account_type, currency,
+                                          initial_deposit, idempotency_key=self.new_account_key)
+            account_number = posting.payee
+            self.accounts_cache.invalidate(account_number)
+            self.payee_directory.account_opened(account_number)
+            self.account_table.refresh(self.cursor, account_number)
+            messagebox.showinfo("Success", f"New {account_type} account ({currency}) created successfully!\nAccount Number: {account_number}")
             self.show_balance()
             
         except ValueError:
             messagebox.showerror("Error", "Please enter a valid amount")
+        except LedgerError as e:
+            messagebox.showerror("Error", str(e))
         except Exception as e:
             messagebox.showerror("Error", f"Account creation failed: {str(e)}")
 
     def close_account(self):
         """Allow customer to close an account"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="Close Account", style='Heading.TLabel').pack(pady=20)
+        self.screens.show('close_account', self.build_close_account_screen)
+    
+    def build_close_account_screen(self, frame):
+        """Build the close account form"""
+        ttk.Label(frame, text="Close Account", style='Heading.TLabel').pack(pady=20)
         
-        form_frame = tk.Frame(self.main_content, bg='white')
+        form_frame = tk.Frame(frame, bg='white')
         form_frame.pack(pady=20, padx=40, fill='x')
         
         # Account selection
         ttk.Label(form_frame, text="Select Account to Close:", background='white').pack(anchor='w', pady=(0, 5))
         self.account_to_close = tk.StringVar()
-        
-        # Get user accounts with balances
-        self.cursor.execute('SELECT account_number, balance FROM accounts WHERE user_id = ?', (self.current_user,))
-        accounts = self.cursor.fetchall()
-        
-        if len(accounts) <= 1:
-            messagebox.showerror("Error", "You must have at least one account open")
-            self.show_balance()
-            return
-            
         account_combo = ttk.Combobox(form_frame, textvariable=self.account_to_close, state='readonly')
-        account_combo['values'] = [f"{acc[0]} (Balance: ${acc[1]:,.2f})" for acc in accounts]
         account_combo.pack(fill='x', pady=(0, 15))
         
         # Transfer balance to
         ttk.Label(form_frame, text="Transfer Balance To:", background='white').pack(anchor='w', pady=(0, 5))
         self.transfer_to_account = tk.StringVar()
-        
-        # Get other accounts
-        other_accounts = [acc[0] for acc in accounts if acc[0] != self.account_to_close.get().split(' ')[0]]
         transfer_combo = ttk.Combobox(form_frame, textvariable=self.transfer_to_account, state='readonly')
-        transfer_combo['values'] = other_accounts
         transfer_combo.pack(fill='x', pady=(0, 20))
         
         # Close button
         ttk.Button(form_frame, text="Close Account", style='Danger.TButton',
                  command=self.process_close_account).pack()
-
+        
+        def refresh():
+            # Get user accounts with balances
+            self.cursor.execute("SELECT account_number, balance, currency FROM accounts WHERE user_id = ? AND status != 'closed'", (self.current_user,))
+            accounts = self.cursor.fetchall()
+            
+            if len(accounts) <= 1:
+                messagebox.showerror("Error", "You must have at least one account open")
+                self.show_balance()
+                return
+            
+            account_combo['values'] = [f"{acc[0]} (Balance: {format_money(acc[1], acc[2])})" for acc in accounts]
+            transfer_combo['values'] = [acc[0] for acc in accounts]
+            self.account_to_close.set('')
+            self.transfer_to_account.set('')
+        
+        return refresh
+    
+    @traced()
     def process_close_account(self):
         """Process account closure"""
         try:
@@ -1042,75 +1207,75 @@ class BankingSystem:
                 return
                 
             # Get account details
-            self.cursor.execute('SELECT id, balance FROM accounts WHERE account_number = ?', (account_to_close,))
-            closing_account = self.cursor.fetchone()
-            
-            self.cursor.execute('SELECT id FROM accounts WHERE account_number = ?', (transfer_to_account,))
-            receiving_account = self.cursor.fetchone()
+            closing_account = self.accounts_cache.resolve(self.cursor, account_to_close)
+            receiving_account = self.accounts_cache.resolve(self.cursor, transfer_to_account)
             
             if not closing_account or not receiving_account:
                 messagebox.showerror("Error", "Invalid account selection")
                 return
-                
-            # Transfer balance
-            if closing_account[1] > 0:
-                self.cursor.execute('UPDATE accounts SET balance = balance + ? WHERE id = ?', 
-                                  (closing_account[1], receiving_account[0]))
-                self.cursor.execute('''
-                    INSERT INTO transactions (account_id, transaction_type, amount, description)
-                    VALUES (?, ?, ?, ?)
-                ''', (receiving_account[0], 'Transfer In', closing_account[1], 
-                      f"Balance transfer from closed account {account_to_close}"))
-            
-            # Record closure transaction
-            self.cursor.execute('''
-                INSERT INTO transactions (account_id, transaction_type, amount, description)
-                VALUES (?, ?, ?, ?)
-            ''', (closing_account[0], 'Account Closure', -closing_account[1], 
-                 f"Account closed, balance transferred to {transfer_to_account}"))
-            
-            # Delete account
-            self.cursor.execute('DELETE FROM accounts WHERE id = ?', (closing_account[0],))
+            if closing_account.id == receiving_account.id:
+                messagebox.showerror("Error", "Choose another account to receive the balance")
+                return
+            if closing_account.currency != receiving_account.currency:
+                messagebox.showerror("Error", "The receiving account must be in the same currency")
+                return
+            if account_to_close in self.frozen_accounts:
+                messagebox.showerror("Account Frozen", f"Account {account_to_close} is frozen and cannot be closed")
+                return
             
-            self.conn.commit()
+            # The balance moves on the writer, which also applies it to the account table
+            self.writer.execute(self.ledger.close_account, account_to_close, transfer_to_account)
+            self.accounts_cache.invalidate(account_to_close)
+            self.payee_directory.account_closed(account_to_close)
+            self.account_table.remove(account_to_close)
             messagebox.showinfo("Success", f"Account {account_to_close} closed successfully")
             self.show_balance()
             
+        except LedgerError as e:
+            messagebox.showerror("Error", str(e))
         except Exception as e:
             messagebox.showerror("Error", f"Account closure failed: {str(e)}")
 
     def update_account_details(self):
         """Allow customer to update their personal information"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="Update Account Details", style='Heading.TLabel').pack(pady=20)
-        
-        user_info = self.get_user_info()
+        self.screens.show('update_account_details', self.build_update_account_details_screen)
+    
+    def build_update_account_details_screen(self, frame):
+        """Build the update account details form"""
+        ttk.Label(frame, text="Update Account Details", style='Heading.TLabel').pack(pady=20)
         
-        form_frame = tk.Frame(self.main_content, bg='white')
+        form_frame = tk.Frame(frame, bg='white')
         form_frame.pack(pady=20, padx=40, fill='x')
         
         # Form fields
         self.update_entries = {}
         
         fields = [
-            ('Full Name', 'full_name', user_info['full_name']),
-            ('Email', 'email', user_info['email']),
-            ('Phone', 'phone', user_info['phone']),
-            ('Address', 'address', user_info['address'])
+            ('Full Name', 'full_name'),
+            ('Email', 'email'),
+            ('Phone', 'phone'),
+            ('Address', 'address')
         ]
         
-        for label, key, value in fields:
+        for label, key in fields:
             ttk.Label(form_frame, text=f"{label}:", background='white').pack(anchor='w', pady=(0, 5))
             entry = ttk.Entry(form_frame, font=('Arial', 12))
-            entry.insert(0, value)
             entry.pack(fill='x', pady=(0, 15))
             self.update_entries[key] = entry
         
         # Update button
         ttk.Button(form_frame, text="Update Details", style='Success.TButton',
                   command=self.process_update_details).pack(pady=20)
-
+        
+        def refresh():
+            user_info = self.get_user_info()
+            for key, entry in self.update_entries.items():
+                entry.delete(0, 'end')
+                entry.insert(0, user_info[key])
+        
+        return refresh
+    
+    @traced()
     def process_update_details(self):
         """Process account details update"""
         data = {}
@@ -1131,13 +1296,16 @@ class BankingSystem:
             return
             
         try:
-            self.cursor.execute('''
-                UPDATE users SET full_name = ?, email = ?, phone = ?, address = ?
-                WHERE id = ?
-            ''', (data['full_name'], data['email'], data['phone'], 
-                 data['address'], self.current_user))
+            with self.conn:
+                self.cursor.execute('''
+                    UPDATE users SET full_name = ?, email = ?, phone = ?, address = ?,
+                                     email_norm = ?, phone_norm = ?
+                    WHERE id = ?
+                ''', (data['full_name'], data['email'], data['phone'], 
+                     data['address'], normalize_email(data['email']), normalize_phone(data['phone']),
+                     self.current_user))
             
-            self.conn.commit()
+                tracing.commit(self.conn)
             messagebox.showinfo("Success", "Account details updated successfully")
             self.show_account_details()
             
@@ -1146,22 +1314,19 @@ class BankingSystem:
 
     def deposit_money(self):
         """Dedicated deposit function"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="Deposit Money", style='Heading.TLabel').pack(pady=20)
+        self.screens.show('deposit_money', self.build_deposit_money_screen)
+    
+    def build_deposit_money_screen(self, frame):
+        """Build the deposit form"""
+        ttk.Label(frame, text="Deposit Money", style='Heading.TLabel').pack(pady=20)
         
-        form_frame = tk.Frame(self.main_content, bg='white')
+        form_frame = tk.Frame(frame, bg='white')
         form_frame.pack(pady=20, padx=40, fill='x')
         
         # Account selection
         ttk.Label(form_frame, text="Select Account:", background='white').pack(anchor='w', pady=(0, 5))
         self.deposit_account = tk.StringVar()
-        
-        self.cursor.execute('SELECT account_number FROM accounts WHERE user_id = ?', (self.current_user,))
-        accounts = [acc[0] for acc in self.cursor.fetchall()]
-        
         account_combo = ttk.Combobox(form_frame, textvariable=self.deposit_account, state='readonly')
-        account_combo['values'] = accounts
         account_combo.pack(fill='x', pady=(0, 15))
         
         # Amount
@@ -1177,63 +1342,58 @@ class BankingSystem:
         # Deposit button
         ttk.Button(form_frame, text="Deposit", style='Success.TButton',
                   command=self.process_deposit).pack()
-
+        
+        def refresh():
+            self.cursor.execute("SELECT account_number FROM accounts WHERE user_id = ? AND status != 'closed'", (self.current_user,))
+            account_combo['values'] = [acc[0] for acc in self.cursor.fetchall()]
+            self.deposit_account.set('')
+            self.deposit_amount.delete(0, 'end')
+            self.deposit_desc.delete(0, 'end')
+            self.deposit_key = uuid.uuid4().hex
+        
+        return refresh
+    
+    @traced()
     def process_deposit(self):
         """Process money deposit"""
         try:
-            account_number = self.deposit_account.get()
-            amount = float(self.deposit_amount.get().strip())
-            description = self.deposit_desc.get().strip() or "Deposit"
+            with tracing.span('validate'):
+                account_number = self.deposit_account.get()
+                amount = float(self.deposit_amount.get().strip())
+                description = self.deposit_desc.get().strip() or "Deposit"
             
             if amount <= 0:
                 messagebox.showerror("Error", "Amount must be positive")
                 return
                 
-            # Get account ID
-            self.cursor.execute('SELECT id FROM accounts WHERE account_number = ?', (account_number,))
-            account = self.cursor.fetchone()
-            
-            if not account:
-                messagebox.showerror("Error", "Invalid account selection")
-                return
-                
-            # Update balance
-            self.cursor.execute('UPDATE accounts SET balance = balance + ? WHERE id = ?', 
-                              (amount, account[0]))
-            
-            # Record transaction
-            self.cursor.execute('''
-                INSERT INTO transactions (account_id, transaction_type, amount, description)
-                VALUES (?, ?, ?, ?)
-            ''', (account[0], 'Deposit', amount, description))
-            
-            self.conn.commit()
-            messagebox.showinfo("Success", f"Deposit of ${amount:,.2f} completed successfully")
+            # Update balance and record transaction
+            posting = self.writer.execute(self.ledger.deposit, account_number, amount, description,
+                                          idempotency_key=self.deposit_key)
+            messagebox.showinfo("Success", f"Deposit of {format_money(amount, posting.currency)} completed successfully")
             self.show_balance()
             
         except ValueError:
             messagebox.showerror("Error", "Please enter a valid amount")
+        except LedgerError as e:
+            messagebox.showerror("Error", str(e))
         except Exception as e:
             messagebox.showerror("Error", f"Deposit failed: {str(e)}")
 
     def withdraw_money(self):
         """Dedicated withdrawal function"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="Withdraw Money", style='Heading.TLabel').pack(pady=20)
+        self.screens.show('withdraw_money', self.build_withdraw_money_screen)
+    
+    def build_withdraw_money_screen(self, frame):
+        """Build the withdrawal form"""
+        ttk.Label(frame, text="Withdraw Money", style='Heading.TLabel').pack(pady=20)
         
-        form_frame = tk.Frame(self.main_content, bg='white')
+        form_frame = tk.Frame(frame, bg='white')
         form_frame.pack(pady=20, padx=40, fill='x')
         
         # Account selection
         ttk.Label(form_frame, text="Select Account:", background='white').pack(anchor='w', pady=(0, 5))
         self.withdraw_account = tk.StringVar()
-        
-        self.cursor.execute('SELECT account_number, balance FROM accounts WHERE user_id = ?', (self.current_user,))
-        accounts = self.cursor.fetchall()
-        
         account_combo = ttk.Combobox(form_frame, textvariable=self.withdraw_account, state='readonly')
-        account_combo['values'] = [f"{acc[0]} (Balance: ${acc[1]:,.2f})" for acc in accounts]
         account_combo.pack(fill='x', pady=(0, 15))
         
         # Amount
@@ -1249,56 +1409,59 @@ class BankingSystem:
         # Withdraw button
         ttk.Button(form_frame, text="Withdraw", style='Danger.TButton',
                   command=self.process_withdrawal).pack()
-
+        
+        def refresh():
+            self.cursor.execute("SELECT account_number, balance, currency FROM accounts WHERE user_id = ? AND status != 'closed'", (self.current_user,))
+            accounts = self.cursor.fetchall()
+            account_combo['values'] = [f"{acc[0]} (Balance: {format_money(acc[1], acc[2])})" for acc in accounts]
+            self.withdraw_account.set('')
+            self.withdraw_amount.delete(0, 'end')
+            self.withdraw_desc.delete(0, 'end')
+            self.withdraw_key = uuid.uuid4().hex
+        
+        return refresh
+    
+    @traced()
     def process_withdrawal(self):
         """Process money withdrawal"""
         try:
-            account_number = self.withdraw_account.get().split(' ')[0]
-            amount = float(self.withdraw_amount.get().strip())
-            description = self.withdraw_desc.get().strip() or "Withdrawal"
+            with tracing.span('validate'):
+                account_number = self.withdraw_account.get().split(' ')[0]
+                amount = float(self.withdraw_amount.get().strip())
+                description = self.withdraw_desc.get().strip() or "Withdrawal"
             
             if amount <= 0:
                 messagebox.showerror("Error", "Amount must be positive")
                 return
                 
-            # Get account balance
-            self.cursor.execute('SELECT id, balance FROM accounts WHERE account_number = ?', (account_number,))
-            account = self.cursor.fetchone()
-            
-            if not account:
-                messagebox.showerror("Error", "Invalid account selection")
-                return
-                
-            if account[1] < amount:
-                messagebox.showerror("Error", "Insufficient funds")
-                return
-                
-            # Update balance
-            self.cursor.execute('UPDATE accounts SET balance = balance - ? WHERE id = ?', 
-                              (amount, account[0]))
-            
-            # Record transaction
-            self.cursor.execute('''
-                INSERT INTO transactions (account_id, transaction_type, amount, description)
-                VALUES (?, ?, ?, ?)
-            ''', (account[0], 'Withdrawal', -amount, description))
+            self.frozen_accounts.check(account_number)
             
-            self.conn.commit()
-            messagebox.showinfo("Success", f"Withdrawal of ${amount:,.2f} completed successfully")
+            # Screen, debit and record transaction
+            posting = self.writer.execute(self.ledger.withdraw, account_number, amount, description,
+                                          idempotency_key=self.withdraw_key)
+            messagebox.showinfo("Success", f"Withdrawal of {format_money(amount, posting.currency)} completed successfully")
             self.show_balance()
             
         except ValueError:
             messagebox.showerror("Error", "Please enter a valid amount")
+        except ScreeningError as e:
+            messagebox.showerror("Withdrawal Blocked", str(e))
+        except AccountFrozenError as e:
+            messagebox.showerror("Account Frozen", str(e))
+        except LedgerError as e:
+            messagebox.showerror("Error", str(e))
         except Exception as e:
             messagebox.showerror("Error", f"Withdrawal failed: {str(e)}")
 
     def request_loan(self):
         """Loan application system"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="Loan Application", style='Heading.TLabel').pack(pady=20)
+        self.screens.show('request_loan', self.build_request_loan_screen)
+    
+    def build_request_loan_screen(self, frame):
+        """Build the loan application form"""
+        ttk.Label(frame, text="Loan Application", style='Heading.TLabel').pack(pady=20)
         
-        form_frame = tk.Frame(self.main_content, bg='white')
+        form_frame = tk.Frame(frame, bg='white')
         form_frame.pack(pady=20, padx=40, fill='x')
         
         # Loan amount
@@ -1314,13 +1477,20 @@ class BankingSystem:
         # Duration (months)
         ttk.Label(form_frame, text="Duration (months):", background='white').pack(anchor='w', pady=(0, 5))
         self.loan_duration = ttk.Combobox(form_frame, values=[6, 12, 24, 36, 48, 60], state='readonly')
-        self.loan_duration.set(12)
         self.loan_duration.pack(fill='x', pady=(0, 20))
         
         # Submit button
         ttk.Button(form_frame, text="Submit Application", style='Primary.TButton',
                   command=self.process_loan_request).pack()
-
+        
+        def refresh():
+            self.loan_amount.delete(0, 'end')
+            self.loan_purpose.delete(0, 'end')
+            self.loan_duration.set(12)
+        
+        return refresh
+    
+    @traced()
     def process_loan_request(self):
         """Process loan application"""
         try:
@@ -1336,15 +1506,16 @@ class BankingSystem:
                 messagebox.showerror("Error", "Please specify loan purpose")
                 return
                 
-            # Save loan request
-            self.cursor.execute('''
-                INSERT INTO loan_requests (user_id, amount, purpose, duration)
-                VALUES (?, ?, ?, ?)
-            ''', (self.current_user, amount, purpose, duration))
+            with self.conn:
+                # Save loan request
+                self.cursor.execute('''
+                    INSERT INTO loan_requests (user_id, amount, purpose, duration)
+                    VALUES (?, ?, ?, ?)
+                ''', (self.current_user, amount, purpose, duration))
             
-            self.conn.commit()
+                tracing.commit(self.conn)
             messagebox.showinfo("Success", 
-                             f"Loan application submitted for ${amount:,.2f}\n" +
+                             f"Loan application submitted for {format_money(amount)}\n" +
                              f"Purpose: {purpose}\nDuration: {duration} months\n\n" +
                              "An employee will review your application shortly.")
             self.show_customer_dashboard()
@@ -1354,98 +1525,190 @@ class BankingSystem:
         except Exception as e:
             messagebox.showerror("Error", f"Loan application failed: {str(e)}")
 
-    def show_pending_loans(self):
-        """Show pending loan requests (employee view)"""
-        self.clear_main_content()
+    def show_standing_orders(self):
+        """Show standing orders and a form to set one up"""
+        self.screens.show('standing_orders', self.build_standing_orders_screen)
+    
+    def build_standing_orders_screen(self, frame):
+        """Build the standing orders screen"""
+        ttk.Label(frame, text="Standing Orders", style='Heading.TLabel').pack(pady=20)
         
-        ttk.Label(self.main_content, text="Pending Loan Requests", style='Heading.TLabel').pack(pady=20)
+        form_frame = tk.Frame(frame, bg='white')
+        form_frame.pack(pady=10, padx=40, fill='x')
         
-        # Create treeview
-        tree_frame = tk.Frame(self.main_content)
-        tree_frame.pack(pady=20, padx=20, fill='both', expand=True)
+        # From account
+        ttk.Label(form_frame, text="From Account:", background='white').pack(anchor='w', pady=(0, 5))
+        self.order_from_var = tk.StringVar()
+        from_combo = ttk.Combobox(form_frame, textvariable=self.order_from_var, state='readonly')
+        from_combo.pack(fill='x', pady=(0, 10))
         
-        columns = ('ID', 'Customer', 'Amount', 'Purpose', 'Duration', 'Requested')
-        tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=15)
+        # To account
+        ttk.Label(form_frame, text="To Account Number:", background='white').pack(anchor='w', pady=(0, 5))
+        self.order_to_entry = ttk.Entry(form_frame, font=('Arial', 12))
+        self.order_to_entry.pack(fill='x', pady=(0, 10))
         
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=120)
-        
-        # Get pending loans with customer info
-        self.cursor.execute('''
-            SELECT l.id, u.full_name, l.amount, l.purpose, l.duration, l.created_at
-            FROM loan_requests l
-            JOIN users u ON l.user_id = u.id
-            WHERE l.status = 'Pending'
-            ORDER BY l.created_at
-        ''')
-        loans = self.cursor.fetchall()
-        
-        for loan in loans:
-            requested_date = datetime.strptime(loan[5], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d')
-            tree.insert('', 'end', values=(loan[0], loan[1], f"${loan[2]:,.2f}", 
-                       loan[3], f"{loan[4]} months", requested_date))
+        # Amount
+        ttk.Label(form_frame, text="Amount:", background='white').pack(anchor='w', pady=(0, 5))
+        self.order_amount_entry = ttk.Entry(form_frame, font=('Arial', 12))
+        self.order_amount_entry.pack(fill='x', pady=(0, 10))
+        
+        # Frequency and first payment date
+        schedule_frame = tk.Frame(form_frame, bg='white')
+        schedule_frame.pack(fill='x', pady=(0, 10))
+        ttk.Label(schedule_frame, text="Frequency:", background='white').pack(side='left')
+        self.order_frequency = ttk.Combobox(schedule_frame, values=FREQUENCIES, state='readonly', width=10)
+        self.order_frequency.pack(side='left', padx=(5, 20))
+        ttk.Label(schedule_frame, text="First Payment (YYYY-MM-DD):", background='white').pack(side='left')
+        self.order_start_entry = ttk.Entry(schedule_frame, width=12)
+        self.order_start_entry.pack(side='left', padx=5)
         
-        tree.pack(fill='both', expand=True)
+        # Description
+        ttk.Label(form_frame, text="Description (Optional):", background='white').pack(anchor='w', pady=(0, 5))
+        self.order_desc_entry = ttk.Entry(form_frame, font=('Arial', 12))
+        self.order_desc_entry.pack(fill='x', pady=(0, 10))
+        
+        ttk.Button(form_frame, text="Create Standing Order", style='Success.TButton',
+                  command=self.process_standing_order).pack()
+        
+        tree = self.create_tree(frame, ('ID', 'From', 'To', 'Amount', 'Frequency', 'Next Due'), height=6)
+        
+        # Cancel by ID
+        action_frame = tk.Frame(frame)
+        action_frame.pack(pady=10)
+        ttk.Label(action_frame, text="Order ID:").pack(side='left')
+        order_id_entry = ttk.Entry(action_frame, width=10)
+        order_id_entry.pack(side='left', padx=5)
+        
+        def cancel_order():
+            try:
+                order_id = int(order_id_entry.get())
+                with self.conn:
+                    self.cursor.execute('''
+                        UPDATE standing_orders SET active = 0
+                        WHERE id = ? AND user_id = ? AND active = 1
+                    ''', (order_id, self.current_user))
+                    cancelled = self.cursor.rowcount
+                    tracing.commit(self.conn)
+                if not cancelled:
+                    messagebox.showerror("Error", "Invalid standing order ID")
+                    return
+                messagebox.showinfo("Success", f"Standing order #{order_id} cancelled")
+                self.show_standing_orders()
+            except ValueError:
+                messagebox.showerror("Error", "Please enter a valid order ID")
+        
+        ttk.Button(action_frame, text="Cancel Order", style='Danger.TButton',
+                  command=cancel_order).pack(side='left', padx=5)
+        
+        def refresh():
+            self.cursor.execute("SELECT account_number FROM accounts WHERE user_id = ? AND status != 'closed'", (self.current_user,))
+            from_combo['values'] = [acc[0] for acc in self.cursor.fetchall()]
+            self.order_from_var.set('')
+            for entry in (self.order_to_entry, self.order_amount_entry, self.order_desc_entry,
+                          self.order_start_entry, order_id_entry):
+                entry.delete(0, 'end')
+            self.order_frequency.set('Monthly')
+            self.order_start_entry.insert(0, date.today().isoformat())
+            
+            tree.delete(*tree.get_children())
+            self.cursor.execute('''
+                SELECT o.id, o.from_account, o.to_account, o.amount, o.frequency, o.next_due, a.currency
+                FROM standing_orders o LEFT JOIN accounts a ON a.account_number = o.from_account
+                WHERE o.user_id = ? AND o.active = 1
+                ORDER BY o.next_due
+            ''', (self.current_user,))
+            for order in self.cursor.fetchall():
+                tree.insert('', 'end', values=(order[0], order[1], order[2],
+                                               format_money(order[3], order[6] or BASE_CURRENCY),
+                                               order[4], order[5]))
+        
+        return refresh
+    
+    @traced()
+    def process_standing_order(self):
+        """Validate and save a new standing order"""
+        try:
+            from_account = self.order_from_var.get()
+            to_account = self.order_to_entry.get().strip()
+            amount = float(self.order_amount_entry.get().strip())
+            frequency = self.order_frequency.get()
+            start_date = date.fromisoformat(self.order_start_entry.get().strip())
+            description = self.order_desc_entry.get().strip() or "Standing order"
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid amount and date (YYYY-MM-DD)")
+            return
+        
+        if not from_account or not to_account or amount <= 0:
+            messagebox.showerror("Error", "Please fill in all required fields")
+            return
+        if start_date < date.today():
+            messagebox.showerror("Error", "First payment cannot be in the past")
+            return
+        if not self.accounts_cache.resolve(self.cursor, to_account):
+            messagebox.showerror("Error", "Invalid account number")
+            return
+        
+        try:
+            # Rolls back on error, so a failed insert does not hold the write lock
+            with self.conn:
+                self.cursor.execute('''
+                    INSERT INTO standing_orders (user_id, from_account, to_account, amount, description,
+                                                 frequency, start_date, next_due)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (self.current_user, from_account, to_account, amount, description, frequency,
+                      start_date.isoformat(), start_date.isoformat()))
+                order_id = self.cursor.lastrowid
+                tracing.commit(self.conn)
+        except Exception as e:
+            messagebox.showerror("Error", f"Standing order could not be saved: {str(e)}")
+            return
+        self.standing_orders.schedule(order_id, start_date.isoformat())
+        messagebox.showinfo("Success", f"Standing order #{order_id} created")
+        self.show_standing_orders()
+
+    def show_pending_loans(self):
+        """Show pending loan requests (employee view)"""
+        self.screens.show('pending_loans', self.build_pending_loans_screen)
+    
+    def build_pending_loans_screen(self, frame):
+        """Build the pending loan requests screen"""
+        ttk.Label(frame, text="Pending Loan Requests", style='Heading.TLabel').pack(pady=20)
+        
+        tree = self.create_tree(frame, ('ID', 'Customer', 'Amount', 'Purpose', 'Duration', 'Requested'))
+        stream = self.create_tree_stream('pending_loans', frame, tree)
+        
+        def format_loan(loan):
+            requested_date = datetime.strptime(loan[5], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d')
+            return (loan[0], loan[1], format_money(loan[2]), loan[3], f"{loan[4]} months", requested_date)
         
         # Action buttons frame
-        action_frame = tk.Frame(self.main_content)
+        action_frame = tk.Frame(frame)
         action_frame.pack(pady=20)
         
         ttk.Label(action_frame, text="Loan ID:").pack(side='left')
         loan_id_entry = ttk.Entry(action_frame, width=10)
         loan_id_entry.pack(side='left', padx=5)
         
+        @traced('approve_loan')
         def approve_loan():
             try:
                 loan_id = int(loan_id_entry.get())
-                self.cursor.execute('SELECT * FROM loan_requests WHERE id = ?', (loan_id,))
-                loan = self.cursor.fetchone()
-                
-                if not loan:
-                    messagebox.showerror("Error", "Invalid loan ID")
-                    return
-                
-                # Get customer's main account
-                self.cursor.execute('''
-                    SELECT id FROM accounts 
-                    WHERE user_id = ? AND account_type = 'Savings'
-                    LIMIT 1
-                ''', (loan[1],))
-                account = self.cursor.fetchone()
-                
-                if not account:
-                    messagebox.showerror("Error", "Customer has no savings account")
-                    return
-                
-                # Update loan status
-                self.cursor.execute('''
-                    UPDATE loan_requests SET status = 'Approved'
-                    WHERE id = ?
-                ''', (loan_id,))
-                
-                # Deposit loan amount
-                self.cursor.execute('''
-                    UPDATE accounts SET balance = balance + ?
-                    WHERE id = ?
-                ''', (loan[2], account[0]))
-                
-                # Record transaction
-                self.cursor.execute('''
-                    INSERT INTO transactions (account_id, transaction_type, amount, description)
-                    VALUES (?, ?, ?, ?)
-                ''', (account[0], 'Loan Deposit', loan[2], f"Loan approval for {loan[3]}"))
-                
-                self.conn.commit()
+                # Status change and deposit commit together on the writer (which records the metrics);
+                # a loan that is no longer pending is rejected, so a repeated click cannot pay twice
+                self.writer.execute(self.ledger.approve_loan, loan_id)
                 messagebox.showinfo("Success", f"Loan #{loan_id} approved and funds deposited")
                 self.show_pending_loans()
                 
             except ValueError:
                 messagebox.showerror("Error", "Please enter a valid loan ID")
+            except LedgerError as e:
+                messagebox.showerror("Error", str(e))
             except Exception as e:
                 messagebox.showerror("Error", f"Loan approval failed: {str(e)}")
         
+        @traced('reject_loan')
         def reject_loan():
+            started = time.perf_counter()
             try:
                 loan_id = int(loan_id_entry.get())
                 self.cursor.execute('SELECT * FROM loan_requests WHERE id = ?', (loan_id,))
@@ -1455,19 +1718,23 @@ class BankingSystem:
                     messagebox.showerror("Error", "Invalid loan ID")
                     return
                 
-                # Update loan status
-                self.cursor.execute('''
-                    UPDATE loan_requests SET status = 'Rejected'
-                    WHERE id = ?
-                ''', (loan_id,))
+                with self.conn:
+                    # Update loan status
+                    self.cursor.execute('''
+                        UPDATE loan_requests SET status = 'Rejected'
+                        WHERE id = ?
+                    ''', (loan_id,))
                 
-                self.conn.commit()
+                    tracing.commit(self.conn)
+                OPERATION_SECONDS.observe(time.perf_counter() - started, 'reject_loan')
+                OPERATIONS.inc('reject_loan', 'ok')
                 messagebox.showinfo("Success", f"Loan #{loan_id} rejected")
                 self.show_pending_loans()
                 
             except ValueError:
                 messagebox.showerror("Error", "Please enter a valid loan ID")
             except Exception as e:
+                OPERATIONS.inc('reject_loan', 'failed')
                 messagebox.showerror("Error", f"Loan rejection failed: {str(e)}")
         
         ttk.Button(action_frame, text="Approve", style='Success.TButton',
@@ -1475,18 +1742,31 @@ class BankingSystem:
         ttk.Button(action_frame, text="Reject", style='Danger.TButton',
                   command=reject_loan).pack(side='left', padx=5)
         
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side='right', fill='y')
-
+        def refresh():
+            loan_id_entry.delete(0, 'end')
+            
+            # Get pending loans with customer info (live data, on a cursor of its own)
+            cursor = TracingCursor(self.conn.cursor())
+            cursor.execute('''
+                SELECT l.id, u.full_name, l.amount, l.purpose, l.duration, l.created_at
+                FROM loan_requests l
+                JOIN users u ON l.user_id = u.id
+                WHERE l.status = 'Pending'
+                ORDER BY l.created_at
+            ''')
+            stream.start(cursor, format_loan)
+        
+        return refresh
+    
     def freeze_account(self):
         """Employee function to freeze/unfreeze accounts"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="Account Freeze/Unfreeze", style='Heading.TLabel').pack(pady=20)
+        self.screens.show('freeze_account', self.build_freeze_account_screen)
+    
+    def build_freeze_account_screen(self, frame):
+        """Build the account freeze/unfreeze form"""
+        ttk.Label(frame, text="Account Freeze/Unfreeze", style='Heading.TLabel').pack(pady=20)
         
-        form_frame = tk.Frame(self.main_content, bg='white')
+        form_frame = tk.Frame(frame, bg='white')
         form_frame.pack(pady=20, padx=40, fill='x')
         
         # Account selection
@@ -1502,43 +1782,73 @@ class BankingSystem:
         ttk.Radiobutton(form_frame, text="Unfreeze", variable=self.freeze_action, 
                        value="unfreeze").pack(anchor='w')
         
+        # Reason (kept in the audit trail)
+        ttk.Label(form_frame, text="Reason:", background='white').pack(anchor='w', pady=(15, 5))
+        self.freeze_reason_entry = ttk.Entry(form_frame, font=('Arial', 12))
+        self.freeze_reason_entry.pack(fill='x', pady=(0, 15))
+        
         # Submit button
         ttk.Button(form_frame, text="Submit", style='Primary.TButton',
                   command=self.process_freeze).pack(pady=20)
-
+        
+        def refresh():
+            self.freeze_account_entry.delete(0, 'end')
+            self.freeze_reason_entry.delete(0, 'end')
+            self.freeze_action.set("freeze")
+        
+        return refresh
+    
+    @traced()
     def process_freeze(self):
         """Process account freeze/unfreeze"""
         account_number = self.freeze_account_entry.get().strip()
         action = self.freeze_action.get()
+        reason = self.freeze_reason_entry.get().strip()
         
         if not account_number:
             messagebox.showerror("Error", "Please enter an account number")
             return
+        if not reason:
+            messagebox.showerror("Error", "Please enter a reason")
+            return
             
         try:
             # Check if account exists
-            self.cursor.execute('SELECT id FROM accounts WHERE account_number = ?', (account_number,))
-            account = self.cursor.fetchone()
+            account = self.accounts_cache.resolve(self.cursor, account_number)
             
             if not account:
                 messagebox.showerror("Error", "Account not found")
                 return
                 
-            # In a real system, we would update a 'frozen' column in the accounts table
-            status = "frozen" if action == "freeze" else "active"
+            frozen = action == "freeze"
+            with self.conn:
+                set_frozen(self.cursor, account.id, frozen, reason, self.current_user)
+                tracing.commit(self.conn)
+            self.accounts_cache.invalidate(account_number)
+            self.frozen_accounts.changed(account_number, frozen)
+            self.account_table.set_flag(account_number, FLAG_FROZEN, frozen)
+            
+            status = "frozen" if frozen else "active"
             messagebox.showinfo("Success", f"Account {account_number} has been {status}")
             self.show_employee_dashboard()
             
+        except AccountStatusError as e:
+            # Explain the current state from the latest audit entry
+            history = freeze_history(self.cursor, account.id)
+            detail = f"\nLast {history[0][1]} on {history[0][0]}: {history[0][2]}" if history else ""
+            messagebox.showerror("Error", f"{e}{detail}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to {action} account: {str(e)}")
 
     def view_customer_details(self):
         """Detailed customer view for employees"""
-        self.clear_main_content()
-        
-        ttk.Label(self.main_content, text="View Customer Details", style='Heading.TLabel').pack(pady=20)
+        self.screens.show('view_customer', self.build_view_customer_screen)
+    
+    def build_view_customer_screen(self, frame):
+        """Build the customer search form"""
+        ttk.Label(frame, text="View Customer Details", style='Heading.TLabel').pack(pady=20)
         
-        form_frame = tk.Frame(self.main_content, bg='white')
+        form_frame = tk.Frame(frame, bg='white')
         form_frame.pack(pady=20, padx=40, fill='x')
         
         # Customer selection
@@ -1549,7 +1859,13 @@ class BankingSystem:
         # Search button
         ttk.Button(form_frame, text="Search", style='Primary.TButton',
                   command=self.process_customer_search).pack()
-
+        
+        def refresh():
+            self.customer_search_entry.delete(0, 'end')
+        
+        return refresh
+    
+    @traced()
     def process_customer_search(self):
         """Process customer search and display details"""
         search_term = self.customer_search_entry.get().strip()
@@ -1559,108 +1875,101 @@ class BankingSystem:
             return
             
         try:
-            # Try to search by ID if search term is numeric
-            if search_term.isdigit():
-                self.cursor.execute('''
-                    SELECT * FROM users WHERE id = ?
-                ''', (int(search_term),))
-            else:
-                self.cursor.execute('''
-                    SELECT * FROM users WHERE username LIKE ? OR full_name LIKE ?
-                ''', (f"%{search_term}%", f"%{search_term}%"))
-            
-            customer = self.cursor.fetchone()
+            # Exact ID, email, username and phone matches first, then a name search
+            match, customers = find_customers(self.cursor, search_term)
             
-            if not customer:
+            if not customers:
                 messagebox.showerror("Error", "Customer not found")
                 return
+            if len(customers) > 1:
+                names = '\n'.join(f"#{c[0]} {c[1]} ({c[3]})" for c in customers)
+                messagebox.showerror("Error", f"Several customers match by {match}; "
+                                              f"search by ID or username:\n\n{names}")
+                return
                 
-            self.clear_main_content()
-            
-            # Display customer info
-            ttk.Label(self.main_content, text="Customer Details", style='Heading.TLabel').pack(pady=20)
-            
-            details_frame = tk.Frame(self.main_content, bg=self.colors['light'], relief='raised', bd=1)
-            details_frame.pack(pady=20, padx=40, fill='x')
-            
-            details = [
-                ('ID', customer[0]),
-                ('Username', customer[1]),
-                ('Full Name', customer[3]),
-                ('Email', customer[4]),
-                ('Phone', customer[5]),
-                ('Address', customer[6]),
-                ('Joined', datetime.strptime(customer[7], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d'))
-            ]
-            
-            for label, value in details:
-                row_frame = tk.Frame(details_frame, bg=self.colors['light'])
-                row_frame.pack(fill='x', pady=10, padx=20)
-                
-                tk.Label(row_frame, text=f"{label}:", bg=self.colors['light'], 
-                        font=('Arial', 12, 'bold')).pack(side='left')
-                tk.Label(row_frame, text=value, bg=self.colors['light'], 
-                        font=('Arial', 12)).pack(side='right')
-            
-            # Display accounts
-            ttk.Label(self.main_content, text="Customer Accounts", style='Heading.TLabel').pack(pady=20)
-            
-            accounts_frame = tk.Frame(self.main_content)
-            accounts_frame.pack(pady=10, padx=20, fill='both', expand=True)
+            self.screens.show('customer_details', self.build_customer_details_screen, customers[0])
             
-            columns = ('Account No', 'Type', 'Balance', 'Created')
-            accounts_tree = ttk.Treeview(accounts_frame, columns=columns, show='headings', height=5)
-            
-            for col in columns:
-                accounts_tree.heading(col, text=col)
-                accounts_tree.column(col, width=120)
-            
-            self.cursor.execute('''
-                SELECT account_number, account_type, balance, created_at
-                FROM accounts WHERE user_id = ?
-            ''', (customer[0],))
-            accounts = self.cursor.fetchall()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to search customer: {str(e)}")
+    
+    def build_customer_details_screen(self, frame):
+        """Build the customer details screen; refresh takes the customer row"""
+        # Display customer info
+        ttk.Label(frame, text="Customer Details", style='Heading.TLabel').pack(pady=20)
+        
+        values = self.create_detail_rows(
+            frame, ('ID', 'Username', 'Full Name', 'Email', 'Phone', 'Address', 'Joined',
+                    'Accounts', 'Total Balance', 'Last Activity'))
+        
+        # Display accounts
+        ttk.Label(frame, text="Customer Accounts", style='Heading.TLabel').pack(pady=20)
+        
+        accounts_frame = tk.Frame(frame)
+        accounts_frame.pack(pady=10, padx=20, fill='both', expand=True)
+        
+        columns = ('Account No', 'Type', 'Balance', 'Created')
+        accounts_tree = ttk.Treeview(accounts_frame, columns=columns, show='headings', height=5)
+        
+        for col in columns:
+            accounts_tree.heading(col, text=col)
+            accounts_tree.column(col, width=120)
+        
+        accounts_tree.pack(fill='both', expand=True)
+        
+        # Display recent transactions
+        ttk.Label(frame, text="Recent Transactions", style='Heading.TLabel').pack(pady=20)
+        
+        transactions_frame = tk.Frame(frame)
+        transactions_frame.pack(pady=10, padx=20, fill='both', expand=True)
+        
+        trans_columns = ('Date', 'Account', 'Type', 'Amount', 'Description')
+        trans_tree = ttk.Treeview(transactions_frame, columns=trans_columns, show='headings', height=5)
+        
+        for col in trans_columns:
+            trans_tree.heading(col, text=col)
+            trans_tree.column(col, width=120)
+        
+        trans_tree.pack(fill='both', expand=True)
+        
+        def refresh(customer):
+            values['ID'].config(text=customer[0])
+            values['Username'].config(text=customer[1])
+            values['Full Name'].config(text=customer[3])
+            values['Email'].config(text=customer[4])
+            values['Phone'].config(text=customer[5])
+            values['Address'].config(text=customer[6])
+            values['Joined'].config(
+                text=datetime.strptime(customer[7], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d'))
+            
+            # Accounts and recent activity come from one summary row, kept current in the background
+            summary = read_summary(self.cursor, customer[0])
+            currencies = {account[3] for account in summary.accounts}
+            values['Accounts'].config(text=summary.account_count)
+            if len(currencies) > 1:
+                totals = {}
+                for account in summary.accounts:
+                    totals[account[3]] = totals.get(account[3], 0.0) + account[2]
+                values['Total Balance'].config(
+                    text=' + '.join(format_money(total, currency) for currency, total in sorted(totals.items())))
+            else:
+                values['Total Balance'].config(
+                    text=format_money(summary.total_balance, currencies.pop() if currencies else BASE_CURRENCY))
+            values['Last Activity'].config(text=summary.last_activity or 'None')
             
-            for account in accounts:
-                created_date = datetime.strptime(account[3], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d')
+            accounts_tree.delete(*accounts_tree.get_children())
+            for account in summary.accounts:
+                created_date = datetime.strptime(account[4], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d')
                 accounts_tree.insert('', 'end', values=(
-                    account[0], account[1], f"${account[2]:,.2f}", created_date))
-            
-            accounts_tree.pack(fill='both', expand=True)
-            
-            # Display recent transactions
-            ttk.Label(self.main_content, text="Recent Transactions", style='Heading.TLabel').pack(pady=20)
-            
-            transactions_frame = tk.Frame(self.main_content)
-            transactions_frame.pack(pady=10, padx=20, fill='both', expand=True)
-            
-            trans_columns = ('Date', 'Account', 'Type', 'Amount', 'Description')
-            trans_tree = ttk.Treeview(transactions_frame, columns=trans_columns, show='headings', height=5)
-            
-            for col in trans_columns:
-                trans_tree.heading(col, text=col)
-                trans_tree.column(col, width=120)
+                    account[0], account[1], format_money(account[2], account[3]), created_date))
             
-            self.cursor.execute('''
-                SELECT t.timestamp, a.account_number, t.transaction_type, t.amount, t.description
-                FROM transactions t
-                JOIN accounts a ON t.account_id = a.id
-                WHERE a.user_id = ?
-                ORDER BY t.timestamp DESC
-                LIMIT 10
-            ''', (customer[0],))
-            transactions = self.cursor.fetchall()
-            
-            for trans in transactions:
+            trans_tree.delete(*trans_tree.get_children())
+            for trans in reversed(summary.recent):
                 date = datetime.strptime(trans[0], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M')
-                amount_str = f"${trans[3]:,.2f}" if trans[3] >= 0 else f"-${abs(trans[3]):,.2f}"
+                amount_str = format_money(trans[3], trans[5])
                 trans_tree.insert('', 'end', values=(date, trans[1], trans[2], amount_str, trans[4]))
-            
-            trans_tree.pack(fill='both', expand=True)
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to search customer: {str(e)}")
-
+        
+        return refresh
+    
     def generate_statement(self):
         """Generate PDF account statement"""
         try:
@@ -1668,7 +1977,7 @@ class BankingSystem:
             self.cursor.execute('''
                 SELECT a.account_number, a.account_type, a.balance
                 FROM accounts a
-                WHERE a.user_id = ?
+                WHERE (a.user_id = ?1 AND a.status != 'closed') OR (a.user_id = ?1 AND a.status = 'closed')
             ''', (self.current_user,))
             accounts = self.cursor.fetchall()
             
@@ -1720,7 +2029,7 @@ class BankingSystem:
                         
                     # Get account info
                     self.cursor.execute('''
-                        SELECT a.account_number, a.account_type, a.balance, u.full_name
+                        SELECT a.account_number, a.account_type, a.balance, u.full_name, a.currency
                         FROM accounts a
                         JOIN users u ON a.user_id = u.id
                         WHERE a.account_number = ?
@@ -1739,6 +2048,7 @@ class BankingSystem:
                     transactions = self.cursor.fetchall()
                     
                     # Ask for save location
+                    from tkinter import filedialog
                     file_path = filedialog.asksaveasfilename(
                         defaultextension=".pdf",
                         filetypes=[("PDF files", "*.pdf")],
@@ -1749,6 +2059,11 @@ class BankingSystem:
                         return
                         
                     # Create PDF
+                    try:
+                        from fpdf import FPDF
+                    except ImportError:
+                        messagebox.showerror("Error", "PDF statements require the fpdf package (pip install fpdf)")
+                        return
                     pdf = FPDF()
                     pdf.add_page()
                     
@@ -1763,7 +2078,7 @@ class BankingSystem:
                     pdf.cell(0, 10, f"Account Number: {account_info[0]}", 0, 1)
                     pdf.cell(0, 10, f"Account Type: {account_info[1]}", 0, 1)
                     pdf.cell(0, 10, f"Statement Period: {start_date} to {end_date}", 0, 1)
-                    pdf.cell(0, 10, f"Current Balance: ${account_info[2]:,.2f}", 0, 1)
+                    pdf.cell(0, 10, f"Current Balance: {format_money(account_info[2], account_info[4], LATIN1_SYMBOLS)}", 0, 1)
                     pdf.ln(10)
                     
                     # Transactions header
@@ -1778,7 +2093,7 @@ class BankingSystem:
                     pdf.set_font("Arial", '', 10)
                     for t in transactions:
                         date = datetime.strptime(t[0], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d')
-                        amount = f"${t[2]:,.2f}" if t[2] >= 0 else f"-${abs(t[2]):,.2f}"
+                        amount = format_money(t[2], account_info[4], LATIN1_SYMBOLS)
                         
                         pdf.cell(40, 10, date, 1)
                         pdf.cell(40, 10, t[1], 1)
@@ -1847,10 +2162,11 @@ class BankingSystem:
                 
             # Update password
             try:
-                self.cursor.execute(f'''
-                    UPDATE {table} SET password = ? WHERE id = ?
-                ''', (self.hash_password(new), self.current_user))
-                self.conn.commit()
+                with self.conn:
+                    self.cursor.execute(f'''
+                        UPDATE {table} SET password = ? WHERE id = ?
+                    ''', (self.hash_password(new), self.current_user))
+                    tracing.commit(self.conn)
                 messagebox.showinfo("Success", "Password changed successfully")
                 popup.destroy()
             except Exception as e:
@@ -1909,7 +2225,7 @@ class BankingSystem:
                     
                 elif search_for == "accounts":
                     self.cursor.execute('''
-                        SELECT a.account_number, u.full_name, a.account_type, a.balance
+                        SELECT a.account_number, u.full_name, a.account_type, a.balance, a.currency
                         FROM accounts a
                         JOIN users u ON a.user_id = u.id
                         WHERE a.account_number LIKE ? OR u.full_name LIKE ?
@@ -1922,15 +2238,16 @@ class BankingSystem:
                     tree = ttk.Treeview(result_window, columns=('Account', 'Customer', 'Type', 'Balance'), show='headings')
                     for col in tree['columns']:
                         tree.heading(col, text=col)
-                    
+
                     for row in results:
-                        tree.insert('', 'end', values=row)
+                        tree.insert('', 'end', values=(row[0], row[1], row[2], format_money(row[3], row[4])))
                     
                     tree.pack(fill='both', expand=True)
                     
                 elif search_for == "transactions":
                     self.cursor.execute('''
-                        SELECT t.timestamp, a.account_number, u.full_name, t.transaction_type, t.amount
+                        SELECT t.timestamp, a.account_number, u.full_name, t.transaction_type, t.amount,
+                               a.currency
                         FROM transactions t
                         JOIN accounts a ON t.account_id = a.id
                         JOIN users u ON a.user_id = u.id
@@ -1949,7 +2266,7 @@ class BankingSystem:
                     
                     for row in results:
                         date = datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M')
-                        amount = f"${row[4]:,.2f}" if row[4] >= 0 else f"-${abs(row[4]):,.2f}"
+                        amount = format_money(row[4], row[5])
                         tree.insert('', 'end', values=(date, row[1], row[2], row[3], amount))
                     
                     tree.pack(fill='both', expand=True)
@@ -1962,6 +2279,13 @@ class BankingSystem:
     def run(self):
         """Start the banking system"""
         self.root.mainloop()
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+        if self.replica:
+            self.replica.stop()
+        self.standing_orders.stop()
+        self.summary_refresher.stop()
+        self.writer.close()
         self.conn.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,61 @@
+"""Bounded LRU cache resolving account numbers to account rows.
+
+Money operations look accounts up by number before touching balances.
+The mapping from number to id, owner and type only changes when an
+account is opened or closed, so it is cached here and invalidated by
+those paths instead of being re-read for every deposit or transfer.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+CachedAccount = namedtuple('CachedAccount', 'id user_id account_type frozen currency')
+
+DEFAULT_CAPACITY = 10000
+
+
+class AccountCache:
+    """Thread-safe LRU map of account_number -> CachedAccount"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, cursor, account_number):
+        """Return the cached account for ``account_number``, or None if it does not exist or is closed"""
+        with self.lock:
+            entry = self.entries.get(account_number)
+            if entry is not None:
+                self.entries.move_to_end(account_number)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Closed accounts resolve to None, like numbers that never existed
+        cursor.execute('''
+            SELECT id, user_id, account_type, status = 'frozen', currency
+            FROM accounts INDEXED BY idx_accounts_number_open
+            WHERE account_number = ? AND status != 'closed'
+        ''', (account_number,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        entry = CachedAccount(*row)
+        with self.lock:
+            self.entries[account_number] = entry
+            self.entries.move_to_end(account_number)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, account_number):
+        """Drop one account, e.g. after it was opened or closed"""
+        with self.lock:
+            self.entries.pop(account_number, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,123 @@
+"""Account status (open, frozen, closed), numbering and closure.
+
+Closed accounts are kept with ``status = 'closed'`` and ``closed_at`` set
+instead of being deleted, so their transactions keep a valid account and
+statements and history still find them by number. Lookups for money
+operations and customers' account lists only consider accounts that are
+not closed and use the partial index ``idx_accounts_user_open``, which
+does not grow with closed accounts.
+
+Account numbers come from the ``account_number`` row of the
+``sequences`` table, so a number is never handed out twice, even after
+the account holding it was closed.
+
+Freezing sets ``status = 'frozen'`` and records who froze or unfroze the
+account and why in ``account_freezes``. The ledger's debit UPDATE only
+matches open accounts, which enforces a freeze on every debit path.
+``FrozenAccounts`` keeps the frozen account numbers in memory, so the
+GUI rejects a debit from a frozen account before submitting it; it is
+reloaded when ``account_freezes`` grows, e.g. after a freeze by another
+process.
+"""
+import threading
+
+from ledger import AccountFrozenError
+
+STATUS_OPEN = 'open'
+STATUS_FROZEN = 'frozen'
+STATUS_CLOSED = 'closed'
+STATUSES = (STATUS_OPEN, STATUS_FROZEN, STATUS_CLOSED)
+
+ACCOUNT_NUMBER_SEQUENCE = 'account_number'
+ACCOUNT_NUMBER_FORMAT = 'ACC{:09d}'
+
+
+class AccountStatusError(Exception):
+    """The account is not in a status that allows the change"""
+
+
+def next_value(cursor, name):
+    """Increment and return a named sequence; call inside the write transaction that uses it"""
+    cursor.execute('UPDATE sequences SET value = value + 1 WHERE name = ?', (name,))
+    if cursor.rowcount == 0:
+        cursor.execute('INSERT INTO sequences (name, value) VALUES (?, 1)', (name,))
+        return 1
+    cursor.execute('SELECT value FROM sequences WHERE name = ?', (name,))
+    return cursor.fetchone()[0]
+
+
+def next_account_number(cursor):
+    return ACCOUNT_NUMBER_FORMAT.format(next_value(cursor, ACCOUNT_NUMBER_SEQUENCE))
+
+
+def close_account(cursor, account_id, balance):
+    """Mark an open account closed once its ``balance`` has been moved out.
+
+    The balance is zeroed in the same statement, which only matches while
+    the balance is still the one that was moved, so a posting committed in
+    between makes the closure fail instead of being lost.
+    """
+    cursor.execute('''
+        UPDATE accounts SET balance = 0, status = 'closed', closed_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND status = 'open' AND balance = ?
+    ''', (account_id, balance))
+    if cursor.rowcount == 0:
+        raise AccountStatusError("Account is frozen, already closed or its balance changed")
+
+
+def set_frozen(cursor, account_id, frozen, reason, employee_id):
+    """Freeze an open account or unfreeze a frozen one, with an audit entry"""
+    current, target = (STATUS_OPEN, STATUS_FROZEN) if frozen else (STATUS_FROZEN, STATUS_OPEN)
+    cursor.execute('UPDATE accounts SET status = ? WHERE id = ? AND status = ?',
+                   (target, account_id, current))
+    if cursor.rowcount == 0:
+        raise AccountStatusError(f"Account is not {current}")
+    cursor.execute('''
+        INSERT INTO account_freezes (account_id, action, reason, employee_id) VALUES (?, ?, ?, ?)
+    ''', (account_id, 'freeze' if frozen else 'unfreeze', reason, employee_id))
+
+
+def freeze_history(cursor, account_id):
+    """Return (created_at, action, reason, employee_id) rows for an account, newest first"""
+    cursor.execute('''
+        SELECT created_at, action, reason, employee_id FROM account_freezes
+        WHERE account_id = ? ORDER BY id DESC
+    ''', (account_id,))
+    return cursor.fetchall()
+
+
+class FrozenAccounts:
+    """In-memory set of frozen account numbers for rejecting debits up front"""
+
+    def __init__(self):
+        self.numbers = frozenset()
+        self.version = None
+        self.lock = threading.Lock()
+
+    def __contains__(self, account_number):
+        return account_number in self.numbers
+
+    def check(self, account_number):
+        """Raise AccountFrozenError for a frozen account; a set lookup, no SQL"""
+        if account_number in self.numbers:
+            raise AccountFrozenError(f"Account {account_number} is frozen")
+
+    def load(self, cursor):
+        cursor.execute('SELECT MAX(id) FROM account_freezes')
+        version = cursor.fetchone()[0]
+        cursor.execute("SELECT account_number FROM accounts WHERE status = 'frozen'")
+        numbers = frozenset(row[0] for row in cursor.fetchall())
+        with self.lock:
+            self.numbers = numbers
+            self.version = version
+
+    def refresh(self, cursor):
+        """Reload if freezes were recorded since the last load (one rowid lookup otherwise)"""
+        cursor.execute('SELECT MAX(id) FROM account_freezes')
+        if cursor.fetchone()[0] != self.version:
+            self.load(cursor)
+
+    def changed(self, account_number, frozen):
+        """Apply a freeze or unfreeze committed by this process"""
+        with self.lock:
+            self.numbers = (self.numbers | {account_number}) if frozen else (self.numbers - {account_number})
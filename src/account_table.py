@@ -0,0 +1,247 @@
+"""Compact in-memory table of every account.
+
+Columns are kept in typed ``array`` buffers - id, owner, account type
+code, currency code, balance in integer cents and status flags - with a dict from
+account number to row. An account costs a few dozen bytes instead of a
+tuple per row, so analytics and screening code can hold millions of
+accounts in memory. The table is loaded in streamed chunks and kept
+current by the write paths, which post committed amounts in place.
+
+    python account_table.py --db banking_system.db
+"""
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from fx import format_money
+
+ACCOUNT_TYPES = ('Savings', 'Checking', 'Business')
+
+FLAG_FROZEN = 1
+FLAG_CLOSED = 2
+
+STATUS_FLAGS = {'open': 0, 'frozen': FLAG_FROZEN, 'closed': FLAG_CLOSED}
+
+FETCH_CHUNK = 50000
+
+AccountRow = namedtuple('AccountRow', 'id user_id account_type currency balance flags')
+
+
+def to_cents(amount):
+    return int(round(amount * 100))
+
+
+class AccountTable:
+    """Columnar account table; rows stay ordered by account id"""
+
+    def __init__(self, account_types=ACCOUNT_TYPES):
+        self.ids = array('q')
+        self.user_ids = array('q')
+        self.types = array('B')
+        self.currencies = array('B')
+        self.balances = array('q')
+        self.flags = array('B')
+        self.index = {}
+        self.type_names = list(account_types)
+        self.type_codes = {name: code for code, name in enumerate(self.type_names)}
+        self.currency_names = []
+        self.currency_codes = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.index)
+
+    def load(self, cursor, chunk_size=FETCH_CHUNK):
+        """Stream every account into the table, replacing its contents.
+
+        Load before postings start flowing, otherwise amounts committed
+        between the read and the first posting are counted twice.
+        """
+        cursor.execute('''
+            SELECT id, user_id, account_number, account_type, currency, balance, status
+            FROM accounts ORDER BY id
+        ''')
+        with self.lock:
+            for column in (self.ids, self.user_ids, self.types, self.currencies, self.balances, self.flags):
+                del column[:]
+            self.index.clear()
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for account_id, user_id, account_number, account_type, currency, balance, status in rows:
+                    self._append(account_id, user_id, account_number, account_type, currency, balance,
+                                 STATUS_FLAGS.get(status, 0))
+
+    def _type_code(self, account_type):
+        code = self.type_codes.get(account_type)
+        if code is None:
+            code = self.type_codes[account_type] = len(self.type_names)
+            self.type_names.append(account_type)
+        return code
+
+    def _currency_code(self, currency):
+        code = self.currency_codes.get(currency)
+        if code is None:
+            code = self.currency_codes[currency] = len(self.currency_names)
+            self.currency_names.append(currency)
+        return code
+
+    def _append(self, account_id, user_id, account_number, account_type, currency, balance, flags=0):
+        # Closed accounts keep their row (ids stay sorted) but are not indexed by number
+        if not flags & FLAG_CLOSED:
+            self.index[account_number] = len(self.ids)
+        self.ids.append(account_id)
+        self.user_ids.append(user_id or 0)
+        self.types.append(self._type_code(account_type))
+        self.currencies.append(self._currency_code(currency))
+        self.balances.append(to_cents(balance))
+        self.flags.append(flags)
+
+    def _row_of(self, account_id):
+        row = bisect_left(self.ids, account_id)
+        if row < len(self.ids) and self.ids[row] == account_id:
+            return row
+        return None
+
+    def lookup(self, account_number):
+        """Return an AccountRow (balance in currency units) or None for unknown and closed accounts"""
+        with self.lock:
+            row = self.index.get(account_number)
+            if row is None:
+                return None
+            return AccountRow(self.ids[row], self.user_ids[row], self.type_names[self.types[row]],
+                              self.currency_names[self.currencies[row]], self.balances[row] / 100,
+                              self.flags[row])
+
+    def refresh(self, cursor, account_number):
+        """Re-read one account after it was opened outside the ledger"""
+        cursor.execute('''
+            SELECT id, user_id, account_type, currency, balance
+            FROM accounts INDEXED BY idx_accounts_number_open
+            WHERE account_number = ? AND status != 'closed'
+        ''', (account_number,))
+        found = cursor.fetchone()
+        with self.lock:
+            row = self.index.get(account_number)
+            if found is None:
+                if row is not None:
+                    self.flags[row] |= FLAG_CLOSED
+                    del self.index[account_number]
+                return
+            account_id, user_id, account_type, currency, balance = found
+            if row is None:
+                if self.ids and account_id < self.ids[-1]:
+                    # Ids are AUTOINCREMENT, so this only happens before the table is loaded
+                    return
+                self._append(account_id, user_id, account_number, account_type, currency, balance)
+            else:
+                self.balances[row] = to_cents(balance)
+
+    def remove(self, account_number):
+        """Mark an account closed; its row is kept so positions stay valid"""
+        with self.lock:
+            row = self.index.pop(account_number, None)
+            if row is not None:
+                self.flags[row] |= FLAG_CLOSED
+
+    def set_flag(self, account_number, flag, on=True):
+        with self.lock:
+            row = self.index.get(account_number)
+            if row is not None:
+                if on:
+                    self.flags[row] |= flag
+                else:
+                    self.flags[row] &= ~flag
+
+    def post(self, account_id, amount):
+        """Add a committed amount (account currency, negative for debits) to an account's balance"""
+        with self.lock:
+            row = self._row_of(account_id)
+            if row is not None:
+                self.balances[row] += to_cents(amount)
+
+    def apply(self, posting):
+        """Apply a committed ledger Posting; opened and closed accounts are added or removed by the caller"""
+        if posting.kind == 'deposit':
+            self.post(posting.account_id, posting.amount)
+        elif posting.kind == 'withdrawal':
+            self.post(posting.account_id, -posting.amount)
+        elif posting.kind in ('transfer', 'close'):
+            self.post(posting.account_id, -posting.amount)
+            credited = posting.amount if posting.credited is None else posting.credited
+            with self.lock:
+                row = self.index.get(posting.payee)
+                if row is not None:
+                    self.balances[row] += to_cents(credited)
+
+    def totals(self, by='account_type'):
+        """Return {account_type: (open accounts, total balance in cents)}.
+
+        ``by='currency'`` groups by currency instead, for totals that are
+        converted to the base currency.
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+
+        if by == 'currency':
+            column, names = self.currencies, self.currency_names
+        else:
+            column, names = self.types, self.type_names
+        with self.lock:
+            if np is not None and self.ids:
+                codes = np.frombuffer(column, dtype=np.uint8)
+                open_rows = (np.frombuffer(self.flags, dtype=np.uint8) & FLAG_CLOSED) == 0
+                balances = np.frombuffer(self.balances, dtype=np.int64)
+                size = len(names)
+                counts = np.bincount(codes[open_rows], minlength=size)
+                sums = np.zeros(size, dtype=np.int64)
+                np.add.at(sums, codes[open_rows], balances[open_rows])
+                return {name: (int(counts[code]), int(sums[code]))
+                        for code, name in enumerate(names) if counts[code]}
+
+            counts = [0] * len(names)
+            sums = [0] * len(names)
+            for code, balance, flags in zip(column, self.balances, self.flags):
+                if not flags & FLAG_CLOSED:
+                    counts[code] += 1
+                    sums[code] += balance
+            return {name: (counts[code], sums[code])
+                    for code, name in enumerate(names) if counts[code]}
+
+    def nbytes(self):
+        """Approximate memory held by the columns and the number index"""
+        columns = sum(column.itemsize * len(column) for column in
+                      (self.ids, self.user_ids, self.types, self.currencies, self.balances, self.flags))
+        keys = sum(sys.getsizeof(number) for number in self.index)
+        return columns + sys.getsizeof(self.index) + keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load all accounts into a compact table and summarise them")
+    parser.add_argument('--db', default='banking_system.db', help="Path to the bank database")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        table = AccountTable()
+        started = time.perf_counter()
+        table.load(conn.cursor())
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+
+    print(f"Loaded {len(table)} accounts in {elapsed:.2f}s ({table.nbytes() / 1024 / 1024:.1f} MB)")
+    for currency, (count, cents) in sorted(table.totals(by='currency').items()):
+        print(f"  {currency:<10} {count:>10} accounts  {format_money(cents / 100, currency)}")
+
+
+if __name__ == '__main__':
+    main()
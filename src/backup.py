@@ -0,0 +1,178 @@
+"""Online backup and restore for the bank database.
+
+Backups are taken with the SQLite backup API in small page steps with a
+sleep between them, so tellers keep working while the copy is made. Each
+copy is checked with ``PRAGMA integrity_check`` before it is compressed
+and kept; older archives beyond ``keep`` are rotated out.
+
+    python backup.py backup                 # one backup into ./backups
+    python backup.py schedule --every 3600  # keep taking backups
+    python backup.py restore backups/banking_system-20260101-120000.db.gz
+"""
+import argparse
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_PAGES = 64
+DEFAULT_STEP_SLEEP = 0.01
+DEFAULT_KEEP = 7
+COPY_CHUNK = 1024 * 1024
+
+
+class BackupError(Exception):
+    """A backup copy failed verification or could not be restored"""
+
+
+def integrity_check(path):
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        conn.close()
+    if result != 'ok':
+        raise BackupError(f"Integrity check failed for {path}: {result}")
+
+
+def backup_database(db_path, backup_dir='backups', pages=DEFAULT_PAGES, step_sleep=DEFAULT_STEP_SLEEP,
+                    keep=DEFAULT_KEEP):
+    """Take a verified, compressed online backup and return its path"""
+    os.makedirs(backup_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    archive = os.path.join(backup_dir, f"{name}-{stamp}.db.gz")
+
+    fd, copy_path = tempfile.mkstemp(suffix='.db', dir=backup_dir)
+    os.close(fd)
+    try:
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(copy_path)
+        try:
+            source.backup(target, pages=pages, sleep=step_sleep)
+            # A standalone copy should not depend on -wal/-shm side files
+            target.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            target.close()
+            source.close()
+
+        integrity_check(copy_path)
+
+        partial = archive + '.part'
+        with open(copy_path, 'rb') as raw, gzip.open(partial, 'wb') as packed:
+            shutil.copyfileobj(raw, packed, COPY_CHUNK)
+        os.replace(partial, archive)
+    finally:
+        os.remove(copy_path)
+
+    rotate_backups(backup_dir, name, keep)
+    return archive
+
+
+def rotate_backups(backup_dir, name, keep=DEFAULT_KEEP):
+    """Delete all but the newest ``keep`` archives of one database"""
+    archives = sorted(glob.glob(os.path.join(backup_dir, f"{name}-*.db.gz")))
+    for path in archives[:-keep] if keep > 0 else archives:
+        os.remove(path)
+
+
+def restore_database(archive, db_path):
+    """Restore an archive over ``db_path`` and return the seconds it took.
+
+    The archive is decompressed and verified next to the target first, so
+    a bad archive never replaces a working database. The application must
+    be stopped while restoring.
+    """
+    started = time.perf_counter()
+    target_dir = os.path.dirname(os.path.abspath(db_path))
+    fd, staged = tempfile.mkstemp(suffix='.db', dir=target_dir)
+    os.close(fd)
+    try:
+        with gzip.open(archive, 'rb') as packed, open(staged, 'wb') as raw:
+            shutil.copyfileobj(packed, raw, COPY_CHUNK)
+        integrity_check(staged)
+
+        for side_file in (db_path + '-wal', db_path + '-shm'):
+            if os.path.exists(side_file):
+                os.remove(side_file)
+        os.replace(staged, db_path)
+    except Exception:
+        if os.path.exists(staged):
+            os.remove(staged)
+        raise
+    return time.perf_counter() - started
+
+
+class BackupScheduler:
+    """Background thread taking a backup now and then every ``interval`` seconds"""
+
+    def __init__(self, db_path, interval, **options):
+        self.db_path = db_path
+        self.interval = interval
+        self.options = options
+        self.last_archive = None
+        self.last_error = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='backup-scheduler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                self.last_archive = backup_database(self.db_path, **self.options)
+                self.last_error = None
+            except (sqlite3.Error, OSError, BackupError) as e:
+                self.last_error = e
+            self.stopped.wait(self.interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up or restore the SecureBank database")
+    parser.add_argument('--db', default='banking_system.db', help="Path to the bank database")
+    parser.add_argument('--dir', default='backups', help="Backup directory")
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP, help="Archives to keep")
+    parser.add_argument('--pages', type=int, default=DEFAULT_PAGES, help="Pages copied per step")
+    parser.add_argument('--sleep', type=float, default=DEFAULT_STEP_SLEEP, help="Seconds between steps")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('backup', help="Take one backup")
+    schedule = commands.add_parser('schedule', help="Take backups periodically")
+    schedule.add_argument('--every', type=float, default=3600.0, help="Seconds between backups")
+    restore = commands.add_parser('restore', help="Restore an archive")
+    restore.add_argument('archive', help="Archive to restore")
+    args = parser.parse_args()
+
+    options = {'backup_dir': args.dir, 'pages': args.pages, 'step_sleep': args.sleep, 'keep': args.keep}
+    if args.command == 'backup':
+        started = time.perf_counter()
+        archive = backup_database(args.db, **options)
+        print(f"Backup written to {archive} in {time.perf_counter() - started:.2f}s")
+    elif args.command == 'schedule':
+        print(f"Backing up {args.db} every {args.every:.0f}s (Ctrl+C to stop)")
+        scheduler = BackupScheduler(args.db, args.every, **options)
+        scheduler.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            scheduler.stop()
+    else:
+        seconds = restore_database(args.archive, args.db)
+        print(f"Restored {args.archive} to {args.db} in {seconds:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Startup benchmark for SecureBank.
+
+Measures the schema check on a new and on a current database, and the
+time from interpreter start to a drawn login window, each in a fresh
+process so imports are cold:
+
+    python benchmark.py --runs 5
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+STARTED = time.perf_counter()
+
+
+def probe_login_window(db_path):
+    """Start the application against ``db_path`` and print seconds to the first drawn login window"""
+    import _tkinter
+    import SecureBank
+    SecureBank.DB_PATH = db_path
+    system = SecureBank.BankingSystem()
+    # update() would also run the deferred startup work; stop at the first Expose instead
+    drawn = []
+    system.root.bind('<Expose>', lambda event: drawn or drawn.append(time.perf_counter()), '+')
+    system.root.update_idletasks()
+    while not drawn:
+        system.root.tk.dooneevent(_tkinter.WINDOW_EVENTS)
+    print(f"{drawn[0] - STARTED:.6f}")
+    system.root.destroy()
+    system.writer.close()
+    system.conn.close()
+
+
+def time_schema_check(db_path):
+    from schema import ensure_schema
+    conn = sqlite3.connect(db_path)
+    try:
+        started = time.perf_counter()
+        ensure_schema(conn)
+        return time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def time_login_window(db_path):
+    """Seconds to the login window in a fresh interpreter, or None without a display"""
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--probe', db_path],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.split()[-1])
+
+
+def report(label, samples):
+    if not samples:
+        print(f"{label:<32} unavailable (no display)")
+        return
+    print(f"{label:<32} median {statistics.median(samples) * 1000:8.1f} ms"
+          f"  min {min(samples) * 1000:8.1f} ms  ({len(samples)} runs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SecureBank cold start")
+    parser.add_argument('--runs', type=int, default=5, help="Runs per measurement")
+    parser.add_argument('--probe', metavar='DB', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        probe_login_window(args.probe)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        fresh, current = [], []
+        for run in range(args.runs):
+            db_path = os.path.join(workdir, f"schema{run}.db")
+            fresh.append(time_schema_check(db_path))
+            current.append(time_schema_check(db_path))
+        report("schema check (new database)", fresh)
+        report("schema check (current schema)", current)
+
+        first_run, login = [], []
+        for run in range(args.runs):
+            db_path = os.path.join(workdir, f"login{run}.db")
+            for samples in (first_run, login):
+                seconds = time_login_window(db_path)
+                if seconds is not None:
+                    samples.append(seconds)
+        report("login window (first run)", first_run)
+        report("login window (existing db)", login)
+
+
+if __name__ == '__main__':
+    main()
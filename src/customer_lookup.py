@@ -0,0 +1,80 @@
+"""Deterministic customer lookup for tellers.
+
+Users carry normalised copies of their contact details (``email_norm``:
+trimmed and lower-cased, ``phone_norm``: digits only), each indexed. A
+search term is resolved by exact indexed matches first, in a fixed order
+(customer ID, email, username, phone), and only falls back to a
+substring search on username and full name when none of them matches.
+Every query orders by id, so the same term always gives the same result.
+"""
+from collections import namedtuple
+
+# Shorter digit strings are customer IDs, never phone numbers
+MIN_PHONE_DIGITS = 7
+DEFAULT_LIMIT = 10
+
+Lookup = namedtuple('Lookup', 'match customers')
+
+
+def normalize_email(email):
+    return email.strip().lower() if email else None
+
+
+def normalize_phone(phone):
+    digits = ''.join(ch for ch in phone if ch.isdigit()) if phone else ''
+    return digits or None
+
+
+def backfill_lookup_columns(conn):
+    """Fill the normalised columns for users created before they existed"""
+    rows = conn.execute('''
+        SELECT id, email, phone FROM users WHERE email_norm IS NULL OR phone_norm IS NULL
+    ''').fetchall()
+    conn.executemany('UPDATE users SET email_norm = ?, phone_norm = ? WHERE id = ?',
+                     ((normalize_email(email), normalize_phone(phone), user_id)
+                      for user_id, email, phone in rows))
+
+
+def find_customers(cursor, term, limit=DEFAULT_LIMIT):
+    """Resolve a teller's search term; returns Lookup(match, customers).
+
+    ``match`` names the rule that matched ('id', 'email', 'username',
+    'phone' or 'name' for the substring fallback, None if nothing did) and
+    ``customers`` holds up to ``limit`` full user rows ordered by id. More
+    than one row means the term is ambiguous.
+    """
+    term = term.strip()
+    if not term:
+        return Lookup(None, [])
+
+    digits = normalize_phone(term)
+    if term.isdigit() and len(term) < MIN_PHONE_DIGITS:
+        cursor.execute('SELECT * FROM users WHERE id = ?', (int(term),))
+        customers = cursor.fetchall()
+        if customers:
+            return Lookup('id', customers)
+
+    if '@' in term:
+        cursor.execute('SELECT * FROM users WHERE email_norm = ? ORDER BY id LIMIT ?',
+                       (normalize_email(term), limit))
+        customers = cursor.fetchall()
+        if customers:
+            return Lookup('email', customers)
+
+    cursor.execute('SELECT * FROM users WHERE username = ?', (term,))
+    customers = cursor.fetchall()
+    if customers:
+        return Lookup('username', customers)
+
+    if digits and len(digits) >= MIN_PHONE_DIGITS:
+        cursor.execute('SELECT * FROM users WHERE phone_norm = ? ORDER BY id LIMIT ?', (digits, limit))
+        customers = cursor.fetchall()
+        if customers:
+            return Lookup('phone', customers)
+
+    pattern = f"%{term}%"
+    cursor.execute('''
+        SELECT * FROM users WHERE username LIKE ? OR full_name LIKE ? ORDER BY id LIMIT ?
+    ''', (pattern, pattern, limit))
+    customers = cursor.fetchall()
+    return Lookup('name' if customers else None, customers)
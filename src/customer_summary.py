@@ -0,0 +1,162 @@
+"""Per-customer summary rows for the teller's customer details screen.
+
+``customer_summary`` holds, per user, the account count, total balance,
+time of last activity, the accounts as a JSON array and the last
+RECENT_ACTIVITY transactions as a JSON array (oldest first). Triggers on
+``accounts`` and ``transactions`` (see schema.py) keep the scalar columns
+current on every write path and set ``stale``; they never touch the JSON,
+so balance updates and postings (e.g. an interest run over every account)
+pay for a single-row update each. ``SummaryRefresher`` rebuilds the JSON
+of stale rows in the background through the group-commit writer, so
+``read_summary`` is always one primary-key read; its account and activity
+lists may lag the scalar columns by up to REFRESH_INTERVAL.
+
+Account entries are ``[number, type, balance, currency, created_at]`` for
+the accounts that are not closed, in account id order. Activity entries
+are ``[timestamp, account_number, type, amount, description, currency]``; closed
+accounts' transactions stay in the recent activity, deleted accounts'
+transactions drop out of it.
+
+    python customer_summary.py --rebuild
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import traceback
+from collections import namedtuple
+
+RECENT_ACTIVITY = 10
+REFRESH_INTERVAL = 2.0
+REFRESH_BATCH = 200
+
+Summary = namedtuple('Summary', 'account_count total_balance last_activity accounts recent')
+
+EMPTY_SUMMARY = Summary(0, 0.0, None, [], [])
+
+
+def read_summary(cursor, user_id):
+    """Return the Summary of a user (EMPTY_SUMMARY for users without accounts)"""
+    cursor.execute('''
+        SELECT account_count, total_balance, last_activity, accounts, recent
+        FROM customer_summary WHERE user_id = ?
+    ''', (user_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return EMPTY_SUMMARY
+    return Summary(row[0], row[1], row[2], json.loads(row[3]), json.loads(row[4]))
+
+
+def refresh_stale_summaries(cursor, limit=REFRESH_BATCH):
+    """Rebuild the JSON of up to ``limit`` stale rows (does not commit); returns how many"""
+    cursor.execute('SELECT user_id FROM customer_summary WHERE stale = 1 LIMIT ?', (limit,))
+    user_ids = [row[0] for row in cursor.fetchall()]
+    for user_id in user_ids:
+        cursor.execute('''
+            UPDATE customer_summary SET accounts = ?, recent = ?, stale = 0 WHERE user_id = ?
+        ''', (json.dumps(_accounts(cursor, user_id), separators=(',', ':')),
+              json.dumps(_recent(cursor, user_id), separators=(',', ':')), user_id))
+    return len(user_ids)
+
+
+class SummaryRefresher:
+    """Background thread rebuilding stale summary rows through the group-commit writer"""
+
+    def __init__(self, writer, interval=REFRESH_INTERVAL, batch=REFRESH_BATCH):
+        self.writer = writer
+        self.interval = interval
+        self.batch = batch
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='summary-refresh', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                # Keep going while full batches come back, e.g. after an interest run
+                while not self.stopped.is_set() and \
+                        self.writer.execute(refresh_stale_summaries, self.batch) == self.batch:
+                    pass
+            except Exception:
+                traceback.print_exc()
+
+
+def _accounts(cursor, user_id):
+    cursor.execute('''
+        SELECT account_number, account_type, balance, currency, created_at
+        FROM accounts WHERE user_id = ? AND status != 'closed' ORDER BY id
+    ''', (user_id,))
+    return [list(row) for row in cursor.fetchall()]
+
+
+def _recent(cursor, user_id):
+    cursor.execute('''
+        SELECT t.timestamp, a.account_number, t.transaction_type, t.amount, t.description, a.currency
+        FROM accounts a JOIN transactions t ON t.account_id = a.id
+        WHERE (a.user_id = ?1 AND a.status != 'closed') OR (a.user_id = ?1 AND a.status = 'closed')
+        ORDER BY t.id DESC LIMIT ?2
+    ''', (user_id, RECENT_ACTIVITY))
+    return [list(row) for row in reversed(cursor.fetchall())]
+
+
+def rebuild_customer_summary(conn):
+    """Recompute every summary row's scalar columns and mark it stale (does not commit).
+
+    The JSON columns are left to the next ``SummaryRefresher`` pass, or
+    ``--rebuild`` fills them in directly.
+    """
+    summaries = {}
+    for user_id, count, total in conn.execute('''
+        SELECT user_id, COUNT(*), TOTAL(balance) FROM accounts
+        WHERE user_id IS NOT NULL AND status != 'closed' GROUP BY user_id
+    '''):
+        summaries[user_id] = [count, total, None]
+
+    for user_id, last_activity in conn.execute('''
+        SELECT a.user_id, MAX(t.timestamp) FROM transactions t JOIN accounts a ON a.id = t.account_id
+        WHERE a.user_id IS NOT NULL GROUP BY a.user_id
+    '''):
+        # Customers whose accounts are all closed still get their history
+        summaries.setdefault(user_id, [0, 0.0, None])[2] = last_activity
+
+    conn.execute('DELETE FROM customer_summary')
+    conn.executemany('''
+        INSERT INTO customer_summary (user_id, account_count, total_balance, last_activity, stale)
+        VALUES (?, ?, ?, ?, 1)
+    ''', ((user_id, *summary) for user_id, summary in summaries.items()))
+    return len(summaries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the customer summary table")
+    parser.add_argument('--db', default='banking_system.db', help="Path to the bank database")
+    parser.add_argument('--rebuild', action='store_true', help="Recompute every summary row")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.rebuild:
+            count = rebuild_customer_summary(conn)
+            cursor = conn.cursor()
+            while refresh_stale_summaries(cursor):
+                pass
+            conn.commit()
+            print(f"Rebuilt {count:,} customer summaries")
+        else:
+            total = conn.execute('SELECT COUNT(*) FROM customer_summary').fetchone()[0]
+            print(f"{total:,} customer summaries (use --rebuild to recompute)")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
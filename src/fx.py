@@ -0,0 +1,157 @@
+"""Foreign-exchange rates for multi-currency accounts.
+
+Rates are kept in the ``fx_rates`` table as the value of one unit of a
+currency in BASE_CURRENCY from an effective date onwards, and are loaded
+from CSV files (``date,currency,rate``). ``FxRates`` holds every rate in
+memory, sorted by effective date per currency, so a conversion during a
+transfer is a bisect instead of a query. ``FxRates.refresh`` reloads the
+cache once an import has changed the table; the application calls it
+every minute.
+
+    python fx.py import rates.csv --db banking_system.db
+    python fx.py show --date 2026-01-31
+"""
+import argparse
+import csv
+import sqlite3
+import threading
+from bisect import bisect_right
+from datetime import date
+
+BASE_CURRENCY = 'USD'
+CURRENCIES = ('USD', 'EUR', 'GBP', 'JPY', 'CHF', 'CAD')
+
+SYMBOLS = {'USD': '$', 'EUR': '€', 'GBP': '£', 'JPY': '¥'}
+
+# The core PDF fonts only cover Latin-1, which has no euro sign
+LATIN1_SYMBOLS = {currency: symbol for currency, symbol in SYMBOLS.items() if symbol != '€'}
+
+
+class FxError(Exception):
+    """No rate is effective for a currency on the requested date"""
+
+
+def format_money(amount, currency=BASE_CURRENCY, symbols=SYMBOLS):
+    """Format an amount in its currency, e.g. $1,234.50, -€20.00 or CHF 5.00"""
+    symbol = symbols.get(currency)
+    text = f"{symbol}{abs(amount):,.2f}" if symbol else f"{currency} {abs(amount):,.2f}"
+    return f"-{text}" if amount < 0 else text
+
+
+def format_totals(totals, rates, on=None):
+    """Format {currency: amount} as one amount in the base currency of ``rates``.
+
+    Currencies without a rate are listed separately after it.
+    """
+    converted = 0.0
+    unconverted = []
+    for currency, amount in sorted(totals.items()):
+        try:
+            converted += amount * rates.rate(currency, on)
+        except FxError:
+            unconverted.append(format_money(amount, currency))
+    return ' + '.join([format_money(converted, rates.base)] + unconverted)
+
+
+def import_rates(conn, path):
+    """Insert or replace the rates in a CSV file; returns the number of rows read"""
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = [(row['currency'].strip().upper(), date.fromisoformat(row['date'].strip()).isoformat(),
+                 float(row['rate'])) for row in csv.DictReader(f)]
+    for currency, _, rate in rows:
+        if rate <= 0:
+            raise ValueError(f"Rate for {currency} must be positive")
+    conn.executemany('''
+        INSERT OR REPLACE INTO fx_rates (currency, effective_date, rate) VALUES (?, ?, ?)
+    ''', rows)
+    conn.commit()
+    return len(rows)
+
+
+class FxRates:
+    """Effective-dated rate cache: currency -> parallel lists of dates and rates"""
+
+    def __init__(self, base=BASE_CURRENCY):
+        self.base = base
+        self.dates = {}
+        self.rates = {}
+        self.version = None
+        self.lock = threading.Lock()
+
+    def load(self, cursor):
+        """Replace the cache with every rate in ``fx_rates``"""
+        version = self._version(cursor)
+        cursor.execute('SELECT currency, effective_date, rate FROM fx_rates ORDER BY currency, effective_date')
+        dates = {}
+        rates = {}
+        for currency, effective_date, rate in cursor.fetchall():
+            dates.setdefault(currency, []).append(effective_date)
+            rates.setdefault(currency, []).append(rate)
+        with self.lock:
+            self.dates = dates
+            self.rates = rates
+            self.version = version
+
+    def refresh(self, cursor):
+        """Reload if rates were imported since the last load"""
+        if self._version(cursor) != self.version:
+            self.load(cursor)
+
+    @staticmethod
+    def _version(cursor):
+        # INSERT OR REPLACE gives the replacing row a new, higher rowid
+        cursor.execute('SELECT MAX(rowid), COUNT(*) FROM fx_rates')
+        return cursor.fetchone()
+
+    def currencies(self):
+        return sorted(set(self.dates) | {self.base})
+
+    def rate(self, currency, on=None):
+        """Value of one unit of ``currency`` in the base currency on date ``on`` (default today)"""
+        if currency == self.base:
+            return 1.0
+        on = (on or date.today()).isoformat()
+        with self.lock:
+            dates = self.dates.get(currency)
+            rates = self.rates.get(currency)
+        position = bisect_right(dates, on) if dates else 0
+        if position == 0:
+            raise FxError(f"No exchange rate for {currency} on {on}")
+        return rates[position - 1]
+
+    def convert(self, amount, from_currency, to_currency, on=None):
+        """Return (amount in ``to_currency`` rounded to cents, rate applied)"""
+        if from_currency == to_currency:
+            return amount, 1.0
+        rate = self.rate(from_currency, on) / self.rate(to_currency, on)
+        return round(amount * rate, 2), rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import or show exchange rates")
+    parser.add_argument('--db', default='banking_system.db', help="Path to the bank database")
+    commands = parser.add_subparsers(dest='command', required=True)
+    load = commands.add_parser('import', help="Import a CSV file with date,currency,rate columns")
+    load.add_argument('path')
+    show = commands.add_parser('show', help="Print the rates effective on a date")
+    show.add_argument('--date', type=date.fromisoformat, default=date.today())
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.command == 'import':
+            print(f"Imported {import_rates(conn, args.path)} rates from {args.path}")
+        else:
+            rates = FxRates()
+            rates.load(conn.cursor())
+            for currency in rates.currencies():
+                try:
+                    print(f"  {currency}  {rates.rate(currency, args.date):.6f} {rates.base}")
+                except FxError as e:
+                    print(f"  {currency}  {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Group-commit writer for high-volume money operations.
+
+Callers submit operations from any thread. A single writer thread
+collects them for a short window (or until ``max_batch`` operations are
+queued), applies each one inside its own savepoint of one shared
+transaction and commits once. Callers are acknowledged only after that
+commit, so each acknowledgment is as durable as an individual commit
+while the fsync cost is shared by the whole batch.
+
+Per-operation latency (submit to acknowledgment), outcomes, batch sizes
+and the time spent waiting for the database write lock are recorded in
+the metrics registry. Operations submitted inside a trace run in a child
+span of the submitting span, with their SQL, lock wait and commit.
+"""
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+import tracing
+from metrics import DB_RETRIES, LOCK_WAIT_SECONDS, OPERATION_SECONDS, OPERATIONS, histogram
+
+DEFAULT_WINDOW = 0.005
+DEFAULT_MAX_BATCH = 500
+BEGIN_RETRIES = 3
+
+BATCH_SIZE = histogram('securebank_writer_batch_size', "Operations per group commit",
+                       buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+
+_STOP = object()
+
+
+class _Operation:
+    __slots__ = ('fn', 'args', 'kwargs', 'future', 'name', 'submitted', 'parent')
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.name = getattr(fn, '__name__', 'operation')
+        self.submitted = time.perf_counter()
+        self.parent = tracing.current_span()
+
+
+class GroupCommitWriter:
+    """Background writer applying queued operations in batched transactions.
+
+    An operation is any callable taking a cursor as its first argument. It
+    must not commit; its return value is handed to ``on_commit`` after the
+    batch is durable and then returned to the caller. If the batch itself
+    fails, the results of the operations that had succeeded in it are
+    handed to ``on_abort`` instead.
+
+    ``on_start`` is called with a cursor on the writer thread before the
+    first operation, to load in-memory state that ``on_commit`` keeps
+    current without a posting slipping in between.
+    """
+
+    def __init__(self, db_path, window=DEFAULT_WINDOW, max_batch=DEFAULT_MAX_BATCH, on_commit=None,
+                 on_abort=None, on_start=None):
+        self.db_path = db_path
+        self.window = window
+        self.max_batch = max_batch
+        self.on_commit = on_commit
+        self.on_abort = on_abort
+        self.on_start = on_start
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock_wait = 0.0
+        self.lock_wait_started = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue an operation and return a Future resolved after its commit"""
+        if self.thread is None or not self.thread.is_alive():
+            raise RuntimeError("Group-commit writer is not running")
+        op = _Operation(fn, args, kwargs)
+        self.queue.put(op)
+        return op.future
+
+    def execute(self, fn, *args, **kwargs):
+        """Submit an operation and wait for its committed result"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def close(self):
+        """Flush queued operations and stop the writer thread"""
+        if self.thread is not None:
+            self.queue.put(_STOP)
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            if self.on_start is not None:
+                try:
+                    self.on_start(conn.cursor())
+                except Exception:
+                    traceback.print_exc()
+            stopping = False
+            while not stopping:
+                first = self.queue.get()
+                if first is _STOP:
+                    break
+
+                batch = [first]
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        op = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if op is _STOP:
+                        stopping = True
+                        break
+                    batch.append(op)
+
+                self._apply(conn, batch)
+        finally:
+            conn.close()
+
+    def _begin(self, cursor):
+        """Take the write lock, retrying a few times if it stays busy past the connection timeout"""
+        started = time.perf_counter()
+        self.lock_wait_started = time.time()
+        try:
+            for attempt in range(BEGIN_RETRIES):
+                try:
+                    cursor.execute('BEGIN IMMEDIATE')
+                    return
+                except sqlite3.OperationalError as e:
+                    if ('locked' not in str(e) and 'busy' not in str(e)) or attempt == BEGIN_RETRIES - 1:
+                        raise
+                    DB_RETRIES.inc('writer')
+        finally:
+            self.lock_wait = time.perf_counter() - started
+            LOCK_WAIT_SECONDS.observe(self.lock_wait, 'writer')
+
+    def _apply(self, conn, batch):
+        cursor = tracing.TracingCursor(conn.cursor())
+        outcomes = []
+        BATCH_SIZE.observe(len(batch))
+        try:
+            self._begin(cursor)
+            for op in batch:
+                with tracing.span(op.name, parent=op.parent, root=False, batch=len(batch),
+                                  queued_ms=round((time.perf_counter() - op.submitted) * 1000, 3)):
+                    cursor.execute('SAVEPOINT operation')
+                    try:
+                        result = op.fn(cursor, *op.args, **op.kwargs)
+                    except Exception as e:
+                        cursor.execute('ROLLBACK TO operation')
+                        cursor.execute('RELEASE operation')
+                        outcomes.append((op, None, e))
+                    else:
+                        cursor.execute('RELEASE operation')
+                        outcomes.append((op, result, None))
+            commit_started = time.time()
+            commit_timer = time.perf_counter()
+            cursor.execute('COMMIT')
+            commit_time = time.perf_counter() - commit_timer
+            # The lock wait and commit are shared by the batch; show them in every traced operation
+            for op in batch:
+                tracing.record_span(op.parent, 'lock_wait', self.lock_wait_started, self.lock_wait)
+                tracing.record_span(op.parent, 'commit', commit_started, commit_time, batch=len(batch))
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if self.on_abort is not None:
+                for op, result, error in outcomes:
+                    if error is None:
+                        try:
+                            self.on_abort(result)
+                        except Exception:
+                            traceback.print_exc()
+            for op in batch:
+                OPERATIONS.inc(op.name, 'failed')
+                op.future.set_exception(e)
+            return
+
+        for op, result, error in outcomes:
+            OPERATION_SECONDS.observe(time.perf_counter() - op.submitted, op.name)
+            if error is not None:
+                OPERATIONS.inc(op.name, 'rejected')
+                op.future.set_exception(error)
+                continue
+            OPERATIONS.inc(op.name, 'ok')
+            if self.on_commit is not None:
+                try:
+                    self.on_commit(result)
+                except Exception:
+                    # The batch is already durable; never fail the caller here
+                    traceback.print_exc()
+            op.future.set_result(result)
@@ -0,0 +1,174 @@
+"""Nightly interest accrual for SecureBank savings products.
+
+Balances of every eligible account are loaded into flat buffers (NumPy
+arrays when available, ``array`` module buffers otherwise), the daily
+interest for each product tier is computed in a single pass and the
+credits are written back with ``executemany`` inside one transaction.
+
+Tier thresholds are in BASE_CURRENCY. Accounts in other currencies are
+grouped by currency and compared against the thresholds converted at the
+run date's exchange rate; accounts in a currency without a rate are
+skipped and counted in the result.
+
+Run from cron or a scheduler:
+
+    python interest.py --db banking_system.db
+"""
+import argparse
+import sqlite3
+from array import array
+from bisect import bisect_right
+from datetime import date
+
+from fx import FxError, FxRates, format_money
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Annual rates per account type as (minimum balance in BASE_CURRENCY, rate) bands, ascending
+INTEREST_TIERS = {
+    'Savings': ((0.0, 0.0100), (10000.0, 0.0150), (100000.0, 0.0200)),
+}
+
+DAYS_PER_YEAR = 365
+FETCH_CHUNK = 50000
+
+INTEREST_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS interest_runs (
+        run_date TEXT PRIMARY KEY,
+        accounts INTEGER NOT NULL,
+        total REAL NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def load_balances(cursor, account_type, chunk_size=FETCH_CHUNK):
+    """Stream ids and balances of interest-bearing accounts into flat buffers per currency"""
+    buffers = {}
+    cursor.execute('''
+        SELECT id, balance, currency FROM accounts
+        WHERE account_type = ? AND balance > 0
+    ''', (account_type,))
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for account_id, balance, currency in rows:
+            if currency not in buffers:
+                buffers[currency] = (array('q'), array('d'))
+            ids, balances = buffers[currency]
+            ids.append(account_id)
+            balances.append(balance)
+    return buffers
+
+
+def daily_interest(balances, tiers):
+    """Return the rounded daily interest for every balance in one pass"""
+    thresholds = [band[0] for band in tiers]
+    rates = [band[1] / DAYS_PER_YEAR for band in tiers]
+
+    if np is not None:
+        values = np.frombuffer(balances, dtype=np.float64)
+        band = np.searchsorted(np.asarray(thresholds), values, side='right') - 1
+        return np.round(values * np.asarray(rates)[np.maximum(band, 0)], 2)
+
+    credits = array('d', bytes(8 * len(balances)))
+    for i, balance in enumerate(balances):
+        band = max(bisect_right(thresholds, balance) - 1, 0)
+        credits[i] = round(balance * rates[band], 2)
+    return credits
+
+
+def accrue_interest(conn, run_date=None, tiers=INTEREST_TIERS):
+    """Credit one day of interest to every eligible account.
+
+    Returns a dict with the number of credited accounts, the total paid in
+    the base currency and the number of accounts skipped for lack of an
+    exchange rate, or None when interest has already been accrued for
+    ``run_date``.
+    """
+    run_date = run_date or date.today().isoformat()
+    cursor = conn.cursor()
+    cursor.execute(INTEREST_SCHEMA)
+    conn.commit()
+    fx = FxRates()
+    fx.load(cursor)
+
+    # Hold the write lock while reading so no balance moves under the run
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute('SELECT 1 FROM interest_runs WHERE run_date = ?', (run_date,))
+        if cursor.fetchone():
+            conn.rollback()
+            return None
+
+        description = f"Daily interest {run_date}"
+        on = date.fromisoformat(run_date)
+        credited = 0
+        skipped = 0
+        total = 0.0
+        for account_type, bands in tiers.items():
+            for currency, (ids, balances) in load_balances(cursor, account_type).items():
+                try:
+                    rate = fx.rate(currency, on)
+                except FxError:
+                    skipped += len(ids)
+                    continue
+
+                # Thresholds in this currency's units
+                credits = daily_interest(balances, [(minimum / rate, annual) for minimum, annual in bands])
+                if np is not None:
+                    account_ids = np.frombuffer(ids, dtype=np.int64)
+                    paid = credits > 0
+                    pairs = list(zip(credits[paid].tolist(), account_ids[paid].tolist()))
+                else:
+                    pairs = [(credit, account_id) for credit, account_id in zip(credits, ids) if credit > 0]
+                if not pairs:
+                    continue
+
+                cursor.executemany('UPDATE accounts SET balance = balance + ? WHERE id = ?', pairs)
+                cursor.executemany('''
+                    INSERT INTO transactions (account_id, transaction_type, amount, description)
+                    VALUES (?, 'Interest', ?, ?)
+                ''', ((account_id, credit, description) for credit, account_id in pairs))
+
+                credited += len(pairs)
+                total += sum(credit for credit, _ in pairs) * rate
+
+        cursor.execute('''
+            INSERT INTO interest_runs (run_date, accounts, total)
+            VALUES (?, ?, ?)
+        ''', (run_date, credited, round(total, 2)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return {'run_date': run_date, 'accounts': credited, 'total': round(total, 2), 'skipped': skipped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accrue daily interest on savings accounts")
+    parser.add_argument('--db', default='banking_system.db', help="Path to the bank database")
+    parser.add_argument('--date', help="Accrual date (YYYY-MM-DD), defaults to today")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        result = accrue_interest(conn, args.date)
+    finally:
+        conn.close()
+
+    if result is None:
+        print("Interest already accrued for this date")
+    else:
+        print(f"Credited {result['accounts']} accounts, total {format_money(result['total'])}")
+        if result['skipped']:
+            print(f"Skipped {result['skipped']} accounts in currencies without an exchange rate")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""Money operations shared by the GUI, the group-commit writer and batch jobs.
+
+Every operation works on a cursor inside a transaction owned by the
+caller and never commits itself. Rejections are raised as LedgerError so
+callers can roll back just that operation and report the message.
+
+Operations accept an optional ``idempotency_key``. The posting of the
+first successful call is stored under that key in the same transaction,
+and a repeated call returns the stored posting (marked ``replayed``)
+without touching balances, so callers may retry after a timeout.
+Rejected operations store nothing and are re-evaluated on retry.
+
+Debits only apply to open accounts: the balance UPDATE itself requires
+``status = 'open'``, so a freeze committed by any process is enforced
+atomically, and a rejected debit is reported as AccountFrozenError.
+Credits likewise require the account not to be closed (frozen accounts
+may still receive money).
+
+Opening and closing accounts and paying out approved loans are ledger
+operations too, so they run on the group-commit writer like every other
+posting.
+
+Transfers between accounts in different currencies convert once, at
+posting time, with the rate effective that day from the in-memory
+``FxRates`` cache; each leg is recorded in its account's currency.
+"""
+import contextlib
+import functools
+import json
+import time
+from collections import namedtuple
+from datetime import date
+
+from fx import BASE_CURRENCY, FxError, format_money
+
+# ``amount`` is in the debited (or deposited) account's ``currency``; ``credited``
+# is what a transfer's payee received in its own currency. ``payee`` is the
+# receiving account number (for ``open``, the new account's number)
+Posting = namedtuple('Posting', 'kind account_id amount payee credited currency replayed',
+                     defaults=(None, None, False))
+
+IDEMPOTENCY_TTL = 24 * 3600
+
+
+class LedgerError(Exception):
+    """A money operation was rejected; the message is safe to show to the user"""
+
+
+class ScreeningError(LedgerError):
+    """A debit was blocked by the velocity screening rules"""
+
+
+class AccountFrozenError(LedgerError):
+    """A debit was attempted on a frozen account"""
+
+
+def idempotent(method):
+    """Let a Ledger operation take an ``idempotency_key`` and replay its stored result"""
+    @functools.wraps(method)
+    def wrapper(self, cursor, *args, idempotency_key=None, **kwargs):
+        if idempotency_key is None:
+            return method(self, cursor, *args, **kwargs)
+
+        request = json.dumps([method.__name__, args, kwargs], sort_keys=True)
+        cursor.execute('''
+            SELECT request, result FROM idempotency_keys WHERE key = ? AND created_at >= ?
+        ''', (idempotency_key, time.time() - self.idempotency_ttl))
+        stored = cursor.fetchone()
+        if stored is not None:
+            if stored[0] != request:
+                raise LedgerError("Idempotency key was already used for a different request")
+            return Posting(*json.loads(stored[1]), replayed=True)
+
+        posting = method(self, cursor, *args, **kwargs)
+        cursor.execute('''
+            INSERT OR REPLACE INTO idempotency_keys (key, request, result, created_at)
+            VALUES (?, ?, ?, ?)
+        ''', (idempotency_key, request, json.dumps(posting[:-1]), time.time()))
+        return posting
+    return wrapper
+
+
+class Ledger:
+    """Deposit, withdrawal and transfer postings against the accounts table"""
+
+    def __init__(self, accounts_cache, screen, account_table=None, idempotency_ttl=IDEMPOTENCY_TTL,
+                 fx=None):
+        self.accounts_cache = accounts_cache
+        self.screen = screen
+        self.account_table = account_table
+        self.idempotency_ttl = idempotency_ttl
+        self.fx = fx
+
+    def resolve(self, cursor, account_number, error="Invalid account selection"):
+        account = self.accounts_cache.resolve(cursor, account_number)
+        if not account:
+            raise LedgerError(error)
+        return account
+
+    def debit(self, cursor, account_id, amount):
+        """Debit an open account only if its balance covers the amount"""
+        cursor.execute('''
+            UPDATE accounts SET balance = balance - ? WHERE id = ? AND balance >= ? AND status = 'open'
+        ''', (amount, account_id, amount))
+        if cursor.rowcount == 0:
+            # Only rejected debits pay for finding out why
+            cursor.execute('SELECT status FROM accounts WHERE id = ?', (account_id,))
+            row = cursor.fetchone()
+            if row is not None and row[0] == 'frozen':
+                raise AccountFrozenError("Account is frozen")
+            if row is not None and row[0] != 'open':
+                raise LedgerError("Account is closed")
+            raise LedgerError("Insufficient funds")
+
+    def credit(self, cursor, account_id, amount):
+        """Credit an account unless it was closed"""
+        cursor.execute('''
+            UPDATE accounts SET balance = balance + ? WHERE id = ? AND status != 'closed'
+        ''', (amount, account_id))
+        if cursor.rowcount == 0:
+            raise LedgerError("Account is closed")
+
+    @idempotent
+    def deposit(self, cursor, account_number, amount, description="Deposit"):
+        if amount <= 0:
+            raise LedgerError("Amount must be positive")
+
+        account = self.resolve(cursor, account_number)
+        self.credit(cursor, account.id, amount)
+        cursor.execute('''
+            INSERT INTO transactions (account_id, transaction_type, amount, description)
+            VALUES (?, ?, ?, ?)
+        ''', (account.id, 'Deposit', amount, description))
+        return Posting('deposit', account.id, amount, None, amount, account.currency)
+
+    @idempotent
+    def withdraw(self, cursor, account_number, amount, description="Withdrawal"):
+        if amount <= 0:
+            raise LedgerError("Amount must be positive")
+
+        account = self.resolve(cursor, account_number)
+        with self.screened(account.id, amount, currency=account.currency):
+            self.debit(cursor, account.id, amount)
+            cursor.execute('''
+                INSERT INTO transactions (account_id, transaction_type, amount, description)
+                VALUES (?, ?, ?, ?)
+            ''', (account.id, 'Withdrawal', -amount, description))
+        return Posting('withdrawal', account.id, amount, None, None, account.currency)
+
+    @idempotent
+    def transfer(self, cursor, from_account, to_account, amount, description="Transfer", counted=True):
+        """Move money between accounts; ``counted=False`` skips the debit-count limits for pre-authorised payments"""
+        if amount <= 0:
+            raise LedgerError("Amount must be positive")
+
+        from_acc = self.resolve(cursor, from_account, "Invalid account number")
+        to_acc = self.resolve(cursor, to_account, "Invalid account number")
+
+        credited, note = self.convert(amount, from_acc.currency, to_acc.currency)
+
+        with self.screened(from_acc.id, amount, to_account, counted, from_acc.currency):
+            self.debit(cursor, from_acc.id, amount)
+            self.credit(cursor, to_acc.id, credited)
+            cursor.executemany('''
+                INSERT INTO transactions (account_id, transaction_type, amount, description)
+                VALUES (?, ?, ?, ?)
+            ''', ((from_acc.id, 'Transfer Out', -amount, f"Transfer to {to_account}: {description}{note}"),
+                  (to_acc.id, 'Transfer In', credited, f"Transfer from {from_account}: {description}{note}")))
+        return Posting('transfer', from_acc.id, amount, to_account, credited, from_acc.currency)
+
+    @idempotent
+    def open_account(self, cursor, user_id, account_type, currency, initial_deposit=0.0):
+        """Open an account with its initial deposit; the new number is the Posting's ``payee``"""
+        from account_status import next_account_number
+
+        if initial_deposit < 0:
+            raise LedgerError("Initial deposit cannot be negative")
+
+        # Numbers come from a sequence, so closed accounts' numbers are never reused
+        account_number = next_account_number(cursor)
+        cursor.execute('''
+            INSERT INTO accounts (user_id, account_number, account_type, balance, currency)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (user_id, account_number, account_type, initial_deposit, currency))
+        account_id = cursor.lastrowid
+        cursor.execute('''
+            INSERT INTO transactions (account_id, transaction_type, amount, description)
+            VALUES (?, ?, ?, ?)
+        ''', (account_id, 'Deposit', initial_deposit, 'Initial deposit'))
+        return Posting('open', account_id, initial_deposit, account_number, initial_deposit, currency)
+
+    @idempotent
+    def close_account(self, cursor, account_number, receiving_number):
+        """Soft-close an account, moving its balance to another of the customer's accounts.
+
+        The move is between the customer's own accounts, so it is not
+        screened; limits would otherwise keep large balances from closing.
+        """
+        from account_status import AccountStatusError, close_account
+
+        closing = self.resolve(cursor, account_number)
+        receiving = self.resolve(cursor, receiving_number)
+        if closing.user_id != receiving.user_id:
+            raise LedgerError("Invalid account selection")
+        if closing.id == receiving.id:
+            raise LedgerError("Choose another account to receive the balance")
+        if closing.currency != receiving.currency:
+            raise LedgerError("The receiving account must be in the same currency")
+
+        cursor.execute('SELECT balance FROM accounts WHERE id = ?', (closing.id,))
+        balance = cursor.fetchone()[0]
+        if balance > 0:
+            self.credit(cursor, receiving.id, balance)
+            cursor.execute('''
+                INSERT INTO transactions (account_id, transaction_type, amount, description)
+                VALUES (?, ?, ?, ?)
+            ''', (receiving.id, 'Transfer In', balance, f"Balance transfer from closed account {account_number}"))
+        cursor.execute('''
+            INSERT INTO transactions (account_id, transaction_type, amount, description)
+            VALUES (?, ?, ?, ?)
+        ''', (closing.id, 'Account Closure', -balance, f"Account closed, balance transferred to {receiving_number}"))
+
+        # Soft close: the row (and its history) stays, with status 'closed'
+        try:
+            close_account(cursor, closing.id, balance)
+        except AccountStatusError as e:
+            raise LedgerError(str(e))
+        return Posting('close', closing.id, balance, receiving_number, balance, closing.currency)
+
+    @idempotent
+    def approve_loan(self, cursor, loan_id):
+        """Approve a pending loan and deposit it into the customer's savings account"""
+        cursor.execute("SELECT user_id, amount, purpose FROM loan_requests WHERE id = ? AND status = 'Pending'",
+                       (loan_id,))
+        loan = cursor.fetchone()
+        if loan is None:
+            raise LedgerError("Invalid loan ID or loan already decided")
+        user_id, amount, purpose = loan
+
+        # Get customer's main account
+        cursor.execute('''
+            SELECT id, currency FROM accounts
+            WHERE user_id = ? AND account_type = 'Savings' AND status != 'closed'
+            LIMIT 1
+        ''', (user_id,))
+        account = cursor.fetchone()
+        if account is None:
+            raise LedgerError("Customer has no savings account")
+        account_id, currency = account
+
+        # Loans are in the base currency; the deposit is in the account's currency
+        credited, note = self.convert(amount, BASE_CURRENCY, currency)
+        cursor.execute("UPDATE loan_requests SET status = 'Approved' WHERE id = ?", (loan_id,))
+        self.credit(cursor, account_id, credited)
+        cursor.execute('''
+            INSERT INTO transactions (account_id, transaction_type, amount, description)
+            VALUES (?, ?, ?, ?)
+        ''', (account_id, 'Loan Deposit', credited, f"Loan approval for {purpose}{note}"))
+        return Posting('deposit', account_id, credited, None, credited, currency)
+
+    @contextlib.contextmanager
+    def screened(self, account_id, amount, payee=None, counted=True, currency=BASE_CURRENCY):
+        """Screen a debit and hold it as pending while the block applies it.
+
+        The pending entry counts against later debits in the same batch; it
+        is released if the block raises and replaced when ``committed`` (or
+        dropped when ``aborted``) is called with the posting.
+        """
+        reason = self.screen.check(account_id, amount, payee, counted=counted, currency=currency)
+        if reason:
+            raise ScreeningError(reason)
+        self.screen.reserve(account_id, amount, payee, currency)
+        try:
+            yield
+        except BaseException:
+            self.screen.release(account_id, amount, payee)
+            raise
+
+    def convert(self, amount, from_currency, to_currency):
+        """Return the credited amount and a description suffix for a possibly cross-currency transfer"""
+        if from_currency == to_currency:
+            return amount, ''
+        if self.fx is None:
+            raise LedgerError("Cross-currency transfers are not available")
+        try:
+            credited, rate = self.fx.convert(amount, from_currency, to_currency, date.today())
+        except FxError as e:
+            raise LedgerError(str(e))
+        if credited <= 0:
+            raise LedgerError("Amount is too small to convert")
+        return credited, (f" ({format_money(amount, from_currency)} = {format_money(credited, to_currency)}"
+                          f" at {rate:.6f})")
+
+    def committed(self, result):
+        """Apply in-memory side effects once postings are durable"""
+        for posting in _postings(result):
+            if posting.kind in ('withdrawal', 'transfer'):
+                self.screen.record(posting.account_id, posting.amount, posting.payee,
+                                   currency=posting.currency or BASE_CURRENCY)
+            if self.account_table is not None:
+                self.account_table.apply(posting)
+
+    def aborted(self, result):
+        """Release the pending screening entries of postings whose transaction rolled back"""
+        for posting in _postings(result):
+            # A ``hold`` is a sharded transfer's prepared debit, recorded only when it commits
+            if posting.kind in ('withdrawal', 'transfer', 'hold'):
+                self.screen.release(posting.account_id, posting.amount, posting.payee)
+
+    def purge_idempotency_keys(self, cursor):
+        """Delete idempotency keys older than the TTL; returns how many were removed"""
+        cursor.execute('DELETE FROM idempotency_keys WHERE created_at < ?',
+                       (time.time() - self.idempotency_ttl,))
+        return cursor.rowcount
+
+
+def _postings(result):
+    """The new (not replayed) Postings in an operation's result"""
+    if isinstance(result, Posting):
+        result = (result,)
+    elif not isinstance(result, list):
+        return ()
+    # Replayed postings were applied when they first committed
+    return [posting for posting in result if isinstance(posting, Posting) and not posting.replayed]
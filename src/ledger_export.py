@@ -0,0 +1,196 @@
+"""Columnar export of the transaction ledger for offline analytics.
+
+Transactions are written as one flat binary file per column, so analysts
+can map them with ``numpy.memmap`` or ``memoryview`` instead of querying
+the live database:
+
+    id.bin          int64   transaction id
+    account_id.bin  int64
+    timestamp.bin   int64   seconds since the epoch (UTC)
+    type.bin        uint8   index into meta.json "types"
+    amount.bin      int64   cents
+    description.bin uint32  line number in descriptions.jsonl
+
+Exports are incremental: each run appends only rows with an id above
+``last_id`` in meta.json, which is written last so an interrupted run is
+rolled back to the previous export on the next one.
+
+    python ledger_export.py --db banking_system.db --out ledger_export
+"""
+import argparse
+import json
+import mmap
+import os
+import sqlite3
+import sys
+import time
+from array import array
+from datetime import datetime, timezone
+
+FETCH_CHUNK = 50000
+
+COLUMNS = (
+    ('id', 'q'),
+    ('account_id', 'q'),
+    ('timestamp', 'q'),
+    ('type', 'B'),
+    ('amount', 'q'),
+    ('description', 'I'),
+)
+
+NUMPY_DTYPES = {'q': 'int64', 'B': 'uint8', 'I': 'uint32'}
+
+META_FILE = 'meta.json'
+DESCRIPTIONS_FILE = 'descriptions.jsonl'
+
+
+def epoch_seconds(timestamp):
+    """Seconds since the epoch for an SQLite CURRENT_TIMESTAMP value (UTC)"""
+    return int(datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc).timestamp())
+
+
+def read_meta(directory):
+    path = os.path.join(directory, META_FILE)
+    if not os.path.exists(path):
+        return {'last_id': 0, 'rows': 0, 'descriptions': 0, 'types': [], 'byteorder': sys.byteorder}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_meta(directory, meta):
+    path = os.path.join(directory, META_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def truncate_to_meta(directory, meta):
+    """Drop anything a previous interrupted run appended after the last meta.json"""
+    for name, code in COLUMNS:
+        path = os.path.join(directory, f"{name}.bin")
+        size = meta['rows'] * array(code).itemsize
+        if os.path.exists(path) and os.path.getsize(path) != size:
+            os.truncate(path, size)
+
+    path = os.path.join(directory, DESCRIPTIONS_FILE)
+    if os.path.exists(path):
+        with open(path, 'rb+') as f:
+            for _ in range(meta['descriptions']):
+                f.readline()
+            f.truncate()
+
+
+def load_descriptions(directory):
+    path = os.path.join(directory, DESCRIPTIONS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return {json.loads(line): code for code, line in enumerate(f)}
+
+
+def export_ledger(db_path, directory, chunk_size=FETCH_CHUNK):
+    """Append transactions newer than the last export; return the number of rows added"""
+    os.makedirs(directory, exist_ok=True)
+    meta = read_meta(directory)
+    if meta['byteorder'] != sys.byteorder:
+        raise ValueError(f"Export in {directory} was written with {meta['byteorder']}-endian columns")
+    truncate_to_meta(directory, meta)
+
+    descriptions = load_descriptions(directory)
+    types = {name: code for code, name in enumerate(meta['types'])}
+
+    # A read-only connection in WAL mode never blocks the live writer
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    files = {name: open(os.path.join(directory, f"{name}.bin"), 'ab') for name, _ in COLUMNS}
+    description_file = open(os.path.join(directory, DESCRIPTIONS_FILE), 'a', encoding='utf-8')
+    added = 0
+    # Ledger rows arrive in id order, so consecutive rows usually share a timestamp
+    last_timestamp = last_epoch = None
+    try:
+        cursor = conn.execute('''
+            SELECT id, account_id, timestamp, transaction_type, amount, description
+            FROM transactions WHERE id > ? ORDER BY id
+        ''', (meta['last_id'],))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+
+            columns = {name: array(code) for name, code in COLUMNS}
+            for transaction_id, account_id, timestamp, transaction_type, amount, description in rows:
+                if timestamp != last_timestamp:
+                    last_timestamp, last_epoch = timestamp, epoch_seconds(timestamp)
+                type_code = types.get(transaction_type)
+                if type_code is None:
+                    type_code = types[transaction_type] = len(meta['types'])
+                    meta['types'].append(transaction_type)
+
+                description = description or ''
+                description_code = descriptions.get(description)
+                if description_code is None:
+                    description_code = descriptions[description] = len(descriptions)
+                    description_file.write(json.dumps(description) + '\n')
+
+                columns['id'].append(transaction_id)
+                columns['account_id'].append(account_id or 0)
+                columns['timestamp'].append(last_epoch)
+                columns['type'].append(type_code)
+                columns['amount'].append(int(round(amount * 100)))
+                columns['description'].append(description_code)
+
+            for name, column in columns.items():
+                column.tofile(files[name])
+            added += len(rows)
+            meta['last_id'] = rows[-1][0]
+    finally:
+        description_file.close()
+        for f in files.values():
+            f.close()
+        conn.close()
+
+    if added:
+        meta['rows'] += added
+        meta['descriptions'] = len(descriptions)
+        write_meta(directory, meta)
+    return added
+
+
+def open_columns(directory, use_numpy=False):
+    """Map the exported columns read-only without copying.
+
+    Returns {column: memoryview} (or numpy.memmap arrays with ``use_numpy``)
+    together with the parsed meta.json.
+    """
+    meta = read_meta(directory)
+    columns = {}
+    for name, code in COLUMNS:
+        path = os.path.join(directory, f"{name}.bin")
+        length = meta['rows'] * array(code).itemsize
+        if use_numpy:
+            import numpy as np
+            columns[name] = np.memmap(path, dtype=NUMPY_DTYPES[code], mode='r', shape=(meta['rows'],)) \
+                if length else np.empty(0, dtype=NUMPY_DTYPES[code])
+        elif length:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+            columns[name] = memoryview(mapped).cast(code)
+        else:
+            columns[name] = memoryview(array(code))
+    return columns, meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the transaction ledger to columnar files")
+    parser.add_argument('--db', default='banking_system.db', help="Path to the bank database")
+    parser.add_argument('--out', default='ledger_export', help="Export directory")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    added = export_ledger(args.db, args.out)
+    meta = read_meta(args.out)
+    print(f"Exported {added} new transactions in {time.perf_counter() - started:.2f}s "
+          f"({meta['rows']} total, last id {meta['last_id']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""In-process metrics: counters and fixed-bucket latency histograms.
+
+Metrics live in a process-wide ``REGISTRY`` and are exposed in the
+Prometheus text format, either over HTTP on a local port (``serve``) or
+by rewriting a file periodically (``write_periodically``, suitable for
+the node_exporter textfile collector).
+
+Recording is one lock-protected dict update (plus a bisect over the
+bucket bounds for histograms), so it stays on in production:
+
+    TRANSFERS = counter('securebank_transfers_total', "Transfers posted", ('outcome',))
+    TRANSFERS.inc('ok')
+
+    LATENCY = histogram('securebank_login_seconds', "Login latency", ('role',))
+    started = time.perf_counter()
+    ...
+    LATENCY.observe(time.perf_counter() - started, 'customer')
+
+    python metrics.py --port 9464        # serve an empty registry (smoke test)
+"""
+import argparse
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds; covers a cached lookup (sub-millisecond) up to a stalled writer
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self.values.get(labels, 0)
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    """Observation counts in fixed buckets, plus sum and count, per label combination"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (last one is +Inf), sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, amount, *labels):
+        index = bisect_left(self.buckets, amount)
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += amount
+
+    def count(self, *labels):
+        entry = self.values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def samples(self):
+        with self.lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self.values.items())
+        bounds = self.buckets + (float('inf'),)
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = (('le', _number(bound)),)
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    """Named metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric, or return the already registered one of the same name and type"""
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered differently")
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def render(self):
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=(), registry=REGISTRY):
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# Shared by the writer, the GUI and batch jobs
+OPERATIONS = counter('securebank_operations_total', "Operations by outcome (ok, rejected, failed)",
+                     ('operation', 'outcome'))
+OPERATION_SECONDS = histogram('securebank_operation_seconds',
+                              "Operation latency; writer operations are timed from submit to commit",
+                              ('operation',))
+LOCK_WAIT_SECONDS = histogram('securebank_db_lock_wait_seconds',
+                              "Time spent acquiring the database write lock", ('component',))
+DB_RETRIES = counter('securebank_db_retries_total', "Database operations retried after a failure",
+                     ('component',))
+
+
+def serve(port, host='127.0.0.1', registry=REGISTRY):
+    """Expose ``/metrics`` on a daemon thread; returns the server (call ``shutdown`` to stop)"""
+    # http.server pulls in email and socket; only processes that serve pay for it
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def write_file(path, registry=REGISTRY):
+    """Atomically replace ``path`` with the current metrics"""
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(path + '.tmp', path)
+
+
+def write_periodically(path, interval=15.0, registry=REGISTRY):
+    """Rewrite ``path`` every ``interval`` seconds on a daemon thread; returns a stop Event"""
+    stopped = threading.Event()
+
+    def run():
+        while True:
+            write_file(path, registry)
+            if stopped.wait(interval):
+                break
+
+    threading.Thread(target=run, name='metrics-file', daemon=True).start()
+    return stopped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the metrics registry over HTTP")
+    parser.add_argument('--port', type=int, default=9464, help="Port for /metrics")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to bind")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.host)
+    print(f"Serving metrics on http://{args.host}:{args.port}/metrics (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""In-memory prefix index for payee autocomplete.
+
+Account numbers and each customer's previous payees are kept in sorted
+lists, so a prefix lookup is a binary search plus a short forward scan
+and never needs a database query while the user types. The index is
+loaded on first use and updated in place as accounts open and close.
+"""
+from bisect import bisect_left, insort
+
+DEFAULT_LIMIT = 8
+
+
+class PrefixIndex:
+    """Sorted set of strings answering prefix queries"""
+
+    def __init__(self, keys=()):
+        self.keys = sorted(set(keys))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        i = bisect_left(self.keys, key)
+        return i < len(self.keys) and self.keys[i] == key
+
+    def add(self, key):
+        if key not in self:
+            insort(self.keys, key)
+
+    def remove(self, key):
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i]
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        """Return up to ``limit`` keys starting with ``prefix``, in order"""
+        matches = []
+        i = bisect_left(self.keys, prefix)
+        while i < len(self.keys) and len(matches) < limit and self.keys[i].startswith(prefix):
+            matches.append(self.keys[i])
+            i += 1
+        return matches
+
+
+class PayeeDirectory:
+    """Autocomplete source: a customer's saved payees first, then all account numbers"""
+
+    def __init__(self):
+        self.accounts = None
+        self.payees = {}
+
+    def load_accounts(self, cursor):
+        if self.accounts is None:
+            cursor.execute("SELECT account_number FROM accounts WHERE status != 'closed'")
+            self.accounts = PrefixIndex(row[0] for row in cursor.fetchall())
+        return self.accounts
+
+    def load_payees(self, cursor, user_id):
+        index = self.payees.get(user_id)
+        if index is None:
+            cursor.execute('''
+                SELECT DISTINCT t.description
+                FROM transactions t
+                JOIN accounts a ON t.account_id = a.id
+                WHERE ((a.user_id = ?1 AND a.status != 'closed') OR (a.user_id = ?1 AND a.status = 'closed'))
+                AND t.transaction_type = 'Transfer Out'
+            ''', (user_id,))
+            payees = set()
+            for (description,) in cursor.fetchall():
+                if description and description.startswith('Transfer to '):
+                    payees.add(description[len('Transfer to '):].split(':', 1)[0])
+            index = self.payees[user_id] = PrefixIndex(payees)
+        return index
+
+    def complete(self, cursor, user_id, prefix, limit=DEFAULT_LIMIT):
+        prefix = prefix.strip().upper()
+        accounts = self.load_accounts(cursor)
+        suggestions = [payee for payee in self.load_payees(cursor, user_id).complete(prefix, limit)
+                       if payee in accounts]
+        if len(suggestions) < limit:
+            for account_number in accounts.complete(prefix, limit):
+                if account_number not in suggestions:
+                    suggestions.append(account_number)
+                    if len(suggestions) == limit:
+                        break
+        return suggestions
+
+    def account_opened(self, account_number):
+        if self.accounts is not None:
+            self.accounts.add(account_number)
+
+    def account_closed(self, account_number):
+        if self.accounts is not None:
+            self.accounts.remove(account_number)
+
+    def payee_used(self, user_id, account_number):
+        index = self.payees.get(user_id)
+        if index is not None:
+            index.add(account_number)
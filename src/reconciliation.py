@@ -0,0 +1,247 @@
+"""Incremental ledger reconciliation.
+
+For every account a running sum of its transactions (in cents) and a
+rolling CRC32 over (transaction id, amount) are kept in
+``reconciliation_state`` together with the last transaction id folded
+in. An incremental run only reads transactions newer than the global
+checkpoint and then compares the running sums of the touched accounts
+with ``accounts.balance``. A full run rebuilds the state from scratch,
+splitting the account id space across a process pool.
+
+    python reconciliation.py            # verify new activity only
+    python reconciliation.py --full     # re-verify the whole ledger
+"""
+import argparse
+import os
+import sqlite3
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+FETCH_CHUNK = 10000
+
+RECONCILIATION_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS reconciliation_state (
+        account_id INTEGER PRIMARY KEY,
+        running_sum INTEGER NOT NULL,
+        checksum INTEGER NOT NULL,
+        last_transaction_id INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS reconciliation_checkpoint (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        last_transaction_id INTEGER NOT NULL,
+        verified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+)
+
+_ENTRY = struct.Struct('<qq')
+
+
+def to_cents(amount):
+    return int(round(amount * 100))
+
+
+def fold(checksum, transaction_id, cents):
+    """Extend an account's rolling checksum with one transaction"""
+    return zlib.crc32(_ENTRY.pack(transaction_id, cents), checksum)
+
+
+def ensure_schema(conn):
+    for statement in RECONCILIATION_SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+
+
+def checkpoint(cursor):
+    """Return the id up to which every transaction has been verified"""
+    cursor.execute('SELECT last_transaction_id FROM reconciliation_checkpoint WHERE id = 1')
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def compare_balances(cursor, state):
+    """Return (account_id, balance, expected) for accounts whose balance drifted"""
+    mismatches = []
+    ids = list(state)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        cursor.execute(f'''
+            SELECT id, balance FROM accounts WHERE id IN ({','.join('?' * len(chunk))})
+        ''', chunk)
+        for account_id, balance in cursor.fetchall():
+            expected = state[account_id][0]
+            if to_cents(balance) != expected:
+                mismatches.append((account_id, balance, expected / 100))
+    return mismatches
+
+
+def reconcile_incremental(conn):
+    """Fold transactions newer than the checkpoint and verify the touched accounts.
+
+    Returns (number of transactions verified, list of mismatches).
+    """
+    ensure_schema(conn)
+    cursor = conn.cursor()
+    reader = conn.cursor()
+
+    # Read ledger and balances from one snapshot so concurrent postings cannot skew them
+    cursor.execute('BEGIN')
+    try:
+        since = checkpoint(cursor)
+        upto = since
+        state = {}
+        verified = 0
+        cursor.execute('''
+            SELECT id, account_id, amount FROM transactions
+            WHERE id > ? ORDER BY id
+        ''', (since,))
+        rows = cursor.fetchmany(FETCH_CHUNK)
+        while rows:
+            for transaction_id, account_id, amount in rows:
+                entry = state.get(account_id)
+                if entry is None:
+                    reader.execute('''
+                        SELECT running_sum, checksum, last_transaction_id
+                        FROM reconciliation_state WHERE account_id = ?
+                    ''', (account_id,))
+                    stored = reader.fetchone()
+                    entry = state[account_id] = list(stored) if stored else [0, 0, 0]
+                upto = transaction_id
+                # A full run may already have folded this account further than the checkpoint
+                if transaction_id <= entry[2]:
+                    continue
+                cents = to_cents(amount)
+                entry[0] += cents
+                entry[1] = fold(entry[1], transaction_id, cents)
+                entry[2] = transaction_id
+                verified += 1
+            rows = cursor.fetchmany(FETCH_CHUNK)
+
+        mismatches = compare_balances(cursor, state)
+    finally:
+        conn.rollback()
+
+    save_state(conn, state, upto)
+    return verified, mismatches
+
+
+def save_state(conn, state, upto):
+    conn.executemany('''
+        INSERT OR REPLACE INTO reconciliation_state (account_id, running_sum, checksum, last_transaction_id)
+        VALUES (?, ?, ?, ?)
+    ''', ((account_id, *entry) for account_id, entry in state.items()))
+    conn.execute('''
+        INSERT OR REPLACE INTO reconciliation_checkpoint (id, last_transaction_id) VALUES (1, ?)
+    ''', (upto,))
+    conn.commit()
+
+
+def _verify_range(db_path, low, high):
+    """Rebuild state for account ids in [low, high) from a read-only snapshot.
+
+    Returns (state, mismatches, last transaction id visible in the snapshot).
+    """
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM transactions')
+        upto = cursor.fetchone()[0]
+
+        state = {}
+        cursor.execute('''
+            SELECT id, account_id, amount FROM transactions
+            WHERE account_id >= ? AND account_id < ?
+            ORDER BY account_id, id
+        ''', (low, high))
+        rows = cursor.fetchmany(FETCH_CHUNK)
+        while rows:
+            for transaction_id, account_id, amount in rows:
+                entry = state.setdefault(account_id, [0, 0, 0])
+                cents = to_cents(amount)
+                entry[0] += cents
+                entry[1] = fold(entry[1], transaction_id, cents)
+                entry[2] = transaction_id
+            rows = cursor.fetchmany(FETCH_CHUNK)
+
+        # Accounts without any transaction must hold a zero balance
+        cursor.execute('SELECT id FROM accounts WHERE id >= ? AND id < ?', (low, high))
+        for (account_id,) in cursor.fetchall():
+            state.setdefault(account_id, [0, 0, 0])
+
+        return state, compare_balances(cursor, state), upto
+    finally:
+        conn.close()
+
+
+def reconcile_full(db_path, workers=None, ranges=None):
+    """Re-verify every account in parallel over account id ranges.
+
+    Returns (number of accounts verified, list of mismatches).
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_schema(conn)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM (
+                SELECT id FROM accounts UNION ALL SELECT DISTINCT account_id FROM transactions
+            )
+        ''')
+        low, high = cursor.fetchone()
+
+        workers = workers or os.cpu_count() or 1
+        ranges = ranges or workers * 4
+        step = max((high - low + 1) // ranges + 1, 1)
+        bounds = [(start, start + step) for start in range(low, high + 1, step)]
+
+        state = {}
+        mismatches = []
+        snapshots = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_verify_range, db_path, start, stop) for start, stop in bounds]
+            for future in futures:
+                partial, drift, upto = future.result()
+                state.update(partial)
+                mismatches.extend(drift)
+                snapshots.append(upto)
+
+        # Every range has folded at least up to the oldest worker snapshot
+        conn.execute('DELETE FROM reconciliation_state')
+        save_state(conn, state, min(snapshots, default=0))
+        return len(state), mismatches
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile account balances against the ledger")
+    parser.add_argument('--db', default='banking_system.db', help="Path to the bank database")
+    parser.add_argument('--full', action='store_true', help="Re-verify every account from scratch")
+    parser.add_argument('--workers', type=int, help="Worker processes for a full run")
+    args = parser.parse_args()
+
+    if args.full:
+        count, mismatches = reconcile_full(args.db, args.workers)
+        print(f"Verified {count} accounts")
+    else:
+        conn = sqlite3.connect(args.db)
+        try:
+            count, mismatches = reconcile_incremental(conn)
+        finally:
+            conn.close()
+        print(f"Verified {count} new transactions")
+
+    for account_id, balance, expected in mismatches:
+        # Amounts are in the account's own currency
+        print(f"Account {account_id}: balance {balance:,.2f}, ledger {expected:,.2f}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Reporting replica for heavy employee queries.
+
+A background thread copies the live database into a separate file with
+``sqlite3.Connection.backup``, a batch of pages at a time with a short
+sleep between batches, so the live file is never locked for a whole copy.
+Two replica files are used alternately: readers keep using the last
+completed copy while the next one is being written.
+
+Every refresh is a full copy. The backup API has no incremental mode and
+this SQLite build lacks the ``sqlite_dbpage`` table a page-level diff
+would need. The copy is cheap enough for this database: it runs off the UI thread
+in throttled batches, only while an employee is signed in, and is
+skipped entirely when ``PRAGMA data_version`` shows no commit since the
+last one.
+
+The UI thread swaps to a new copy between screens, but a list screen may
+still be streaming rows from the old one; ``ReplicaConnections`` keeps a
+replaced connection open until its last stream has finished. A refresh
+into that connection's file waits for those readers.
+"""
+import sqlite3
+import threading
+import time
+
+from metrics import DB_RETRIES
+
+DEFAULT_PAGES = 256
+DEFAULT_STEP_SLEEP = 0.005
+DEFAULT_INTERVAL = 60.0
+
+
+class ReportingReplica:
+    """Double-buffered read-only copy of the bank database"""
+
+    def __init__(self, source_path, replica_base='banking_reporting', pages=DEFAULT_PAGES,
+                 interval=DEFAULT_INTERVAL, step_sleep=DEFAULT_STEP_SLEEP):
+        self.source_path = source_path
+        self.paths = (f"{replica_base}.a.db", f"{replica_base}.b.db")
+        self.pages = pages
+        self.interval = interval
+        self.step_sleep = step_sleep
+        self.active = None
+        self.generation = 0
+        self.refreshed_at = None
+        self.source = None
+        self.copied_version = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def refresh(self):
+        """Copy the live database into the inactive slot and make it current.
+
+        Returns False without copying when nothing was committed since the
+        last copy; the current copy is then still up to date.
+        """
+        with self.lock:
+            slot = 0 if self.active is None else 1 - self.active
+        started = time.time()
+
+        # data_version only changes for commits made by other connections, so
+        # this connection is kept open and never writes
+        if self.source is None:
+            self.source = sqlite3.connect(self.source_path)
+        version = self.source.execute('PRAGMA data_version').fetchone()[0]
+        if self.active is not None and version == self.copied_version:
+            with self.lock:
+                self.refreshed_at = started
+            return False
+
+        target = sqlite3.connect(self.paths[slot])
+        try:
+            self.source.backup(target, pages=self.pages, sleep=self.step_sleep)
+            # Readers only ever need a plain rollback-journal file
+            target.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            target.close()
+
+        self.copied_version = version
+        with self.lock:
+            self.active = slot
+            self.generation += 1
+            self.refreshed_at = started
+        return True
+
+    def connect(self):
+        """Open a query-only connection to the current copy, or None before the first refresh"""
+        with self.lock:
+            if self.active is None:
+                return None
+            path = self.paths[self.active]
+        conn = sqlite3.connect(path)
+        conn.execute('PRAGMA query_only = 1')
+        return conn
+
+    def age(self):
+        """Seconds since the current copy was taken, or None if there is none"""
+        refreshed_at = self.refreshed_at
+        return None if refreshed_at is None else time.time() - refreshed_at
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='reporting-replica', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                self.refresh()
+            except sqlite3.Error:
+                # Keep serving the previous copy; retry on the next cycle
+                DB_RETRIES.inc('reporting')
+            self.stopped.wait(self.interval)
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+
+class ReplicaConnections:
+    """Replica connections handed to the UI thread.
+
+    ``replace`` installs the connection to a new copy. The previous one is
+    closed at once if no ``TreeStream`` is reading from it, otherwise when
+    the last of them calls ``release``. Cursors of other connections (the
+    live database) are ignored.
+    """
+
+    def __init__(self):
+        self.current = None
+        self.open = set()
+        self.streams = {}
+
+    def replace(self, conn):
+        old, self.current = self.current, conn
+        if conn is not None:
+            self.open.add(conn)
+        if old is not None and not self.streams.get(old):
+            self._close(old)
+
+    def hold(self, cursor):
+        """A stream started reading from ``cursor``"""
+        conn = getattr(cursor, 'connection', None)
+        if conn in self.open:
+            self.streams[conn] = self.streams.get(conn, 0) + 1
+
+    def release(self, cursor):
+        """A stream closed ``cursor``, because it finished or was cancelled"""
+        conn = getattr(cursor, 'connection', None)
+        if conn not in self.streams:
+            return
+        self.streams[conn] -= 1
+        if not self.streams[conn]:
+            del self.streams[conn]
+            if conn is not self.current:
+                self._close(conn)
+
+    def _close(self, conn):
+        self.open.discard(conn)
+        conn.close()
@@ -0,0 +1,362 @@
+"""Schema of the bank database and the startup check that applies it.
+
+The DDL is fingerprinted and the fingerprint is stored in
+``PRAGMA user_version``. When the stored value matches, startup skips
+every CREATE statement; when it differs (new database or changed DDL),
+the idempotent statements below are run and the fingerprint is updated.
+
+CREATE TABLE IF NOT EXISTS does not change existing tables, so columns
+added to a table later are also listed in ADDED_COLUMNS. They are added
+to older databases (and backfilled) before any index is created. Tables
+derived from existing data are listed in DERIVED_TABLES and filled when
+they are first created. Triggers are dropped and recreated, so changes to
+their bodies reach existing databases, and indexes that were replaced are
+listed in DROPPED_INDEXES.
+"""
+import re
+import zlib
+
+from customer_lookup import backfill_lookup_columns
+from customer_summary import rebuild_customer_summary
+
+BANK_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        full_name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        address TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        email_norm TEXT,
+        phone_norm TEXT
+    )
+    ''',
+    # Exact teller lookups by normalised email and phone
+    '''
+    CREATE INDEX IF NOT EXISTS idx_users_email_norm
+    ON users (email_norm)
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_users_phone_norm
+    ON users (phone_norm)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS accounts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        account_number TEXT UNIQUE NOT NULL,
+        account_type TEXT NOT NULL,
+        balance REAL DEFAULT 0.0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        currency TEXT NOT NULL DEFAULT 'USD',
+        status TEXT NOT NULL DEFAULT 'open',
+        closed_at TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+    # A customer's live accounts (dashboards, account pickers); closed accounts stay out
+    '''
+    CREATE INDEX IF NOT EXISTS idx_accounts_user_open
+    ON accounts (user_id) WHERE status != 'closed'
+    ''',
+    # A customer's closed accounts; history and statements read both partial indexes
+    # ((user_id = ?1 AND status != 'closed') OR (user_id = ?1 AND status = 'closed'))
+    '''
+    CREATE INDEX IF NOT EXISTS idx_accounts_user_closed
+    ON accounts (user_id) WHERE status = 'closed'
+    ''',
+    # Account-number lookups of money operations; the planner prefers the full UNIQUE
+    # index, so those lookups name this one with INDEXED BY
+    '''
+    CREATE INDEX IF NOT EXISTS idx_accounts_number_open
+    ON accounts (account_number) WHERE status != 'closed'
+    ''',
+    # Frozen accounts only; loads the in-memory frozen set
+    '''
+    CREATE INDEX IF NOT EXISTS idx_accounts_frozen
+    ON accounts (account_number) WHERE status = 'frozen'
+    ''',
+    # Who froze or unfroze an account, when and why
+    '''
+    CREATE TABLE IF NOT EXISTS account_freezes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        account_id INTEGER NOT NULL,
+        action TEXT NOT NULL,
+        reason TEXT NOT NULL,
+        employee_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (account_id) REFERENCES accounts (id),
+        FOREIGN KEY (employee_id) REFERENCES employees (id)
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_account_freezes_account
+    ON account_freezes (account_id, id)
+    ''',
+    # Monotonic counters, e.g. for account numbers that are never reused
+    '''
+    CREATE TABLE IF NOT EXISTS sequences (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        account_id INTEGER,
+        transaction_type TEXT NOT NULL,
+        amount REAL NOT NULL,
+        description TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (account_id) REFERENCES accounts (id)
+    )
+    ''',
+    # Per-account ledger scans (history, reconciliation ranges)
+    '''
+    CREATE INDEX IF NOT EXISTS idx_transactions_account
+    ON transactions (account_id, id)
+    ''',
+    # Most recent activity first (employee dashboards, screening warm start)
+    '''
+    CREATE INDEX IF NOT EXISTS idx_transactions_timestamp
+    ON transactions (timestamp)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS employees (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        full_name TEXT NOT NULL,
+        employee_id TEXT UNIQUE NOT NULL,
+        position TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS loan_requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        amount REAL NOT NULL,
+        purpose TEXT NOT NULL,
+        duration INTEGER NOT NULL,
+        status TEXT DEFAULT 'Pending',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+    # Pending loan queue, oldest first
+    '''
+    CREATE INDEX IF NOT EXISTS idx_loan_requests_status
+    ON loan_requests (status, created_at)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS standing_orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        from_account TEXT NOT NULL,
+        to_account TEXT NOT NULL,
+        amount REAL NOT NULL,
+        description TEXT,
+        frequency TEXT NOT NULL,
+        start_date TEXT NOT NULL,
+        next_due TEXT NOT NULL,
+        active INTEGER DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_standing_orders_user
+    ON standing_orders (user_id, next_due)
+    ''',
+    # One row per executed (or failed) due date keeps catch-up idempotent
+    '''
+    CREATE TABLE IF NOT EXISTS standing_order_runs (
+        order_id INTEGER NOT NULL,
+        due_date TEXT NOT NULL,
+        status TEXT NOT NULL,
+        message TEXT,
+        executed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (order_id, due_date)
+    )
+    ''',
+    # Value of one unit of a currency in USD from its effective date on
+    '''
+    CREATE TABLE IF NOT EXISTS fx_rates (
+        currency TEXT NOT NULL,
+        effective_date TEXT NOT NULL,
+        rate REAL NOT NULL,
+        PRIMARY KEY (currency, effective_date)
+    )
+    ''',
+    # Stored outcomes of money operations, so retried requests are not posted twice
+    '''
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key TEXT PRIMARY KEY,
+        request TEXT NOT NULL,
+        result TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created
+    ON idempotency_keys (created_at)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS customer_summary (
+        user_id INTEGER PRIMARY KEY,
+        account_count INTEGER NOT NULL DEFAULT 0,
+        total_balance REAL NOT NULL DEFAULT 0.0,
+        last_activity TIMESTAMP,
+        accounts TEXT NOT NULL DEFAULT '[]',
+        recent TEXT NOT NULL DEFAULT '[]',
+        stale INTEGER NOT NULL DEFAULT 1
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_customer_summary_stale
+    ON customer_summary (user_id) WHERE stale = 1
+    ''',
+    # customer_summary maintenance: scalar columns only, the JSON is rebuilt in
+    # the background (customer_summary.SummaryRefresher) once ``stale`` is set
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_customer_summary_account_insert
+    AFTER INSERT ON accounts WHEN NEW.user_id IS NOT NULL AND NEW.status != 'closed'
+    BEGIN
+        INSERT OR IGNORE INTO customer_summary (user_id) VALUES (NEW.user_id);
+        UPDATE customer_summary
+        SET account_count = account_count + 1,
+            total_balance = total_balance + NEW.balance,
+            stale = 1
+        WHERE user_id = NEW.user_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_customer_summary_account_balance
+    AFTER UPDATE OF balance ON accounts
+    WHEN NEW.user_id IS NOT NULL AND NEW.balance != OLD.balance
+         AND NEW.status != 'closed' AND OLD.status != 'closed'
+    BEGIN
+        UPDATE customer_summary
+        SET total_balance = total_balance + NEW.balance - OLD.balance,
+            stale = 1
+        WHERE user_id = NEW.user_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_customer_summary_account_close
+    AFTER UPDATE OF status ON accounts
+    WHEN NEW.user_id IS NOT NULL AND NEW.status = 'closed' AND OLD.status != 'closed'
+    BEGIN
+        UPDATE customer_summary
+        SET account_count = account_count - 1,
+            total_balance = total_balance - OLD.balance,
+            stale = 1
+        WHERE user_id = NEW.user_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_customer_summary_account_delete
+    AFTER DELETE ON accounts WHEN OLD.user_id IS NOT NULL
+    BEGIN
+        UPDATE customer_summary
+        SET account_count = account_count - (OLD.status != 'closed'),
+            total_balance = total_balance - CASE WHEN OLD.status != 'closed' THEN OLD.balance ELSE 0 END,
+            stale = 1
+        WHERE user_id = OLD.user_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_customer_summary_transaction
+    AFTER INSERT ON transactions
+    BEGIN
+        UPDATE customer_summary
+        SET last_activity = NEW.timestamp,
+            stale = 1
+        WHERE user_id = (SELECT user_id FROM accounts WHERE id = NEW.account_id);
+    END
+    ''',
+)
+
+
+# (table, column, declaration, backfill) for columns added after the table was introduced
+ADDED_COLUMNS = (
+    ('users', 'email_norm', 'TEXT', backfill_lookup_columns),
+    ('users', 'phone_norm', 'TEXT', backfill_lookup_columns),
+    ('accounts', 'currency', "TEXT NOT NULL DEFAULT 'USD'", None),
+    ('accounts', 'status', "TEXT NOT NULL DEFAULT 'open'", None),
+    ('accounts', 'closed_at', 'TIMESTAMP', None),
+    ('customer_summary', 'stale', 'INTEGER NOT NULL DEFAULT 1', None),
+)
+
+# (table, backfill) for tables whose rows are derived from existing data
+DERIVED_TABLES = (
+    ('customer_summary', rebuild_customer_summary),
+)
+
+# Indexes removed from BANK_SCHEMA, dropped from existing databases
+DROPPED_INDEXES = (
+    # Replaced by the open/closed partial indexes
+    'idx_accounts_user',
+)
+
+
+def schema_fingerprint(statements=BANK_SCHEMA, added_columns=ADDED_COLUMNS):
+    """Positive 31-bit checksum of the DDL, suitable for PRAGMA user_version"""
+    statements = tuple(statements) + tuple(f"{table}.{column} {declaration}"
+                                           for table, column, declaration, _ in added_columns)
+    text = '\n'.join(' '.join(statement.split()) for statement in statements)
+    return zlib.crc32(text.encode()) & 0x7fffffff or 1
+
+
+SCHEMA_VERSION = schema_fingerprint()
+
+TRIGGER_NAME = re.compile(r'CREATE TRIGGER IF NOT EXISTS (\w+)')
+
+
+def add_columns(conn):
+    """Add ADDED_COLUMNS missing from existing tables and run their backfills"""
+    backfills = []
+    for table, column, declaration, backfill in ADDED_COLUMNS:
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        # Tables absent from this database (e.g. a shard file) are skipped
+        if existing and column not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+            if backfill is not None and backfill not in backfills:
+                backfills.append(backfill)
+    for backfill in backfills:
+        backfill(conn)
+
+
+def ensure_schema(conn):
+    """Apply the schema unless it is already current; return the previous user_version.
+
+    A previous version of 0 means the database file is new (or predates
+    fingerprinting), which callers use to decide on first-run seeding.
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version == SCHEMA_VERSION:
+        return version
+
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    tables = [statement for statement in BANK_SCHEMA if 'CREATE TABLE' in statement]
+    for statement in tables:
+        conn.execute(statement)
+    add_columns(conn)
+    for statement in BANK_SCHEMA:
+        if statement not in tables:
+            trigger = TRIGGER_NAME.search(statement)
+            if trigger:
+                conn.execute(f'DROP TRIGGER IF EXISTS {trigger.group(1)}')
+            conn.execute(statement)
+    for index in DROPPED_INDEXES:
+        conn.execute(f'DROP INDEX IF EXISTS {index}')
+    for table, backfill in DERIVED_TABLES:
+        if table not in existing:
+            backfill(conn)
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    conn.commit()
+    return version
@@ -0,0 +1,202 @@
+"""In-memory velocity screening for debits.
+
+Every account keeps its recent debits in a small ring buffer (grown only
+when uncounted debits would evict one from the last day), so the
+per-minute, per-hour and per-day counts and totals are computed from at
+most a few dozen floats, without touching the database. The
+buffers are warm-started from the ledger when the application starts.
+
+A debit that passed ``check`` is held as pending (``reserve``) until its
+transaction commits (``record``) or rolls back (``release``), so debits
+applied in the same group-commit batch are counted against each other.
+
+Limits are in BASE_CURRENCY: debits from accounts in other currencies are
+converted with the ``FxRates`` cache before they are counted. Without a
+rate for the currency the amount is counted as is.
+"""
+import time
+from array import array
+
+from fx import BASE_CURRENCY, FxError
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+DEFAULT_LIMITS = {
+    'max_debits_per_minute': 3,
+    'max_debits_per_hour': 10,
+    'max_debits_per_day': 20,
+    'max_amount_per_minute': 5000.0,
+    'max_amount_per_hour': 10000.0,
+    'max_amount_per_day': 25000.0,
+    'max_new_payees_per_day': 5,
+}
+
+# How far back transfers are read to learn each account's known payees
+PAYEE_HISTORY_DAYS = 90
+
+
+class RingBuffer:
+    """Buffer of (timestamp, amount) pairs, newest last; ``grow`` doubles its capacity"""
+    __slots__ = ('times', 'amounts', 'head', 'size')
+
+    def __init__(self, capacity):
+        self.times = array('d', bytes(8 * capacity))
+        self.amounts = array('d', bytes(8 * capacity))
+        self.head = 0
+        self.size = 0
+
+    def append(self, timestamp, amount=0.0):
+        self.times[self.head] = timestamp
+        self.amounts[self.head] = amount
+        self.head = (self.head + 1) % len(self.times)
+        self.size = min(self.size + 1, len(self.times))
+
+    def oldest(self):
+        """Timestamp of the oldest entry, or None when empty"""
+        if not self.size:
+            return None
+        return self.times[(self.head - self.size) % len(self.times)]
+
+    def grow(self):
+        """Double the capacity, keeping every entry"""
+        capacity = len(self.times)
+        order = [(self.head - self.size + i) % capacity for i in range(self.size)]
+        padding = bytes(8 * (2 * capacity - self.size))
+        self.times = array('d', (self.times[i] for i in order)) + array('d', padding)
+        self.amounts = array('d', (self.amounts[i] for i in order)) + array('d', padding)
+        self.head = self.size
+
+    def window(self, since):
+        """Return (count, total) of entries at or after ``since``"""
+        capacity = len(self.times)
+        count = 0
+        total = 0.0
+        index = self.head
+        for _ in range(self.size):
+            index = (index - 1) % capacity
+            if self.times[index] < since:
+                break
+            count += 1
+            total += self.amounts[index]
+        return count, total
+
+
+class VelocityScreen:
+    """Sliding-window debit counters and rules, evaluated before a debit commits"""
+
+    def __init__(self, limits=None, fx=None):
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.fx = fx
+        # Initial capacity per account; buffers grow when uncounted debits go past it
+        self.capacity = self.limits['max_debits_per_day']
+        self.debits = {}
+        self.payees = {}
+        self.new_payees = {}
+        # account_id -> [amount, payee, amount in BASE_CURRENCY] of debits checked but not yet committed
+        self.pending = {}
+
+    def base_amount(self, amount, currency=BASE_CURRENCY):
+        """``amount`` of ``currency`` in BASE_CURRENCY at today's rate"""
+        if currency == BASE_CURRENCY or self.fx is None:
+            return amount
+        try:
+            return amount * self.fx.rate(currency)
+        except FxError:
+            return amount
+
+    def warm_start(self, cursor, now=None):
+        """Replay recent debits and transfers from the ledger"""
+        now = now or time.time()
+        cursor.execute('''
+            SELECT t.account_id, t.amount, CAST(strftime('%s', t.timestamp) AS INTEGER),
+                   t.transaction_type, t.description, a.currency
+            FROM transactions t JOIN accounts a ON a.id = t.account_id
+            WHERE t.timestamp >= datetime('now', ?)
+            AND t.transaction_type IN ('Withdrawal', 'Transfer Out')
+            ORDER BY t.timestamp, t.id
+        ''', (f"-{PAYEE_HISTORY_DAYS} days",))
+
+        for account_id, amount, timestamp, transaction_type, description, currency in cursor.fetchall():
+            payee = None
+            if transaction_type == 'Transfer Out' and description.startswith('Transfer to '):
+                payee = description[len('Transfer to '):].split(':', 1)[0]
+            if timestamp >= now - DAY:
+                self.record(account_id, -amount, payee, timestamp, currency)
+            elif payee:
+                self.payees.setdefault(account_id, set()).add(payee)
+
+    def check(self, account_id, amount, payee=None, now=None, counted=True, currency=BASE_CURRENCY):
+        """Return the reason a debit would breach a rule, or None if it may proceed.
+
+        ``counted=False`` skips the debit-count limits (the amount and new
+        payee limits still apply), for pre-authorised payments.
+        """
+        now = now or time.time()
+        limits = self.limits
+        amount = self.base_amount(amount, currency)
+
+        # Pending debits are about to commit, so they fall inside every window
+        pending = self.pending.get(account_id, ())
+        pending_total = sum(entry[2] for entry in pending)
+        buffer = self.debits.get(account_id)
+        for span, name in ((MINUTE, 'minute'), (HOUR, 'hour'), (DAY, 'day')):
+            count, total = buffer.window(now - span) if buffer is not None else (0, 0.0)
+            if counted and count + len(pending) + 1 > limits[f'max_debits_per_{name}']:
+                return f"Too many debits in the last {name}"
+            if total + pending_total + amount > limits[f'max_amount_per_{name}']:
+                return f"Debit limit for the last {name} exceeded"
+
+        known = self.payees.get(account_id, ())
+        if payee and payee not in known:
+            pending_payees = {entry[1] for entry in pending if entry[1] and entry[1] not in known}
+            if payee not in pending_payees:
+                recent = self.new_payees.get(account_id)
+                count = recent.window(now - DAY)[0] if recent is not None else 0
+                if count + len(pending_payees) + 1 > limits['max_new_payees_per_day']:
+                    return "Too many new payees today"
+
+        return None
+
+    def reserve(self, account_id, amount, payee=None, currency=BASE_CURRENCY):
+        """Hold a debit that passed ``check`` until it is recorded or released"""
+        self.pending.setdefault(account_id, []).append([amount, payee, self.base_amount(amount, currency)])
+
+    def release(self, account_id, amount, payee=None):
+        """Drop a pending debit whose transaction rolled back; returns its base amount if it was pending"""
+        pending = self.pending.get(account_id)
+        if pending is None:
+            return None
+        for index, entry in enumerate(pending):
+            if entry[0] == amount and entry[1] == payee:
+                del pending[index]
+                if not pending:
+                    del self.pending[account_id]
+                return entry[2]
+        return None
+
+    def record(self, account_id, amount, payee=None, now=None, currency=BASE_CURRENCY):
+        """Remember a committed debit, replacing its pending entry if it had one"""
+        now = now or time.time()
+        # The pending entry keeps the base amount it was screened with
+        base = self.release(account_id, amount, payee)
+        if base is None:
+            base = self.base_amount(amount, currency)
+        buffer = self.debits.get(account_id)
+        if buffer is None:
+            buffer = self.debits[account_id] = RingBuffer(self.capacity)
+        elif buffer.size == len(buffer.times) and buffer.oldest() >= now - DAY:
+            # Uncounted debits (standing orders) can exceed the daily count; evicting a
+            # same-day entry would drop it from the daily amount
+            buffer.grow()
+        buffer.append(now, base)
+
+        if payee:
+            known = self.payees.setdefault(account_id, set())
+            if payee not in known:
+                known.add(payee)
+                recent = self.new_payees.get(account_id)
+                if recent is None:
+                    recent = self.new_payees[account_id] = RingBuffer(self.limits['max_new_payees_per_day'])
+                recent.append(now)
@@ -0,0 +1,129 @@
+"""Registry of reusable screens for the dashboard content area.
+
+Each screen is built once, the first time it is shown, and kept in its
+own frame. Switching screens only swaps which frame is packed and calls
+the screen's refresh function to update its data-bound widgets, so the
+number of Tk widgets stays bounded however long a session lasts.
+
+Long lists are filled by ``TreeStream``, which inserts rows from an open
+cursor a chunk at a time between Tk events, so the first page shows at
+once and the window stays responsive. A screen's streams are cancelled
+when another screen is shown. ``on_open``/``on_close`` are called with
+each cursor a stream starts and stops reading from, so the owner of the
+connection can keep it open meanwhile.
+"""
+import sqlite3
+import tkinter as tk
+
+CHUNK_SIZE = 200
+CHUNK_DELAY_MS = 1
+
+
+class ScreenRegistry:
+    """Caches screen frames inside one container"""
+
+    def __init__(self, container, bg='white'):
+        self.container = container
+        self.bg = bg
+        self.screens = {}
+        self.current = None
+        self.hide_callbacks = {}
+
+    def on_hide(self, name, callback):
+        """Call ``callback()`` whenever screen ``name`` is replaced by another one"""
+        self.hide_callbacks.setdefault(name, []).append(callback)
+
+    def show(self, name, build, *args):
+        """Show a screen, building it on first use, and refresh it with ``args``.
+
+        ``build(frame)`` creates the screen's widgets and returns a refresh
+        function (or None for static screens).
+        """
+        screen = self.screens.get(name)
+        if screen is None:
+            frame = tk.Frame(self.container, bg=self.bg)
+            screen = self.screens[name] = (frame, build(frame))
+
+        if self.current is not None and self.current != name:
+            for callback in self.hide_callbacks.get(self.current, ()):
+                callback()
+            self.screens[self.current][0].pack_forget()
+        frame, refresh = screen
+        frame.pack(fill='both', expand=True)
+        self.current = name
+
+        if refresh is not None:
+            refresh(*args)
+
+
+class TreeStream:
+    """Fills a Treeview from an executed cursor in chunks scheduled with ``after``"""
+
+    def __init__(self, tree, counter=None, chunk_size=CHUNK_SIZE, delay=CHUNK_DELAY_MS, on_open=None,
+                 on_close=None):
+        self.tree = tree
+        self.counter = counter
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.on_open = on_open
+        self.on_close = on_close
+        self.cursor = None
+        self.format_row = None
+        self.after_id = None
+        self.rows = 0
+
+    def start(self, cursor, format_row=tuple):
+        """Clear the tree and stream the rows of ``cursor`` (already executed) into it"""
+        self.cancel()
+        self.tree.delete(*self.tree.get_children())
+        self.cursor = cursor
+        self.format_row = format_row
+        self.rows = 0
+        if self.on_open is not None:
+            self.on_open(cursor)
+        # The first page is inserted right away; the rest follows between events
+        self._insert_chunk()
+
+    def cancel(self):
+        """Stop streaming, e.g. because the screen is no longer shown"""
+        if self.after_id is not None:
+            self.tree.after_cancel(self.after_id)
+            self.after_id = None
+        if self.cursor is not None:
+            self._close_cursor()
+            self._show_count(f"{self.rows:,} rows (stopped)")
+
+    def _insert_chunk(self):
+        self.after_id = None
+        try:
+            chunk = self.cursor.fetchmany(self.chunk_size)
+            for row in chunk:
+                self.tree.insert('', 'end', values=self.format_row(row))
+        except (sqlite3.Error, tk.TclError):
+            # The connection was swapped or the widgets destroyed (logout) mid-stream
+            self._close_cursor()
+            return
+        self.rows += len(chunk)
+
+        if len(chunk) < self.chunk_size:
+            self._close_cursor()
+            self._show_count(f"{self.rows:,} rows")
+        else:
+            self._show_count(f"Loading... {self.rows:,} rows")
+            self.after_id = self.tree.after(self.delay, self._insert_chunk)
+
+    def _close_cursor(self):
+        cursor, self.cursor = self.cursor, None
+        try:
+            cursor.close()
+        except sqlite3.Error:
+            pass
+        if self.on_close is not None:
+            self.on_close(cursor)
+
+    def _show_count(self, text):
+        if self.counter is not None:
+            try:
+                self.counter.config(text=text)
+            except tk.TclError:
+                pass
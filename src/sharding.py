@@ -0,0 +1,466 @@
+"""Optional hash-partitioned ledger spread over several SQLite files.
+
+Accounts are assigned to a shard by a hash of their account number. Each
+shard file is owned by one worker process that applies deposits,
+withdrawals and same-shard transfers through the usual Ledger and
+group-commit writer, so shards commit in parallel.
+
+Transfers between shards use two-phase commit driven by the coordinator
+in the calling process:
+
+1. the transfer is logged as ``started`` in the coordinator database;
+2. the source shard screens and debits the account and records a prepared
+   hold, the destination shard records a prepared credit (no balance
+   change yet);
+3. the coordinator logs ``committed`` - from here on the transfer will
+   happen even if a process dies;
+4. both shards turn their prepared records into ledger transactions and
+   the log entry is marked ``done``.
+
+The screened debit stays pending in the source shard's VelocityScreen
+while the transfer is prepared; it is recorded when the hold commits and
+released when it is aborted, so aborted transfers never count.
+
+If anything fails before step 3 both holds are aborted and the debit is
+refunded. ``ShardedBank.recover`` finishes or aborts in-doubt transfers
+after a crash; every shard step is idempotent on the transfer id.
+
+The operations keep the semantics of the single-file BankingSystem:
+same validation, same error messages and the same transaction rows.
+Shards have no exchange rates, so transfers between accounts in
+different currencies are rejected (cross-shard ones are aborted once
+both prepares have reported their account's currency).
+"""
+import itertools
+import multiprocessing
+import sqlite3
+import threading
+import uuid
+import zlib
+from concurrent.futures import Future
+
+from account_cache import AccountCache
+from group_commit import GroupCommitWriter
+from ledger import Ledger, LedgerError, Posting, ScreeningError
+from schema import add_columns
+from screening import VelocityScreen
+
+SHARD_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS accounts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        account_number TEXT UNIQUE NOT NULL,
+        account_type TEXT NOT NULL,
+        balance REAL DEFAULT 0.0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        currency TEXT NOT NULL DEFAULT 'USD',
+        status TEXT NOT NULL DEFAULT 'open',
+        closed_at TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        account_id INTEGER,
+        transaction_type TEXT NOT NULL,
+        amount REAL NOT NULL,
+        description TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (account_id) REFERENCES accounts (id)
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_accounts_number_open
+    ON accounts (account_number) WHERE status != 'closed'
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_transactions_account
+    ON transactions (account_id, id)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS prepared_transfers (
+        xid TEXT PRIMARY KEY,
+        account_id INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        amount REAL NOT NULL,
+        description TEXT NOT NULL,
+        state TEXT NOT NULL DEFAULT 'prepared',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+)
+
+COORDINATOR_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS transfer_log (
+        xid TEXT PRIMARY KEY,
+        from_account TEXT NOT NULL,
+        to_account TEXT NOT NULL,
+        amount REAL NOT NULL,
+        description TEXT NOT NULL,
+        state TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def shard_for(account_number, shards):
+    """Stable shard index for an account number"""
+    return zlib.crc32(account_number.encode()) % shards
+
+
+def shard_path(base_path, index):
+    return f"{base_path}.shard{index}.db"
+
+
+def ensure_shard_schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        for statement in SHARD_SCHEMA:
+            conn.execute(statement)
+        add_columns(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# Shard-side operations, executed by the shard's group-commit writer
+
+def open_account(cursor, account_number, user_id, account_type, balance=0.0, currency='USD'):
+    cursor.execute('''
+        INSERT INTO accounts (user_id, account_number, account_type, balance, currency)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (user_id, account_number, account_type, balance, currency))
+    if balance:
+        cursor.execute('''
+            INSERT INTO transactions (account_id, transaction_type, amount, description)
+            VALUES (?, ?, ?, ?)
+        ''', (cursor.lastrowid, 'Deposit', balance, 'Initial deposit'))
+
+
+def prepare_debit(ledger, cursor, xid, account_number, amount, to_account, description):
+    """Hold the funds on the source shard; returns the hold as a Posting of kind ``hold``"""
+    cursor.execute('''
+        SELECT p.account_id, p.amount, a.currency FROM prepared_transfers p
+        JOIN accounts a ON a.id = p.account_id
+        WHERE p.xid = ?
+    ''', (xid,))
+    row = cursor.fetchone()
+    if row:
+        # Already prepared: its screening entry belongs to the first call
+        return Posting('hold', row[0], row[1], to_account, None, row[2], replayed=True)
+
+    account = ledger.resolve(cursor, account_number, "Invalid account number")
+    with ledger.screened(account.id, amount, to_account, currency=account.currency):
+        ledger.debit(cursor, account.id, amount)
+        cursor.execute('''
+            INSERT INTO prepared_transfers (xid, account_id, role, amount, description)
+            VALUES (?, ?, 'debit', ?, ?)
+        ''', (xid, account.id, amount, f"Transfer to {to_account}: {description}"))
+    return Posting('hold', account.id, amount, to_account, None, account.currency)
+
+
+def prepare_credit(ledger, cursor, xid, account_number, amount, from_account, description):
+    """Validate the destination and remember the pending credit; returns its currency"""
+    account = ledger.resolve(cursor, account_number, "Invalid account number")
+    cursor.execute('''
+        INSERT OR IGNORE INTO prepared_transfers (xid, account_id, role, amount, description)
+        VALUES (?, ?, 'credit', ?, ?)
+    ''', (xid, account.id, amount, f"Transfer from {from_account}: {description}"))
+    return account.currency
+
+
+def _payee(description):
+    """The destination account of a debit hold's ``Transfer to ...`` description"""
+    return description[len('Transfer to '):].split(':', 1)[0]
+
+
+def commit_prepared(cursor, xid):
+    """Apply a prepared record; a debit returns its transfer Posting so screening records it"""
+    cursor.execute('''
+        SELECT p.account_id, p.role, p.amount, p.description, a.currency FROM prepared_transfers p
+        JOIN accounts a ON a.id = p.account_id
+        WHERE p.xid = ? AND p.state = 'prepared'
+    ''', (xid,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    account_id, role, amount, description, currency = row
+    posting = None
+    if role == 'credit':
+        cursor.execute('UPDATE accounts SET balance = balance + ? WHERE id = ?', (amount, account_id))
+        transaction = (account_id, 'Transfer In', amount, description)
+    else:
+        transaction = (account_id, 'Transfer Out', -amount, description)
+        posting = Posting('transfer', account_id, amount, _payee(description), amount, currency)
+    cursor.execute('''
+        INSERT INTO transactions (account_id, transaction_type, amount, description)
+        VALUES (?, ?, ?, ?)
+    ''', transaction)
+    cursor.execute("UPDATE prepared_transfers SET state = 'committed' WHERE xid = ?", (xid,))
+    return posting
+
+
+def abort_prepared(ledger, cursor, xid):
+    """Refund a prepared debit hold and drop its pending screening entry"""
+    cursor.execute('''
+        SELECT account_id, role, amount, description FROM prepared_transfers
+        WHERE xid = ? AND state = 'prepared'
+    ''', (xid,))
+    row = cursor.fetchone()
+    if row is None:
+        return
+    account_id, role, amount, description = row
+    if role == 'debit':
+        cursor.execute('UPDATE accounts SET balance = balance + ? WHERE id = ?', (amount, account_id))
+        # Nothing if the worker restarted since the prepare
+        ledger.screen.release(account_id, amount, _payee(description))
+    cursor.execute("UPDATE prepared_transfers SET state = 'aborted' WHERE xid = ?", (xid,))
+
+
+def balance(cursor, account_number):
+    cursor.execute('SELECT balance FROM accounts WHERE account_number = ?', (account_number,))
+    row = cursor.fetchone()
+    if row is None:
+        raise LedgerError("Invalid account number")
+    return row[0]
+
+
+def _reply(request_id, future):
+    error = future.exception()
+    if error is None:
+        return request_id, None, future.result()
+    if isinstance(error, ScreeningError):
+        return request_id, 'screening', str(error)
+    if isinstance(error, LedgerError):
+        return request_id, 'ledger', str(error)
+    return request_id, 'error', f"{type(error).__name__}: {error}"
+
+
+def _run_shard(path, requests, responses):
+    """Worker process owning one shard file"""
+    ensure_shard_schema(path)
+    ledger = Ledger(AccountCache(), VelocityScreen())
+    writer = GroupCommitWriter(path, on_commit=ledger.committed, on_abort=ledger.aborted)
+    writer.start()
+    handlers = {
+        'open_account': open_account,
+        'deposit': ledger.deposit,
+        'withdraw': ledger.withdraw,
+        'transfer': ledger.transfer,
+        'prepare_debit': lambda cursor, *args: prepare_debit(ledger, cursor, *args),
+        'prepare_credit': lambda cursor, *args: prepare_credit(ledger, cursor, *args),
+        'commit': commit_prepared,
+        'abort': lambda cursor, *args: abort_prepared(ledger, cursor, *args),
+        'balance': balance,
+    }
+    try:
+        while True:
+            message = requests.get()
+            if message is None:
+                break
+            request_id, operation, args = message
+            future = writer.submit(handlers[operation], *args)
+            future.add_done_callback(lambda f, rid=request_id: responses.put(_reply(rid, f)))
+    finally:
+        writer.close()
+
+
+class _ShardClient:
+    """Parent-side handle on one shard worker"""
+
+    def __init__(self, path):
+        self.requests = multiprocessing.Queue()
+        self.responses = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_run_shard, args=(path, self.requests, self.responses),
+                                               daemon=True)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.process.start()
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, operation, *args):
+        future = Future()
+        with self.lock:
+            request_id = next(self.ids)
+            self.pending[request_id] = future
+        self.requests.put((request_id, operation, args))
+        return future
+
+    def call(self, operation, *args):
+        return self.submit(operation, *args).result()
+
+    def _dispatch(self):
+        while True:
+            message = self.responses.get()
+            if message is None:
+                break
+            request_id, kind, value = message
+            with self.lock:
+                future = self.pending.pop(request_id)
+            if kind is None:
+                future.set_result(value)
+            elif kind == 'screening':
+                future.set_exception(ScreeningError(value))
+            elif kind == 'ledger':
+                future.set_exception(LedgerError(value))
+            else:
+                future.set_exception(RuntimeError(value))
+
+    def close(self):
+        self.requests.put(None)
+        self.process.join()
+        self.responses.put(None)
+        self.dispatcher.join()
+
+
+class ShardedBank:
+    """Deposit, withdrawal and transfer API over hash-partitioned shards"""
+
+    def __init__(self, base_path, shards=4):
+        self.base_path = base_path
+        self.shards = [_ShardClient(shard_path(base_path, i)) for i in range(shards)]
+        self.log = sqlite3.connect(f"{base_path}.coordinator.db", check_same_thread=False)
+        self.log.execute(COORDINATOR_SCHEMA)
+        self.log.commit()
+        self.log_lock = threading.Lock()
+        self.recover()
+
+    def shard(self, account_number):
+        return self.shards[shard_for(account_number, len(self.shards))]
+
+    def open_account(self, account_number, user_id, account_type, balance=0.0, currency='USD'):
+        self.shard(account_number).call('open_account', account_number, user_id, account_type, balance,
+                                        currency)
+
+    def balance(self, account_number):
+        return self.shard(account_number).call('balance', account_number)
+
+    def deposit(self, account_number, amount, description="Deposit"):
+        return self.shard(account_number).call('deposit', account_number, amount, description)
+
+    def withdraw(self, account_number, amount, description="Withdrawal"):
+        return self.shard(account_number).call('withdraw', account_number, amount, description)
+
+    def transfer(self, from_account, to_account, amount, description="Transfer"):
+        source = self.shard(from_account)
+        target = self.shard(to_account)
+        if source is target:
+            return source.call('transfer', from_account, to_account, amount, description)
+        if amount <= 0:
+            raise LedgerError("Amount must be positive")
+
+        xid = uuid.uuid4().hex
+        self._log(xid, 'started', from_account, to_account, amount, description)
+        debit = source.submit('prepare_debit', xid, from_account, amount, to_account, description)
+        credit = target.submit('prepare_credit', xid, to_account, amount, from_account, description)
+        try:
+            hold = debit.result()
+            if credit.result() != hold.currency:
+                raise LedgerError("Cross-currency transfers are not available")
+        except Exception:
+            # Wait for both prepares so the abort cannot overtake one of them
+            for future in (debit, credit):
+                if not future.done():
+                    future.exception()
+            self._finish(xid, 'abort', 'aborted')
+            raise
+
+        self._log(xid, 'committed')
+        self._finish(xid, 'commit', 'done')
+        return Posting('transfer', hold.account_id, amount, to_account, amount, hold.currency)
+
+    def recover(self):
+        """Complete or roll back transfers left in doubt by a crash"""
+        with self.log_lock:
+            pending = self.log.execute('''
+                SELECT xid, state FROM transfer_log WHERE state IN ('started', 'committed')
+            ''').fetchall()
+        for xid, state in pending:
+            if state == 'committed':
+                self._finish(xid, 'commit', 'done')
+            else:
+                self._finish(xid, 'abort', 'aborted')
+
+    def close(self):
+        for client in self.shards:
+            client.close()
+        self.log.close()
+
+    def _finish(self, xid, operation, final_state):
+        futures = [client.submit(operation, xid) for client in self.shards_of(xid)]
+        for future in futures:
+            future.result()
+        self._log(xid, final_state)
+
+    def shards_of(self, xid):
+        with self.log_lock:
+            row = self.log.execute('SELECT from_account, to_account FROM transfer_log WHERE xid = ?',
+                                   (xid,)).fetchone()
+        return [self.shard(row[0]), self.shard(row[1])]
+
+    def _log(self, xid, state, *details):
+        with self.log_lock:
+            if details:
+                self.log.execute('''
+                    INSERT INTO transfer_log (xid, from_account, to_account, amount, description, state)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (xid, *details, state))
+            else:
+                self.log.execute('UPDATE transfer_log SET state = ? WHERE xid = ?', (state, xid))
+            self.log.commit()
+
+
+def partition_database(source_path, base_path, shards=4):
+    """Split the accounts and transactions of a single-file bank into shard files"""
+    paths = [shard_path(base_path, i) for i in range(shards)]
+    for path in paths:
+        ensure_shard_schema(path)
+    targets = [sqlite3.connect(path) for path in paths]
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+    try:
+        placement = {}
+        for row in source.execute('''
+            SELECT id, user_id, account_number, account_type, balance, created_at, currency, status, closed_at
+            FROM accounts
+        '''):
+            index = shard_for(row[2], shards)
+            placement[row[0]] = index
+            targets[index].execute('''
+                INSERT OR REPLACE INTO accounts
+                    (id, user_id, account_number, account_type, balance, created_at, currency, status, closed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', row)
+
+        for row in source.execute('''
+            SELECT id, account_id, transaction_type, amount, description, timestamp FROM transactions
+        '''):
+            index = placement.get(row[1])
+            if index is not None:
+                targets[index].execute('''
+                    INSERT OR REPLACE INTO transactions
+                        (id, account_id, transaction_type, amount, description, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', row)
+
+        for target in targets:
+            target.commit()
+    finally:
+        source.close()
+        for target in targets:
+            target.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Partition a SecureBank database into shard files")
+    parser.add_argument('--db', default='banking_system.db', help="Single-file bank to partition")
+    parser.add_argument('--base', default='banking_system', help="Prefix for the shard files")
+    parser.add_argument('--shards', type=int, default=4, help="Number of shards")
+    args = parser.parse_args()
+    partition_database(args.db, args.base, args.shards)
+    print(f"Wrote {args.shards} shards to {shard_path(args.base, 0)} ...")
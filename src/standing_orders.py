@@ -0,0 +1,176 @@
+"""Standing orders: recurring transfers executed by an in-process scheduler.
+
+The scheduler keeps (next due date, order id) pairs in a min-heap and
+sleeps until the earliest one is due. Everything due is then executed as
+one batch operation on the group-commit writer, each order in its own
+savepoint through ``Ledger.transfer``. Every execution is recorded in
+``standing_order_runs`` keyed by (order_id, due_date), so after downtime
+missed dates are caught up one by one and no date is ever paid twice.
+
+Executions are screened like any other transfer, except for the
+debit-count limits, which catch-up runs after downtime would trip: a
+payment to a new payee or above the amount limits is refused at run time.
+
+A run that is refused (insufficient funds, frozen account, screening) is
+recorded as ``Failed`` with the reason and the order moves on to its next
+date. Failed runs are deliberately not retried: paying days late could
+take the money after the customer has paid some other way.
+"""
+import heapq
+import sqlite3
+import threading
+import traceback
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+
+from ledger import LedgerError
+from metrics import DB_RETRIES
+
+FREQUENCIES = ('Weekly', 'Monthly')
+
+DEFAULT_MAX_BATCH = 200
+RETRY_DELAY = 60.0
+
+
+def next_due_date(due, frequency, anchor_day):
+    """Return the due date following ``due``; monthly orders keep their day of month where possible"""
+    if frequency == 'Weekly':
+        return due + timedelta(days=7)
+    year = due.year + due.month // 12
+    month = due.month % 12 + 1
+    return date(year, month, min(anchor_day, monthrange(year, month)[1]))
+
+
+def run_due_orders(cursor, ledger, due):
+    """Writer operation executing the (due_date, order_id) pairs in ``due``.
+
+    Orders that were cancelled, already moved past that date or already
+    have a run recorded for it are skipped. Returns the list of postings.
+    """
+    postings = []
+    for due_date, order_id in due:
+        cursor.execute('''
+            SELECT from_account, to_account, amount, description, frequency, start_date, next_due
+            FROM standing_orders WHERE id = ? AND active = 1
+        ''', (order_id,))
+        order = cursor.fetchone()
+        if order is None or order[6] != due_date:
+            continue
+        from_account, to_account, amount, description, frequency, start_date, _ = order
+
+        cursor.execute('SELECT 1 FROM standing_order_runs WHERE order_id = ? AND due_date = ?',
+                       (order_id, due_date))
+        if cursor.fetchone() is None:
+            cursor.execute('SAVEPOINT standing_order')
+            try:
+                # Catch-up runs may fall in one batch, so only the count limits are waived
+                posting = ledger.transfer(cursor, from_account, to_account, amount,
+                                          description or f"Standing order #{order_id}", counted=False)
+            except LedgerError as e:
+                cursor.execute('ROLLBACK TO standing_order')
+                cursor.execute('RELEASE standing_order')
+                status, message = 'Failed', str(e)
+            else:
+                cursor.execute('RELEASE standing_order')
+                postings.append(posting)
+                status, message = 'Executed', None
+            cursor.execute('''
+                INSERT INTO standing_order_runs (order_id, due_date, status, message)
+                VALUES (?, ?, ?, ?)
+            ''', (order_id, due_date, status, message))
+
+        anchor_day = date.fromisoformat(start_date).day
+        following = next_due_date(date.fromisoformat(due_date), frequency, anchor_day)
+        cursor.execute('UPDATE standing_orders SET next_due = ? WHERE id = ?',
+                       (following.isoformat(), order_id))
+    return postings
+
+
+class StandingOrderScheduler:
+    """Background thread executing standing orders as they fall due"""
+
+    def __init__(self, db_path, writer, ledger, max_batch=DEFAULT_MAX_BATCH):
+        self.db_path = db_path
+        self.writer = writer
+        self.ledger = ledger
+        self.max_batch = max_batch
+        self.heap = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='standing-orders', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def schedule(self, order_id, due_date):
+        """Add an order (e.g. one just created) to the heap"""
+        with self.lock:
+            heapq.heappush(self.heap, (due_date, order_id))
+        self.wakeup.set()
+
+    def _load(self, conn):
+        rows = conn.execute('SELECT next_due, id FROM standing_orders WHERE active = 1').fetchall()
+        with self.lock:
+            self.heap.extend(rows)
+            heapq.heapify(self.heap)
+
+    def _seconds_until_due(self):
+        with self.lock:
+            if not self.heap:
+                return None
+            due = datetime.combine(date.fromisoformat(self.heap[0][0]), datetime.min.time())
+        return (due - datetime.now()).total_seconds()
+
+    def _pop_due(self):
+        today = date.today().isoformat()
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= today and len(due) < self.max_batch:
+                entry = heapq.heappop(self.heap)
+                if not due or due[-1] != entry:
+                    due.append(entry)
+        return due
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self._load(conn)
+            while not self.stopped.is_set():
+                wait = self._seconds_until_due()
+                if wait is None or wait > 0:
+                    self.wakeup.wait(wait)
+                    self.wakeup.clear()
+                    continue
+
+                due = self._pop_due()
+                try:
+                    self.writer.execute(run_due_orders, self.ledger, due)
+                except Exception:
+                    traceback.print_exc()
+                    DB_RETRIES.inc('standing_orders')
+                    with self.lock:
+                        for entry in due:
+                            heapq.heappush(self.heap, entry)
+                    self.stopped.wait(RETRY_DELAY)
+                    continue
+
+                # Re-queue each order at the date the batch moved it to
+                order_ids = [order_id for _, order_id in due]
+                rows = conn.execute(f'''
+                    SELECT next_due, id FROM standing_orders
+                    WHERE active = 1 AND id IN ({','.join('?' * len(order_ids))})
+                ''', order_ids).fetchall()
+                with self.lock:
+                    for row in rows:
+                        heapq.heappush(self.heap, row)
+        finally:
+            conn.close()
@@ -0,0 +1,234 @@
+"""Month-end statement run for every account.
+
+Accounts are split into id ranges handled by a process pool. Each worker
+opens its own read-only connection and reads its accounts' activity in a
+single scan ordered by (account_id, id), writing one statement file per
+account. A file is written under a temporary name and renamed when
+complete, and accounts whose statement already exists are skipped, so a
+crashed run is resumed simply by starting it again.
+
+    python statements.py --month 2026-01 --out statements
+"""
+import argparse
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+from fx import LATIN1_SYMBOLS, format_money
+
+FETCH_CHUNK = 10000
+
+Statement = namedtuple('Statement', 'holder account_number account_type currency start end opening closing '
+                                    'transactions')
+
+
+def month_bounds(month):
+    """Return the first day of ``month`` (YYYY-MM) and of the following month"""
+    first = datetime.strptime(month, '%Y-%m').date()
+    following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return first.isoformat(), following.isoformat()
+
+
+def render_text(statement):
+    lines = [
+        "SecureBank Pro - Account Statement",
+        "",
+        f"Account Holder: {statement.holder}",
+        f"Account Number: {statement.account_number}",
+        f"Account Type: {statement.account_type}",
+        f"Statement Period: {statement.start} to {statement.end}",
+        f"Opening Balance: {format_money(statement.opening, statement.currency)}",
+        f"Closing Balance: {format_money(statement.closing, statement.currency)}",
+        "",
+        f"{'Date':<12}{'Type':<18}{'Amount':>14}  Description",
+    ]
+    for timestamp, transaction_type, amount, description in statement.transactions:
+        lines.append(f"{timestamp[:10]:<12}{transaction_type:<18}{format_money(amount, statement.currency):>14}  {description or ''}")
+    if not statement.transactions:
+        lines.append("No transactions in this period")
+    return '\n'.join(lines) + '\n'
+
+
+def write_text(path, statement):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(render_text(statement))
+
+
+def write_pdf(path, statement):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(0, 10, "SecureBank Pro - Account Statement", 0, 1, 'C')
+    pdf.ln(10)
+
+    pdf.set_font("Arial", '', 12)
+    pdf.cell(0, 10, f"Account Holder: {statement.holder}", 0, 1)
+    pdf.cell(0, 10, f"Account Number: {statement.account_number}", 0, 1)
+    pdf.cell(0, 10, f"Account Type: {statement.account_type}", 0, 1)
+    pdf.cell(0, 10, f"Statement Period: {statement.start} to {statement.end}", 0, 1)
+    pdf.cell(0, 10, f"Opening Balance: {format_money(statement.opening, statement.currency, LATIN1_SYMBOLS)}", 0, 1)
+    pdf.cell(0, 10, f"Closing Balance: {format_money(statement.closing, statement.currency, LATIN1_SYMBOLS)}", 0, 1)
+    pdf.ln(10)
+
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(40, 10, "Date", 1)
+    pdf.cell(40, 10, "Type", 1)
+    pdf.cell(40, 10, "Amount", 1)
+    pdf.cell(70, 10, "Description", 1)
+    pdf.ln()
+
+    pdf.set_font("Arial", '', 10)
+    for timestamp, transaction_type, amount, description in statement.transactions:
+        pdf.cell(40, 10, timestamp[:10], 1)
+        pdf.cell(40, 10, transaction_type, 1)
+        pdf.cell(40, 10, format_money(amount, statement.currency, LATIN1_SYMBOLS), 1)
+        pdf.cell(70, 10, description or '', 1)
+        pdf.ln()
+
+    pdf.output(path)
+
+
+WRITERS = {'txt': write_text, 'pdf': write_pdf}
+
+
+def statement_path(out_dir, account_number, fmt):
+    return os.path.join(out_dir, f"{account_number}.{fmt}")
+
+
+def _write_range(db_path, out_dir, low, high, start, end, fmt):
+    """Write statements for account ids in [low, high); return (written, skipped)"""
+    write = WRITERS[fmt]
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        cursor = conn.cursor()
+        # One snapshot for balances and ledger so closing balances are consistent
+        cursor.execute('BEGIN')
+        cursor.execute('''
+            SELECT a.id, a.account_number, a.account_type, a.balance, u.full_name, a.currency
+            FROM accounts a
+            LEFT JOIN users u ON a.user_id = u.id
+            WHERE a.id >= ? AND a.id < ?
+            ORDER BY a.id
+        ''', (low, high))
+        accounts = cursor.fetchall()
+        pending = [account for account in accounts
+                   if not os.path.exists(statement_path(out_dir, account[1], fmt))]
+        skipped = len(accounts) - len(pending)
+        if not pending:
+            return 0, skipped
+
+        # Activity from the period start onwards; later rows only adjust the closing balance
+        cursor.execute('''
+            SELECT account_id, timestamp, transaction_type, amount, description
+            FROM transactions
+            WHERE account_id >= ? AND account_id < ? AND timestamp >= ?
+            ORDER BY account_id, id
+        ''', (pending[0][0], pending[-1][0] + 1, start))
+
+        last_day = (date.fromisoformat(end) - timedelta(days=1)).isoformat()
+        rows = cursor.fetchmany(FETCH_CHUNK)
+        position = 0
+        written = 0
+        for account_id, account_number, account_type, balance, holder, currency in pending:
+            period = []
+            later = 0.0
+            while rows:
+                if position == len(rows):
+                    rows = cursor.fetchmany(FETCH_CHUNK)
+                    position = 0
+                    continue
+                row = rows[position]
+                if row[0] > account_id:
+                    break
+                position += 1
+                if row[0] < account_id:
+                    continue
+                if row[1] < end:
+                    period.append(row[1:])
+                else:
+                    later += row[3]
+
+            closing = balance - later
+            opening = closing - sum(entry[2] for entry in period)
+            statement = Statement(holder or '', account_number, account_type, currency, start, last_day,
+                                  opening, closing, period)
+
+            path = statement_path(out_dir, account_number, fmt)
+            partial = path + '.part'
+            write(partial, statement)
+            os.replace(partial, path)
+            written += 1
+        return written, skipped
+    finally:
+        conn.close()
+
+
+def run_statements(db_path, month, out_dir='statements', fmt='txt', workers=None, ranges=None,
+                   progress=None):
+    """Write every account's statement for ``month``; return (written, skipped, seconds).
+
+    Accounts that already have a statement file are skipped.
+    ``progress(done, ranges, finished, total, elapsed)`` is called as account
+    ranges finish.
+    """
+    start, end = month_bounds(month)
+    out_dir = os.path.join(out_dir, month)
+    os.makedirs(out_dir, exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        low, high, total = conn.execute('''
+            SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0), COUNT(*) FROM accounts
+        ''').fetchone()
+    finally:
+        conn.close()
+
+    workers = workers or os.cpu_count() or 1
+    ranges = ranges or workers * 8
+    step = max((high - low + 1) // ranges + 1, 1)
+    bounds = [(first, first + step) for first in range(low, high + 1, step)]
+
+    started = time.perf_counter()
+    written = 0
+    skipped = 0
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_write_range, db_path, out_dir, first, stop, start, end, fmt)
+                   for first, stop in bounds]
+        for future in as_completed(futures):
+            count, already = future.result()
+            written += count
+            skipped += already
+            done += 1
+            if progress:
+                progress(done, len(bounds), written + skipped, total, time.perf_counter() - started)
+    return written, skipped, time.perf_counter() - started
+
+
+def print_progress(done, ranges, finished, total, elapsed):
+    print(f"  {done}/{ranges} ranges, {finished}/{total} accounts done ({elapsed:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write month-end statements for every account")
+    parser.add_argument('--db', default='banking_system.db', help="Path to the bank database")
+    parser.add_argument('--month', default=date.today().strftime('%Y-%m'), help="Statement month (YYYY-MM)")
+    parser.add_argument('--out', default='statements', help="Output directory")
+    parser.add_argument('--format', choices=sorted(WRITERS), default='txt', help="Statement file format")
+    parser.add_argument('--workers', type=int, help="Worker processes")
+    args = parser.parse_args()
+
+    written, skipped, seconds = run_statements(args.db, args.month, args.out, args.format, args.workers,
+                                               progress=print_progress)
+    rate = written / seconds if seconds else 0.0
+    print(f"Wrote {written} statements in {seconds:.2f}s ({rate:,.0f} statements/s), "
+          f"{skipped} already present")
+
+
+if __name__ == '__main__':
+    main()
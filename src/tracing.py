@@ -0,0 +1,319 @@
+"""Lightweight tracing of user actions down to individual SQL statements.
+
+A root span is opened per user action (``@traced('process_transfer')``)
+and child spans for validation, hashing, each SQL statement run through a
+``TracingCursor``, writer lock waits and the commit. Spans are kept in
+memory until the root span ends; the whole trace is then written as JSON
+lines to a rotating file if it was sampled, failed, or was slow.
+
+Time spent in modal dialogs is recorded as ``idle`` spans and does not
+count towards the slow threshold, so waiting for a teller to click OK
+does not make every action look slow.
+
+Spans follow the current thread. Work handed to another thread (the
+group-commit writer) passes the parent span explicitly.
+
+    python tracing.py securebank_trace.jsonl --slowest 10
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+
+DEFAULT_SAMPLE_RATE = 0.05
+DEFAULT_SLOW_MS = 500.0
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+MAX_SQL_LENGTH = 200
+
+_local = threading.local()
+_logger = logging.getLogger('securebank.trace')
+_logger.propagate = False
+_settings = {'sample_rate': DEFAULT_SAMPLE_RATE, 'slow_ms': DEFAULT_SLOW_MS}
+
+
+class Trace:
+    __slots__ = ('trace_id', 'spans', 'sampled', 'idle')
+
+    def __init__(self, sampled):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.spans = []
+        self.sampled = sampled
+        self.idle = 0.0
+
+
+class Span:
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'start', 'duration', 'attrs', 'error', 'idle', 'thread')
+
+    def __init__(self, trace, parent_id, name, attrs, idle=False):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.error = None
+        self.idle = idle
+        self.thread = threading.current_thread().name
+        self.start = time.time()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record(self):
+        entry = {
+            'trace': self.trace.trace_id,
+            'span': self.span_id,
+            'parent': self.parent_id,
+            'name': self.name,
+            'start': round(self.start, 6),
+            'ms': round(self.duration * 1000, 3),
+            'thread': self.thread,
+        }
+        if self.idle:
+            entry['idle'] = True
+        if self.error:
+            entry['error'] = self.error
+        if self.attrs:
+            entry['attrs'] = self.attrs
+        return json.dumps(entry, default=str)
+
+
+def configure(path, sample_rate=DEFAULT_SAMPLE_RATE, slow_ms=DEFAULT_SLOW_MS,
+              max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+    """Write finished traces to ``path``, rotated at ``max_bytes``"""
+    from logging.handlers import RotatingFileHandler
+    for handler in list(_logger.handlers):
+        _logger.removeHandler(handler)
+        handler.close()
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    _logger.addHandler(handler)
+    _logger.setLevel(logging.INFO)
+    _settings.update(sample_rate=sample_rate, slow_ms=slow_ms)
+
+
+def enabled():
+    return bool(_logger.handlers)
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current_span():
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def _finish_trace(root):
+    trace = root.trace
+    busy_ms = (root.duration - trace.idle) * 1000
+    if trace.sampled or root.error or busy_ms >= _settings['slow_ms']:
+        root.set(busy_ms=round(busy_ms, 3))
+        _logger.info('\n'.join(span.record() for span in trace.spans))
+
+
+class span:
+    """Context manager timing a span under ``parent`` (default: the current span).
+
+    Without a current span a new trace is started, unless ``root=False``
+    (child-only instrumentation such as SQL outside of any user action).
+    """
+
+    __slots__ = ('name', 'parent', 'attrs', 'idle', 'root', 'span', 'started')
+
+    def __init__(self, name, parent=None, idle=False, root=True, **attrs):
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.idle = idle
+        self.root = root
+        self.span = None
+
+    def __enter__(self):
+        if not enabled():
+            return None
+        parent = self.parent or current_span()
+        if parent is None:
+            if not self.root:
+                return None
+            trace = Trace(random.random() < _settings['sample_rate'])
+            self.span = Span(trace, None, self.name, self.attrs)
+        else:
+            self.span = Span(parent.trace, parent.span_id, self.name, self.attrs, self.idle)
+        self.started = time.perf_counter()
+        _stack().append(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        current = self.span
+        if current is None:
+            return False
+        current.duration = time.perf_counter() - self.started
+        if exc_type is not None:
+            current.error = f"{exc_type.__name__}: {exc}"
+        _stack().pop()
+        trace = current.trace
+        trace.spans.append(current)
+        if current.idle:
+            trace.idle += current.duration
+        if current.parent_id is None:
+            _finish_trace(current)
+        return False
+
+
+def record_span(parent, name, started, duration, **attrs):
+    """Add an already timed span (``started`` is a time.time() value) under ``parent``"""
+    if parent is None:
+        return
+    recorded = Span(parent.trace, parent.span_id, name, attrs)
+    recorded.start = started
+    recorded.duration = duration
+    parent.trace.spans.append(recorded)
+
+
+def commit(conn):
+    """Commit ``conn`` inside a ``commit`` span when called within a trace"""
+    with span('commit', root=False):
+        conn.commit()
+
+
+def traced(name=None):
+    """Decorator running the function inside a span (a root span for UI handlers)"""
+    def decorate(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _statement(sql):
+    sql = ' '.join(sql.split())
+    return sql if len(sql) <= MAX_SQL_LENGTH else sql[:MAX_SQL_LENGTH] + '...'
+
+
+class TracingCursor:
+    """sqlite3 cursor proxy recording a ``sql`` span per statement inside an active trace"""
+
+    __slots__ = ('cursor',)
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, sql, parameters=()):
+        if current_span() is None:
+            self.cursor.execute(sql, parameters)
+            return self
+        with span('sql', root=False, statement=_statement(sql)) as current:
+            self.cursor.execute(sql, parameters)
+            if self.cursor.rowcount >= 0:
+                current.set(rows=self.cursor.rowcount)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        if current_span() is None:
+            self.cursor.executemany(sql, seq_of_parameters)
+            return self
+        with span('sql', root=False, statement=_statement(sql)) as current:
+            self.cursor.executemany(sql, seq_of_parameters)
+            current.set(rows=self.cursor.rowcount)
+        return self
+
+    def fetchall(self):
+        if current_span() is None:
+            return self.cursor.fetchall()
+        with span('fetch', root=False) as current:
+            rows = self.cursor.fetchall()
+            current.set(rows=len(rows))
+        return rows
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self.cursor.fetchmany(size) if size is not None else self.cursor.fetchmany()
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class IdleDialogs:
+    """Proxy for ``tkinter.messagebox`` recording each dialog as an idle span"""
+
+    def __init__(self, module):
+        self.module = module
+
+    def __getattr__(self, name):
+        attr = getattr(self.module, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def dialog(*args, **kwargs):
+            with span('dialog', idle=True, root=False, kind=name):
+                return attr(*args, **kwargs)
+        return dialog
+
+
+def slowest(path, count=10):
+    """Return the ``count`` slowest traces in a trace file as lists of span dicts"""
+    traces = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                traces.setdefault(entry['trace'], []).append(entry)
+
+    def busy(spans):
+        root = next((entry for entry in spans if entry['parent'] is None), None)
+        return root['attrs'].get('busy_ms', root['ms']) if root and root.get('attrs') else 0.0
+
+    return sorted(traces.values(), key=busy, reverse=True)[:count]
+
+
+def print_trace(spans):
+    children = {}
+    for entry in spans:
+        children.setdefault(entry['parent'], []).append(entry)
+
+    def show(entry, depth):
+        detail = entry.get('attrs', {}).get('statement', '')
+        flags = ' idle' if entry.get('idle') else ''
+        flags += f" ERROR {entry['error']}" if entry.get('error') else ''
+        print(f"{'  ' * depth}{entry['name']:<{max(24 - 2 * depth, 1)}} {entry['ms']:>10.3f} ms{flags}  {detail}")
+        for child in sorted(children.get(entry['span'], ()), key=lambda child: child['start']):
+            show(child, depth + 1)
+
+    for root in children.get(None, ()):
+        show(root, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the slowest traces in a trace file")
+    parser.add_argument('path', nargs='?', default='securebank_trace.jsonl', help="Trace file")
+    parser.add_argument('--slowest', type=int, default=10, help="Number of traces to show")
+    args = parser.parse_args()
+
+    for spans in slowest(args.path, args.slowest):
+        print_trace(spans)
+        print()
+
+
+if __name__ == '__main__':
+    main()
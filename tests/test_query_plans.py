@@ -0,0 +1,216 @@
+"""Query-plan regression tests for the SQL the application issues.
+
+Every SQL string literal passed to ``execute``/``executemany`` in src/ is
+collected from the source and run through EXPLAIN QUERY PLAN against a
+seeded, ANALYZEd database. A statement may only scan one of the large
+tables if it is listed in ALLOWED_SCANS, and the hot statements in
+EXPECTED_INDEXES must keep using their index. SQL assembled at runtime
+(f-strings, variables) is not collected.
+
+    python -m pytest tests
+"""
+import ast
+import os
+import random
+import re
+import sqlite3
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC)
+
+import interest  # noqa: E402
+import reconciliation  # noqa: E402
+import sharding  # noqa: E402
+from schema import ensure_schema  # noqa: E402
+
+LARGE_TABLES = {'users', 'accounts', 'transactions'}
+
+DML = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+
+# Partial indexes over a small fraction of a large table; walking one is not a full scan
+SMALL_PARTIAL_INDEXES = {'idx_accounts_frozen'}
+
+# (module, SQL fragment, reason) for statements that read a large table in full on purpose
+ALLOWED_SCANS = (
+    ('SecureBank.py', 'FROM users ORDER BY created_at DESC', "employee customer list shows every customer"),
+    ('SecureBank.py', 'ORDER BY a.created_at DESC', "employee account list shows every account"),
+    ('SecureBank.py', 'SELECT COUNT(*) FROM users', "dashboard totals"),
+    ('SecureBank.py', 'SELECT COUNT(*) FROM accounts', "dashboard totals"),
+    ('SecureBank.py', 'SELECT currency, SUM(balance) FROM accounts', "dashboard totals"),
+    ('SecureBank.py', 'SELECT COUNT(*) FROM transactions', "dashboard totals"),
+    ('SecureBank.py', 'WHERE username LIKE ? OR full_name LIKE ?', "substring search cannot use an index"),
+    ('SecureBank.py', 'WHERE a.account_number LIKE ? OR u.full_name LIKE ?', "substring search cannot use an index"),
+    ('account_table.py', 'FROM accounts ORDER BY id', "loads the whole account table"),
+    ('customer_lookup.py', 'WHERE email_norm IS NULL OR phone_norm IS NULL', "one-off backfill on upgrade"),
+    ('customer_summary.py', 'SELECT a.user_id, MAX(t.timestamp)', "full rebuild visits every account"),
+    ('customer_lookup.py', 'WHERE username LIKE ? OR full_name LIKE ?', "fallback after every exact match failed"),
+    ('interest.py', 'WHERE account_type = ? AND balance > 0', "interest run visits every account"),
+    ('payee_index.py', 'SELECT account_number FROM accounts', "builds the account number prefix index"),
+    ('reconciliation.py', 'UNION ALL', "finds the id range of the whole ledger"),
+    ('sharding.py', 'FROM accounts', "migration copies every account"),
+    ('sharding.py', 'FROM transactions', "migration copies every transaction"),
+    ('statements.py', 'COUNT(*) FROM accounts', "finds the id range of all accounts"),
+)
+
+# (module, SQL fragment, index) for hot statements and the index each must use
+EXPECTED_INDEXES = (
+    ('SecureBank.py', "a.status = 'closed') ORDER BY t.timestamp DESC", 'idx_transactions_account'),
+    ('SecureBank.py', "a.status = 'closed') ORDER BY t.timestamp DESC", 'idx_accounts_user_closed'),
+    ('SecureBank.py', "WHERE l.status = 'Pending'", 'idx_loan_requests_status'),
+    ('SecureBank.py', "FROM accounts WHERE user_id = ? AND status != 'closed'", 'idx_accounts_user_open'),
+    ('SecureBank.py', 'FROM standing_orders o LEFT JOIN accounts a', 'idx_standing_orders_user'),
+    ('SecureBank.py', 'FROM transactions t CROSS JOIN accounts a', 'idx_transactions_timestamp'),
+    ('account_cache.py', 'WHERE account_number = ?', 'idx_accounts_number_open'),
+    ('account_table.py', 'WHERE account_number = ?', 'idx_accounts_number_open'),
+    ('account_status.py', "WHERE status = 'frozen'", 'idx_accounts_frozen'),
+    ('account_status.py', 'FROM account_freezes WHERE account_id = ?', 'idx_account_freezes_account'),
+    ('customer_lookup.py', 'WHERE email_norm = ?', 'idx_users_email_norm'),
+    ('customer_lookup.py', 'WHERE phone_norm = ?', 'idx_users_phone_norm'),
+    ('customer_lookup.py', 'WHERE username = ?', 'sqlite_autoindex_users_1'),
+    ('customer_summary.py', "WHERE user_id = ? AND status != 'closed' ORDER BY id", 'idx_accounts_user_open'),
+    ('customer_summary.py', 'FROM accounts a JOIN transactions t', 'idx_transactions_account'),
+    ('customer_summary.py', 'FROM accounts a JOIN transactions t', 'idx_accounts_user_closed'),
+    ('customer_summary.py', 'FROM customer_summary WHERE stale = 1', 'idx_customer_summary_stale'),
+    ('payee_index.py', "a.status = 'closed')) AND t.transaction_type", 'idx_accounts_user_closed'),
+    ('screening.py', "WHERE t.timestamp >= datetime('now', ?)", 'idx_transactions_timestamp'),
+    ('statements.py', 'FROM transactions', 'idx_transactions_account'),
+    ('ledger.py', 'DELETE FROM idempotency_keys', 'idx_idempotency_keys_created'),
+)
+
+
+def normalize(sql):
+    return ' '.join(sql.split())
+
+
+def collect_statements():
+    """Return (module, line, sql) for every literal DML statement executed in src/"""
+    statements = []
+    for name in sorted(os.listdir(SRC)):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(SRC, name), encoding='utf-8') as f:
+            tree = ast.parse(f.read(), name)
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr in ('execute', 'executemany') and node.args):
+                continue
+            arg = node.args[0]
+            if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                sql = normalize(arg.value)
+                if sql.split(' ', 1)[0].upper() in DML:
+                    statements.append((name, node.lineno, sql))
+    return statements
+
+
+STATEMENTS = collect_statements()
+
+
+def seed(conn, users=500, accounts_per_user=2, transactions=20000):
+    random.seed(42)
+    cursor = conn.cursor()
+    cursor.executemany('''
+        INSERT INTO users (username, password, full_name, email, phone, address, created_at,
+                           email_norm, phone_norm)
+        VALUES (?1, 'x', ?2, ?3, ?4, '1 Main St', datetime('2025-01-01', ?5), lower(?3), ?4)
+    ''', ((f"user{i}", f"User {i}", f"user{i}@example.com", f"555{i:07d}", f"+{i} minutes")
+          for i in range(users)))
+    cursor.executemany('''
+        INSERT INTO accounts (user_id, account_number, account_type, balance)
+        VALUES (?, ?, ?, ?)
+    ''', ((user_id, f"{user_id:05d}{n}", ('Savings', 'Checking')[n % 2], random.uniform(0, 10000))
+          for user_id in range(1, users + 1) for n in range(accounts_per_user)))
+    account_count = users * accounts_per_user
+    cursor.executemany('''
+        INSERT INTO transactions (account_id, transaction_type, amount, description, timestamp)
+        VALUES (?, ?, ?, ?, datetime('2025-01-01', ?))
+    ''', ((random.randint(1, account_count), kind, random.uniform(1, 500), kind, f"+{i} minutes")
+          for i, kind in enumerate(random.choice(('Deposit', 'Withdrawal', 'Transfer Out', 'Transfer In'))
+                                   for _ in range(transactions))))
+    cursor.executemany('''
+        INSERT INTO loan_requests (user_id, amount, purpose, duration, status) VALUES (?, 1000, 'Car', 12, ?)
+    ''', ((random.randint(1, users), random.choice(('Pending', 'Approved', 'Rejected', 'Approved')))
+          for _ in range(1000)))
+    cursor.executemany('''
+        INSERT INTO standing_orders (user_id, from_account, to_account, amount, frequency, start_date, next_due)
+        VALUES (?, ?, ?, 10, 'Monthly', '2025-01-01', '2025-02-01')
+    ''', ((user_id, f"{user_id:05d}0", f"{user_id:05d}1") for user_id in range(1, users + 1, 5)))
+    # The background refresher keeps all but the recently active summaries fresh
+    cursor.execute('UPDATE customer_summary SET stale = 0 WHERE user_id % 50 != 0')
+    conn.commit()
+
+
+@pytest.fixture(scope='module')
+def conn(tmp_path_factory):
+    conn = sqlite3.connect(str(tmp_path_factory.mktemp('plans') / 'bank.db'))
+    ensure_schema(conn)
+    conn.execute(interest.INTEREST_SCHEMA)
+    for statement in reconciliation.RECONCILIATION_SCHEMA + sharding.SHARD_SCHEMA:
+        conn.execute(statement)
+    conn.execute(sharding.COORDINATOR_SCHEMA)
+    seed(conn)
+    conn.execute('ANALYZE')
+    yield conn
+    conn.close()
+
+
+def query_plan(conn, sql):
+    # Numbered parameters (?1) may repeat; bind as many as the highest number
+    numbered = [int(number) for number in re.findall(r'\?(\d+)', sql)]
+    count = max(numbered) if numbered else sql.count('?')
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, [None] * count)]
+
+
+def scanned_tables(sql, plan):
+    """Large tables (resolving aliases) that the plan reads with a full SCAN"""
+    aliases = {}
+    for table, alias in re.findall(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.IGNORECASE):
+        aliases[table] = table
+        if alias and alias.upper() not in ('WHERE', 'JOIN', 'ON', 'ORDER', 'GROUP', 'LEFT', 'INNER', 'LIMIT'):
+            aliases[alias] = table
+    tables = set()
+    for line in plan:
+        match = re.match(r'SCAN (\w+)', line)
+        # Walking an index in ORDER BY order stops early at the LIMIT
+        if match and 'USING' in line and ' LIMIT ' in sql:
+            continue
+        if match and any(f"INDEX {index}" in line for index in SMALL_PARTIAL_INDEXES):
+            continue
+        if match and aliases.get(match.group(1), match.group(1)) in LARGE_TABLES:
+            tables.add(aliases.get(match.group(1), match.group(1)))
+    return tables
+
+
+def matching(entries, module, sql):
+    return [entry for entry in entries if entry[0] == module and entry[1] in sql]
+
+
+def test_statements_collected():
+    modules = {module for module, _, _ in STATEMENTS}
+    assert {'SecureBank.py', 'ledger.py', 'account_cache.py'} <= modules
+
+
+@pytest.mark.parametrize('module,line,sql', STATEMENTS,
+                         ids=[f"{module}:{line}" for module, line, _ in STATEMENTS])
+def test_no_unexpected_table_scans(conn, module, line, sql):
+    plan = query_plan(conn, sql)
+    scans = scanned_tables(sql, plan)
+    if scans and not matching(ALLOWED_SCANS, module, sql):
+        pytest.fail(f"{module}:{line} scans {', '.join(sorted(scans))}\n  {sql}\n  plan: {plan}")
+
+
+@pytest.mark.parametrize('module,fragment,index', EXPECTED_INDEXES)
+def test_hot_statement_uses_index(conn, module, fragment, index):
+    found = [(line, sql) for name, line, sql in STATEMENTS if name == module and fragment in sql]
+    assert found, f"no statement in {module} contains {fragment!r}"
+    for line, sql in found:
+        plan = query_plan(conn, sql)
+        assert any(index in step for step in plan), f"{module}:{line} no longer uses {index}: {plan}"
+
+
+@pytest.mark.parametrize('module,fragment,reason', ALLOWED_SCANS)
+def test_allowed_scans_are_current(module, fragment, reason):
+    assert any(name == module and fragment in sql for name, _, sql in STATEMENTS), \
+        f"stale ALLOWED_SCANS entry for {module}: {fragment!r}"
@@ -0,0 +1,136 @@
+"""Crash-recovery tests for cross-shard transfers.
+
+A transfer is driven by hand up to a chosen step of the two-phase commit,
+a shard worker is killed there, and a new ShardedBank over the same files
+must leave the transfer either fully applied or fully undone.
+
+    python -m pytest tests
+"""
+import os
+import sqlite3
+import sys
+import uuid
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC)
+
+import sharding  # noqa: E402
+
+SHARDS = 2
+OPENING_BALANCE = 500.0
+AMOUNT = 120.0
+
+
+def account_pair(shards=SHARDS):
+    """Two account numbers that hash to different shards"""
+    numbers = [f"ACC{i:09d}" for i in range(1, 50)]
+    source = numbers[0]
+    target = next(number for number in numbers if sharding.shard_for(number, shards)
+                  != sharding.shard_for(source, shards))
+    return source, target
+
+
+def crash(bank, client):
+    """Kill one shard worker and shut the rest of the bank down without recovery"""
+    client.process.kill()
+    client.process.join()
+    # The worker may have died holding the response queue's write lock, so no
+    # sentinel can be sent; its daemon dispatcher thread is left blocked
+    for other in bank.shards:
+        if other is not client:
+            other.close()
+    bank.log.close()
+
+
+def transactions(base, account_number):
+    path = sharding.shard_path(base, sharding.shard_for(account_number, SHARDS))
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('''
+            SELECT t.transaction_type, t.amount FROM transactions t
+            JOIN accounts a ON a.id = t.account_id
+            WHERE a.account_number = ? ORDER BY t.id
+        ''', (account_number,)).fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def bank(tmp_path):
+    base = str(tmp_path / 'bank')
+    bank = sharding.ShardedBank(base, shards=SHARDS)
+    source, target = account_pair()
+    bank.open_account(source, 1, 'Savings', OPENING_BALANCE)
+    bank.open_account(target, 2, 'Savings', OPENING_BALANCE)
+    return bank, base, source, target
+
+
+def prepare(bank, source, target):
+    xid = uuid.uuid4().hex
+    bank._log(xid, 'started', source, target, AMOUNT, "Rent")
+    hold = bank.shard(source).call('prepare_debit', xid, source, AMOUNT, target, "Rent")
+    bank.shard(target).call('prepare_credit', xid, target, AMOUNT, source, "Rent")
+    return xid, hold
+
+
+def recovered_balances(base, source, target):
+    bank = sharding.ShardedBank(base, shards=SHARDS)
+    try:
+        state = bank.log.execute('SELECT state FROM transfer_log').fetchall()
+        return bank.balance(source), bank.balance(target), state
+    finally:
+        bank.close()
+
+
+def test_cross_shard_transfer(bank):
+    bank, base, source, target = bank
+    try:
+        posting = bank.transfer(source, target, AMOUNT)
+        assert posting.kind == 'transfer' and posting.amount == AMOUNT
+        assert bank.balance(source) == OPENING_BALANCE - AMOUNT
+        assert bank.balance(target) == OPENING_BALANCE + AMOUNT
+    finally:
+        bank.close()
+
+
+def test_repeated_prepare_returns_the_hold(bank):
+    bank, base, source, target = bank
+    try:
+        xid, hold = prepare(bank, source, target)
+        again = bank.shard(source).call('prepare_debit', xid, source, AMOUNT, target, "Rent")
+        assert again.replayed and again.currency == hold.currency
+        assert bank.balance(source) == OPENING_BALANCE - AMOUNT
+    finally:
+        bank.close()
+
+
+@pytest.mark.parametrize('killed', ['source', 'target'])
+def test_crash_after_prepare_aborts(bank, killed):
+    bank, base, source, target = bank
+    prepare(bank, source, target)
+    crash(bank, bank.shard(source if killed == 'source' else target))
+
+    source_balance, target_balance, state = recovered_balances(base, source, target)
+    assert (source_balance, target_balance) == (OPENING_BALANCE, OPENING_BALANCE)
+    assert state == [('aborted',)]
+    assert transactions(base, source) == [('Deposit', OPENING_BALANCE)]
+    assert transactions(base, target) == [('Deposit', OPENING_BALANCE)]
+
+
+@pytest.mark.parametrize('killed', ['source', 'target'])
+def test_crash_after_commit_decision_completes(bank, killed):
+    bank, base, source, target = bank
+    xid, _ = prepare(bank, source, target)
+    bank._log(xid, 'committed')
+    # One shard applied its side before the other worker died
+    survivor = bank.shard(target if killed == 'source' else source)
+    survivor.call('commit', xid)
+    crash(bank, bank.shard(source if killed == 'source' else target))
+
+    source_balance, target_balance, state = recovered_balances(base, source, target)
+    assert (source_balance, target_balance) == (OPENING_BALANCE - AMOUNT, OPENING_BALANCE + AMOUNT)
+    assert state == [('done',)]
+    assert transactions(base, source) == [('Deposit', OPENING_BALANCE), ('Transfer Out', -AMOUNT)]
+    assert transactions(base, target) == [('Deposit', OPENING_BALANCE), ('Transfer In', AMOUNT)]